@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+StegSolve Batch - headless triage of whole directory trees
+Spreads image files across a process pool and streams one JSON line per file
+"""
+
+import argparse
+import functools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import stegsolve_core as core
+
+
+def analyze_path(filepath, min_length=4, max_strings=50):
+    """Worker entry point: analyze one file, never raise"""
+    try:
+        return core.analyze_file(filepath, min_length, max_strings)
+    except Exception as e:
+        return {'path': filepath, 'error': str(e)}
+
+
+def run_batch(paths, output, workers=None, min_length=4, max_strings=50, chunksize=8):
+    """Analyze every image under paths, writing JSON lines to output as results arrive"""
+    files = core.iter_image_files(paths)
+    worker = functools.partial(analyze_path, min_length=min_length, max_strings=max_strings)
+    count = 0
+    errors = 0
+
+    # Only file paths go to the workers and only small dicts come back,
+    # so throughput scales with the number of processes
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(worker, files, chunksize=chunksize):
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+            count += 1
+            if 'error' in result:
+                errors += 1
+
+    return count, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='stegsolve-batch',
+        description="Analyze images in bulk and print one JSON line of results per file")
+    parser.add_argument('paths', nargs='+', help="image files or directories to scan recursively")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: CPU count)")
+    parser.add_argument('-o', '--output', help="write JSON lines to this file instead of stdout")
+    parser.add_argument('-n', '--min-length', type=int, default=4,
+                        help="minimum length of extracted strings (default: 4)")
+    parser.add_argument('--max-strings', type=int, default=50,
+                        help="number of strings included per file (default: 50)")
+    parser.add_argument('--chunksize', type=int, default=8,
+                        help="files handed to a worker at a time (default: 8)")
+    args = parser.parse_args(argv)
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        count, errors = run_batch(args.paths, output, args.workers, args.min_length,
+                                  args.max_strings, args.chunksize)
+    finally:
+        if args.output:
+            output.close()
+
+    print(f"Analyzed {count} files ({errors} errors)", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+StegSolve Bench - reproducible timings of the analysis engine
+Runs every operation on synthetic images of several modes and sizes, records
+wall time and peak memory as JSON and compares them against a stored baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+
+import numpy as np
+import PIL
+from PIL import Image
+
+import stegsolve_core as core
+
+
+# Synthetic input modes; GIF is an animated image, JPEG a progressive RGB JPEG
+BENCH_MODES = ('RGB', 'RGBA', 'L', 'P', 'GIF', 'JPEG')
+
+# Frames in the synthetic animated GIF
+GIF_FRAMES = 4
+
+# Timings below this are too noisy to flag as regressions
+MIN_COMPARE_SECONDS = 0.005
+
+BenchInput = namedtuple('BenchInput', 'label mode megapixels path image array')
+
+
+def synthetic_image(mode, megapixels, seed=0):
+    """Deterministic test image: smooth gradients with noise, about megapixels in size"""
+    width = max(1, int(round((megapixels * 1e6 * 4 / 3) ** 0.5)))
+    height = max(1, int(round(megapixels * 1e6 / width)))
+    rng = np.random.default_rng(seed)
+
+    # Gradients keep the file compressible and the statistics non-trivial
+    ramp = (np.arange(width, dtype=np.uint16)[None, :] + np.arange(height, dtype=np.uint16)[:, None]) // 8
+    noise = rng.integers(0, 16, (height, width), dtype=np.uint8)
+    base = (ramp.astype(np.uint8) + noise)
+
+    if mode == 'L':
+        return Image.fromarray(base)
+    if mode in ('P', 'GIF'):
+        image = Image.fromarray(base, 'P')
+        image.putpalette(rng.integers(0, 256, 768, dtype=np.uint8).tobytes())
+        return image
+    channels = [base, base[::-1].copy(), np.roll(base, width // 3, axis=1)]
+    if mode == 'RGBA':
+        channels.append(np.full((height, width), 255, dtype=np.uint8) - noise)
+    return Image.fromarray(np.dstack(channels))
+
+
+def write_input(directory, mode, megapixels, seed=0):
+    """Write one synthetic input file and load it the way the GUI does"""
+    label = f"{mode}-{megapixels:g}MP"
+    image = synthetic_image(mode, megapixels, seed)
+    if mode == 'GIF':
+        path = os.path.join(directory, f"{label}.gif")
+        # Every frame scrolls the first one sideways
+        pixels = np.asarray(image)
+        frames = [image]
+        for index in range(1, GIF_FRAMES):
+            frame = Image.fromarray(np.roll(pixels, index * 7, axis=1), 'P')
+            frame.putpalette(image.getpalette())
+            frames.append(frame)
+        image.save(path, save_all=True, append_images=frames[1:], duration=100, loop=0)
+    elif mode == 'JPEG':
+        path = os.path.join(directory, f"{label}.jpg")
+        image.save(path, quality=90, progressive=True)
+    else:
+        path = os.path.join(directory, f"{label}.png")
+        image.save(path, compress_level=1)
+    loaded, array = core.load_image(path)
+    return BenchInput(label, mode, megapixels, path, loaded, array)
+
+
+def _read_strings(path):
+    with open(path, 'rb') as f:
+        return sum(len(offsets) for offsets, _ in core.scan_strings(f))
+
+
+def _analyze_frames(path):
+    stack = core.FrameStack(path)
+    try:
+        core.frame_analysis(stack)
+    finally:
+        stack.close()
+
+
+def _decode_frames(path):
+    decoder = core.FrameDecoder(path)
+    try:
+        decoder.prefetch(range(decoder.n_frames))
+    finally:
+        decoder.close()
+
+
+# name -> (modes it applies to, setup(input) returning the timed callable)
+OPERATIONS = {
+    'load': (BENCH_MODES, lambda b: lambda: core.load_image(b.path)),
+    'planes': (BENCH_MODES, lambda b: lambda: core.BitPlaneCube(b.array)),
+    'display': (BENCH_MODES, lambda b: lambda: core.ImagePyramid(b.image).prepare(1024, 768)),
+    'strings': (BENCH_MODES, lambda b: lambda: _read_strings(b.path)),
+    'structure': (BENCH_MODES, lambda b: lambda: core.analyze_file_structure(b.path)),
+    'statistics': (BENCH_MODES, lambda b: lambda: core.channel_statistics(b.array)),
+    'colour_hsv': (BENCH_MODES, lambda b: lambda: core.convert_colour(b.array, 'HSV')),
+    'colour_ycbcr': (BENCH_MODES, lambda b: lambda: core.convert_colour(b.array, 'YCbCr')),
+    'colour_lab': (BENCH_MODES, lambda b: lambda: core.convert_colour(b.array, 'LAB')),
+    'colour_xyz': (BENCH_MODES, lambda b: lambda: core.convert_colour(b.array, 'XYZ')),
+    'expression': (BENCH_MODES, lambda b: lambda: core.PlaneExpression(
+        'R bit0 XOR G bit0' if b.array.ndim == 3 else 'L bit0').render(b.array)),
+    'lsb': (BENCH_MODES, lambda b: lambda: core.lsb_analysis(b.array)),
+    'noise': (BENCH_MODES, lambda b: lambda: core.noise_analysis(b.array, 'laplacian', 'variance')),
+    'compare': (BENCH_MODES, lambda b: lambda: core.compare_images(b.array, b.array[::-1])),
+    'carve': (BENCH_MODES, lambda b: lambda: core.carve_file(b.path)),
+    'solve': (BENCH_MODES, lambda b: lambda: core.auto_solve(b.array)),
+    'frames': (('GIF',), lambda b: lambda: _decode_frames(b.path)),
+    'frame_stack': (('GIF',), lambda b: lambda: _analyze_frames(b.path)),
+    'dct': (('JPEG',), lambda b: lambda: core.read_jpeg_coefficients(b.path)),
+    'jpeg': (('JPEG',), lambda b: lambda: core.jpeg_analysis(core.read_jpeg_coefficients(b.path))),
+}
+
+
+def measure_startup(repeat=3):
+    """Timings of a fresh interpreter importing the GUI module, as a launch does"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'import stegsolve_gui'], cwd=directory, check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def measure(run, repeat=3):
+    """(timings in seconds, peak traced bytes) of a callable
+
+    Timings are taken without tracing; one extra traced run measures the
+    peak of Python and numpy allocations above what was already live.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        run()
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    return timings, peak
+
+
+def run_benchmarks(sizes, modes=BENCH_MODES, operations=None, repeat=3, seed=0, log=None):
+    """Benchmark every operation on every (mode, size) input; returns the result document
+
+    The 'startup' operation times a cold launch once, independent of the inputs.
+    """
+    operations = ['startup'] + list(OPERATIONS) if operations is None else operations
+    results = []
+
+    if 'startup' in operations:
+        timings = measure_startup(repeat)
+        results.append({'operation': 'startup', 'input': 'gui', 'mode': None, 'megapixels': 0,
+                        'seconds': min(timings), 'median_seconds': statistics.median(timings), 'peak_bytes': 0})
+        if log:
+            log(results[-1])
+
+    with tempfile.TemporaryDirectory() as directory:
+        for megapixels in sizes:
+            for mode in modes:
+                bench_input = write_input(directory, mode, megapixels, seed)
+                for name in operations:
+                    if name == 'startup':
+                        continue
+                    applies, setup = OPERATIONS[name]
+                    if mode not in applies:
+                        continue
+                    timings, peak = measure(setup(bench_input), repeat)
+                    result = {
+                        'operation': name,
+                        'input': bench_input.label,
+                        'mode': mode,
+                        'megapixels': megapixels,
+                        'seconds': min(timings),
+                        'median_seconds': statistics.median(timings),
+                        'peak_bytes': peak,
+                    }
+                    results.append(result)
+                    if log:
+                        log(result)
+                del bench_input
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare_results(current, baseline, threshold=0.25, min_seconds=MIN_COMPARE_SECONDS):
+    """Regressions of current against baseline: time or peak memory above (1 + threshold) times the baseline
+
+    Returns a list of dicts with the operation, input, metric, baseline
+    and current values and their ratio.
+    """
+    previous = {(r['operation'], r['input']): r for r in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        old = previous.get((result['operation'], result['input']))
+        if old is None:
+            continue
+        for metric, floor in (('seconds', min_seconds), ('peak_bytes', 1024 * 1024)):
+            if old[metric] < floor and result[metric] < floor:
+                continue
+            ratio = result[metric] / max(old[metric], floor)
+            if ratio > 1 + threshold:
+                regressions.append({'operation': result['operation'], 'input': result['input'], 'metric': metric,
+                                    'baseline': old[metric], 'current': result[metric], 'ratio': ratio})
+    return regressions
+
+
+def format_result(result):
+    """One table line of a benchmark result"""
+    return (f"{result['operation']:<14} {result['input']:<14} {result['seconds'] * 1000:10.1f} ms"
+            f" {result['peak_bytes'] / (1024 * 1024):10.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='stegsolve-bench',
+        description="Time every analysis operation on synthetic images and check for regressions")
+    parser.add_argument('-s', '--sizes', default='1,4',
+                        help="comma separated image sizes in megapixels (default: 1,4; e.g. 1,10,100,120)")
+    parser.add_argument('-m', '--modes', default=','.join(BENCH_MODES),
+                        help=f"comma separated input modes (default: {','.join(BENCH_MODES)})")
+    parser.add_argument('-O', '--operations', help=f"comma separated operations (default: all of startup,{','.join(OPERATIONS)})")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="timed runs per operation (default: 3)")
+    parser.add_argument('-o', '--output', help="write the JSON results to this file")
+    parser.add_argument('-b', '--baseline', help="compare against the JSON results of an earlier run")
+    parser.add_argument('-t', '--threshold', type=float, default=0.25,
+                        help="allowed slowdown or memory growth over the baseline (default: 0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    sizes = [float(size) for size in args.sizes.split(',')]
+    modes = [mode.strip().upper() for mode in args.modes.split(',')]
+    operations = [name.strip() for name in args.operations.split(',')] if args.operations else None
+    unknown = [mode for mode in modes if mode not in BENCH_MODES] + \
+              [name for name in operations or () if name not in OPERATIONS and name != 'startup']
+    if unknown:
+        parser.error(f"unknown mode or operation: {', '.join(unknown)}")
+
+    report = run_benchmarks(sizes, modes, operations, max(1, args.repeat),
+                            log=lambda result: print(format_result(result), file=sys.stderr))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_results(report, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['operation']} {regression['input']} {regression['metric']}: "
+                  f"{regression['baseline']:.4g} -> {regression['current']:.4g} ({regression['ratio']:.2f}x)",
+                  file=sys.stderr)
+        print(f"{len(regressions)} regressions against {args.baseline}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4408 @@
+#!/usr/bin/env python3
+"""
+Headless analysis engine for StegSolve GUI
+All image analysis lives here so it can run without Tk (GUI, batch CLI)
+"""
+
+from PIL import Image
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import array
+import bisect
+import bz2
+import functools
+import hashlib
+import io
+import itertools
+import lzma
+import math
+import mmap
+import multiprocessing
+import os
+import re
+import struct
+import tempfile
+import threading
+import zlib
+
+# File extensions picked up when scanning directories
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tiff', '.tif')
+
+# Magic prefixes used by the file structure analysis
+FILE_SIGNATURES = [
+    (b'\x89PNG', "PNG image", "PNG (Portable Network Graphics)"),
+    (b'\xFF\xD8\xFF', "JPEG image", "JPEG (Joint Photographic Experts Group)"),
+    (b'BM', "BMP image", "BMP (Bitmap)"),
+    (b'GIF87a', "GIF image", "GIF (Graphics Interchange Format)"),
+    (b'GIF89a', "GIF image", "GIF (Graphics Interchange Format)"),
+    (b'II*\x00', "TIFF image", "TIFF (Tagged Image File Format)"),
+    (b'MM\x00*', "TIFF image", "TIFF (Tagged Image File Format)"),
+]
+
+# Bytes streamed at a time by the structure walk, and kept per chunk to describe it
+STRUCTURE_BLOCK_SIZE = 1024 * 1024
+STRUCTURE_KEEP_BYTES = 4096
+
+# Comments larger than this and non-data chunks larger than that are flagged
+STRUCTURE_COMMENT_BYTES = 4096
+STRUCTURE_LARGE_CHUNK = 1024 * 1024
+
+# Nodes and anomalies listed per structure walk; the rest are only counted
+STRUCTURE_MAX_NODES = 10000
+
+# Bytes per character for every supported string encoding
+STRING_ENCODINGS = {
+    'ascii': 1,
+    'utf-16le': 2,
+}
+
+# Printable ASCII lookup table
+PRINTABLE = np.zeros(256, dtype=bool)
+PRINTABLE[0x20:0x7f] = True
+
+# Bytes read at a time when scanning files
+SCAN_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+class Cancelled(Exception):
+    """Raised from a progress callback to abort a long-running analysis"""
+
+
+def load_image(filepath):
+    """Open an image and return (PIL image, numpy array) ready for analysis"""
+    image = Image.open(filepath)
+
+    # Convert to RGB if necessary
+    if image.mode not in ['RGB', 'RGBA', 'L']:
+        image = image.convert('RGB')
+
+    return image, np.array(image)
+
+
+def load_preview(filepath, width, height):
+    """Quick reduced decode for display: (preview image, full size), or None
+
+    JPEG files are decoded with DCT scaling (draft mode) at the smallest
+    of 1/2, 1/4 or 1/8 scale that still covers width x height, which
+    skips most of the decoding work. Other formats, and JPEGs too small
+    to reduce, return None and need a full load.
+    """
+    with Image.open(filepath) as image:
+        if image.format != 'JPEG':
+            return None
+        size = image.size
+        if not image.draft('L' if image.mode == 'L' else 'RGB', (width, height)) or image.size == size:
+            return None
+        image.load()
+        preview = image if image.mode in ('RGB', 'L') else image.convert('RGB')
+        # Detach from the file so it can be closed
+        return preview.copy() if preview is image else preview, size
+
+
+def channel_names(image_array):
+    """Names of the channels stored in an image array"""
+    if image_array.ndim == 2:
+        return ['Gray']
+    names = ['Red', 'Green', 'Blue', 'Alpha']
+    return names[:image_array.shape[2]]
+
+
+# Number of set bits in every byte value
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+# Reductions available for combining the 8 bit planes of a channel
+PLANE_OPERATIONS = {
+    'xor': np.bitwise_xor,
+    'and': np.bitwise_and,
+    'or': np.bitwise_or,
+}
+
+
+class BitPlaneCube:
+    """Every channel x bit plane of an image, bit-packed 8 pixels per byte
+
+    The planes are stored as one array of shape
+    (channels, 8, height, ceil(width / 8)), so all 32 planes of an RGBA
+    image cost 4 bytes per pixel. A plane is only expanded to a
+    full-size 0/255 array when it is requested. channels names the
+    channels of other arrays, such as colour space components.
+    """
+
+    def __init__(self, image_array, chunk_bytes=64 * 1024 * 1024, progress=None, channels=None):
+        data = image_array[:, :, None] if image_array.ndim == 2 else image_array
+        height, width, depth = data.shape
+
+        self.channels = list(channels) if channels else channel_names(image_array)
+        self.height = height
+        self.width = width
+        self.packed = np.empty((depth, 8, height, (width + 7) // 8), dtype=np.uint8)
+
+        # Work on blocks of rows with the channels made planar, so each
+        # bit of every channel is packed in one call and temporaries stay bounded
+        rows = max(1, chunk_bytes // max(1, width * depth * 2))
+        for top in range(0, height, rows):
+            block = np.ascontiguousarray(data[top:top + rows].transpose(2, 0, 1))
+            for bit in range(8):
+                self.packed[:, bit, top:top + rows] = np.packbits((block >> bit) & 1, axis=-1)
+            if progress:
+                progress(min(1.0, (top + rows) / height))
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def index(self, channel):
+        if channel not in self.channels:
+            raise KeyError(f"Channel {channel} not available")
+        return self.channels.index(channel)
+
+    def expand(self, packed):
+        """Unpack a packed plane into a 0/255 image array"""
+        return np.unpackbits(packed, axis=-1, count=self.width) * np.uint8(255)
+
+    def plane(self, channel, bit):
+        """Bit plane of one channel as a 0/255 image array"""
+        return self.expand(self.packed[self.index(channel), bit])
+
+    def combine(self, channel, operation):
+        """XOR/AND/OR of all 8 planes of a channel, computed on packed bytes"""
+        reduce = PLANE_OPERATIONS[operation]
+        return self.expand(reduce.reduce(self.packed[self.index(channel)], axis=0))
+
+    def ones_ratio(self, channel, bit):
+        """Fraction of pixels with the given bit set"""
+        ones = POPCOUNT[self.packed[self.index(channel), bit]].sum(dtype=np.uint64)
+        return float(ones) / (self.height * self.width)
+
+    def composite(self, render):
+        """Apply render(channel) to every colour channel and stack the results"""
+        colour = [name for name in self.channels if name != 'Alpha']
+        if len(colour) == 1:
+            return render(colour[0])
+        return np.dstack([render(name) for name in colour])
+
+
+def bit_plane_ratios(image_array):
+    """Fraction of set bits in each bit plane of every channel"""
+    cube = BitPlaneCube(image_array)
+    return {name: [cube.ones_ratio(name, bit) for bit in range(8)] for name in cube.channels}
+
+
+# Channel letters used to describe extraction order
+CHANNEL_LETTERS = {
+    'R': 'Red',
+    'G': 'Green',
+    'B': 'Blue',
+    'A': 'Alpha',
+    'L': 'Gray',
+}
+
+
+# Tokens of plane expressions: words, numbers, bit ranges and operators
+_EXPRESSION_TOKEN = re.compile(r'\s*(?:(\d+)\s*[-–]\s*(\d+)|(0x[0-9a-fA-F]+|\d+)|([A-Za-z]+)|([()^&|~,]))')
+
+_EXPRESSION_OPERATORS = {'^': 'xor', '&': 'and', '|': 'or', '~': 'not'}
+
+# Bytes of each channel processed at a time when evaluating expressions
+EXPRESSION_CHUNK_BYTES = 16 * 1024 * 1024
+
+
+def _parse_expression(text):
+    """Parse a plane expression into a tree of tuples
+
+    Leaves are ('channel', name, shift, mask) for (value >> shift) & mask
+    and ('const', value); inner nodes are ('not', child) and
+    (operator, left, right) for 'and', 'or' and 'xor'.
+    """
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = _EXPRESSION_TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Unexpected input at position {position}: {text[position:position + 10]!r}")
+        position = match.end()
+        low, high, number, word, symbol = match.groups()
+        if low is not None:
+            tokens.append(('range', (int(low), int(high))))
+        elif number is not None:
+            tokens.append(('number', int(number, 0)))
+        elif symbol in _EXPRESSION_OPERATORS:
+            tokens.append(('op', _EXPRESSION_OPERATORS[symbol]))
+        elif symbol:
+            tokens.append((symbol, symbol))
+        elif word.lower() in ('and', 'or', 'xor', 'not'):
+            tokens.append(('op', word.lower()))
+        elif word.lower().startswith('bit'):
+            # "bit0", "bit 0", "bits 0-2", "bits 0,3"
+            tokens.append(('bits', word[3:].lower().lstrip('s')))
+        else:
+            tokens.append(('word', word))
+    tokens.append(('end', None))
+    index = 0
+
+    def peek():
+        return tokens[index]
+
+    def take(kind=None, value=None):
+        nonlocal index
+        token = tokens[index]
+        if (kind and token[0] != kind) or (value and token[1] != value):
+            raise ValueError(f"Expected {value or kind}, found {token[1] or 'end of expression'}")
+        index += 1
+        return token
+
+    def binary(operator, operand):
+        def parse():
+            node = operand()
+            while peek() == ('op', operator):
+                take()
+                node = (operator, node, operand())
+            return node
+        return parse
+
+    def unary():
+        if peek() == ('op', 'not'):
+            take()
+            return ('not', unary())
+        return primary()
+
+    def primary():
+        kind, value = take()
+        if kind == '(':
+            node = expression()
+            take(')')
+            return node
+        if kind == 'number':
+            return ('const', value & 0xFF)
+        if kind != 'word':
+            raise ValueError(f"Unexpected {value}")
+        name = CHANNEL_LETTERS.get(value.upper(), value.capitalize())
+        if name not in CHANNEL_LETTERS.values():
+            raise ValueError(f"Unknown channel: {value}")
+        if peek()[0] != 'bits':
+            return ('channel', name, 0, 0xFF)
+        _, suffix = take()
+        bits = []
+        if suffix:
+            bits.append(int(suffix))
+        elif peek()[0] == 'range':
+            low, high = take()[1]
+            bits.extend(range(min(low, high), max(low, high) + 1))
+        else:
+            bits.append(take('number')[1])
+            while peek()[0] == ',':
+                take()
+                bits.append(take('number')[1])
+        if not bits or any(not 0 <= bit <= 7 for bit in bits):
+            raise ValueError("Bit numbers must be between 0 and 7")
+        if len(bits) == 1:
+            return ('channel', name, bits[0], 1)
+        return ('channel', name, 0, sum(1 << bit for bit in set(bits)))
+
+    expression = binary('or', binary('xor', binary('and', unary)))
+    tree = expression()
+    take('end')
+    return tree
+
+
+def _expression_mask(node):
+    """Largest value a node can take, as a bit mask"""
+    kind = node[0]
+    if kind == 'channel':
+        return node[3]
+    if kind == 'const':
+        return node[1]
+    if kind == 'not':
+        return _expression_mask(node[1])
+    left, right = _expression_mask(node[1]), _expression_mask(node[2])
+    return left & right if kind == 'and' else left | right
+
+
+def _expression_channels(node):
+    if node[0] == 'channel':
+        return {node[1]}
+    return set().union(*(_expression_channels(child) for child in node[1:] if isinstance(child, tuple)))
+
+
+def _evaluate_expression(node, values):
+    """Evaluate a tree over uint8 arrays of channel values"""
+    kind = node[0]
+    if kind == 'channel':
+        value = values[node[1]]
+        return (value >> node[2]) & node[3] if node[2] or node[3] != 0xFF else value
+    if kind == 'const':
+        return np.uint8(node[1])
+    if kind == 'not':
+        return _evaluate_expression(node[1], values) ^ np.uint8(_expression_mask(node[1]))
+    if kind == 'lut':
+        return _apply_lut(node, values)
+    operation = {'and': np.bitwise_and, 'or': np.bitwise_or, 'xor': np.bitwise_xor}[kind]
+    return operation(_evaluate_expression(node[1], values), _evaluate_expression(node[2], values))
+
+
+def _apply_lut(node, values):
+    _, names, table = node
+    if len(names) == 1:
+        return table[values[names[0]]]
+    index = values[names[0]].astype(np.uint16) << 8
+    index |= values[names[1]]
+    return table[index]
+
+
+def _compile_expression(node):
+    """Fold every subtree that reads one or two channels into a lookup table
+
+    A one-channel subtree becomes a 256-entry table and a two-channel
+    subtree a 65536-entry table indexed by both values, so it costs a
+    single gather however many operators it contains.
+    """
+    names = sorted(_expression_channels(node))
+    if node[0] == 'const':
+        return node
+    if len(names) == 1:
+        table = _evaluate_expression(node, {names[0]: np.arange(256, dtype=np.uint8)})
+        return ('lut', tuple(names), table.astype(np.uint8))
+    if len(names) == 2:
+        pairs = np.arange(65536, dtype=np.uint16)
+        grid = {names[0]: (pairs >> 8).astype(np.uint8), names[1]: (pairs & 0xFF).astype(np.uint8)}
+        table = _evaluate_expression(node, grid)
+        return ('lut', tuple(names), table.astype(np.uint8))
+    if node[0] == 'not':
+        return ('not', _compile_expression(node[1]))
+    return (node[0], _compile_expression(node[1]), _compile_expression(node[2]))
+
+
+class PlaneExpression:
+    """A bit-mask expression over image channels, compiled to lookup tables
+
+    Channels are R, G, B, A and L (or Red, Green, ..., Gray); "R bit0"
+    selects one bit as 0/1, "B bits 0-2" (or "bits 0,1,2") keeps those
+    bits in place and a bare channel is its whole value. Terms and
+    numbers combine with XOR, AND, OR and NOT (or ^, &, |, ~) and
+    parentheses; NOT flips only the bits the operand can have.
+    Examples: "R bit0 XOR G bit0", "B bits 0-2", "(R ^ G ^ B) & 1".
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.tree = _parse_expression(text)
+        self.mask = _expression_mask(self.tree)
+        self.channels = sorted(_expression_channels(self.tree))
+        self.plan = _compile_expression(self.tree)
+
+    @property
+    def binary(self):
+        """True when the result is a single bit"""
+        return self.mask == 1
+
+    def evaluate(self, image_array, chunk_bytes=EXPRESSION_CHUNK_BYTES, progress=None):
+        """uint8 result of the expression for every pixel"""
+        return self._run(self.plan, image_array, (), chunk_bytes, progress)
+
+    def render(self, image_array, colour_map=None, chunk_bytes=EXPRESSION_CHUNK_BYTES, progress=None):
+        """Displayable result: values stretched to 0-255, or coloured by a (256, 3) colour map
+
+        When the whole expression is one lookup table the display
+        mapping is folded into it, so rendering is a single gather.
+        """
+        if colour_map is None:
+            mapping = np.minimum(np.arange(256) * 255 // max(1, self.mask), 255).astype(np.uint8)
+        else:
+            mapping = colour_map
+        if self.plan[0] == 'lut':
+            return self._run(('lut', self.plan[1], mapping[self.plan[2]]), image_array, mapping.shape[1:],
+                             chunk_bytes, progress)
+        return mapping[self.evaluate(image_array, chunk_bytes, progress)]
+
+    def _run(self, plan, image_array, depth, chunk_bytes, progress):
+        names = channel_names(image_array)
+        missing = [name for name in self.channels if name not in names]
+        if missing:
+            raise ValueError(f"Image has no {', '.join(missing)} channel")
+
+        height, width = image_array.shape[:2]
+        result = np.empty((height, width) + depth, dtype=np.uint8)
+        rows = max(1, chunk_bytes // max(1, width))
+        for top in range(0, height, rows):
+            block = image_array[top:top + rows]
+            values = {name: block if block.ndim == 2 else block[:, :, names.index(name)] for name in self.channels}
+            result[top:top + rows] = _evaluate_expression(plan, values)
+            if progress:
+                progress(min(1.0, (top + rows) / height))
+        return result
+
+
+def random_colour_map(seed=None):
+    """StegSolve-style random colour map: a random RGB colour for each of the 256 values"""
+    colours = np.random.default_rng(seed).integers(0, 256, (256, 3), dtype=np.uint8)
+    colours[0] = 0
+    return colours
+
+
+def extraction_plan(channels, bit_masks, channel_order='ARGBL'):
+    """(channel index, bit) pairs in the order bits are read from a pixel
+
+    Channels follow channel_order; within a channel the selected bits
+    are read from the most significant down, as StegSolve does.
+    """
+    plan = []
+    for letter in channel_order:
+        name = CHANNEL_LETTERS[letter]
+        if name not in channels:
+            continue
+        mask = bit_masks.get(name, 0)
+        plan.extend((channels.index(name), bit) for bit in range(7, -1, -1) if mask >> bit & 1)
+    return plan
+
+
+def _iter_pixel_blocks(data, order, chunk_pixels):
+    """Yield (pixels, fraction done) with pixels shaped (n, channels) in scan order"""
+    height, width, depth = data.shape
+    if order == 'row':
+        rows = max(1, chunk_pixels // width)
+        for top in range(0, height, rows):
+            yield data[top:top + rows].reshape(-1, depth), min(1.0, (top + rows) / height)
+    else:
+        cols = max(1, chunk_pixels // height)
+        for left in range(0, width, cols):
+            yield data[:, left:left + cols].transpose(1, 0, 2).reshape(-1, depth), min(1.0, (left + cols) / width)
+
+
+def iter_extract_data(image_array, bit_masks, order='row', bit_order='msb', channel_order='ARGBL',
+                      chunk_pixels=1 << 20, progress=None):
+    """Yield the byte stream hidden in the selected bits, chunk by chunk
+
+    bit_masks maps channel names to 8-bit masks, order is 'row' or
+    'column' and bit_order ('msb' or 'lsb') decides how the gathered
+    bits are packed into bytes. Every chunk of pixels is gathered and
+    packed with a single vectorized pass; bits that do not fill a whole
+    byte are carried into the next chunk.
+    """
+    data = image_array[:, :, None] if image_array.ndim == 2 else image_array
+    plan = extraction_plan(channel_names(image_array), bit_masks, channel_order)
+    if not plan:
+        return
+
+    columns = np.array([channel for channel, _ in plan])
+    shifts = np.array([bit for _, bit in plan], dtype=np.uint8)
+    bitorder = 'big' if bit_order == 'msb' else 'little'
+    leftover = np.zeros(0, dtype=np.uint8)
+
+    # Fast paths: evenly spaced channels (RGB, BGR, ...) are a strided view
+    # instead of a gather, and the same bit in every column is a scalar shift
+    step = int(columns[1] - columns[0]) if len(columns) > 1 else 1
+    if step and np.array_equal(columns, columns[0] + step * np.arange(len(columns))):
+        stop = int(columns[-1]) + step
+        columns = slice(int(columns[0]), stop if stop >= 0 else None, step)
+    if (shifts == shifts[0]).all():
+        shifts = shifts[0]
+
+    for pixels, done in _iter_pixel_blocks(data, order, chunk_pixels):
+        bits = ((pixels[:, columns] >> shifts) & 1).ravel()
+        if len(leftover):
+            bits = np.concatenate((leftover, bits))
+        usable = len(bits) // 8 * 8
+        yield np.packbits(bits[:usable], bitorder=bitorder).tobytes()
+        leftover = bits[usable:]
+        if progress:
+            progress(done)
+
+    if len(leftover):
+        yield np.packbits(leftover, bitorder=bitorder).tobytes()
+
+
+def extract_data(image_array, bit_masks, order='row', bit_order='msb', channel_order='ARGBL', limit=None):
+    """Hidden byte stream as bytes, optionally stopping after limit bytes"""
+    chunks = []
+    size = 0
+    for chunk in iter_extract_data(image_array, bit_masks, order, bit_order, channel_order,
+                                   chunk_pixels=(limit * 8 + 64) if limit else 1 << 20):
+        chunks.append(chunk)
+        size += len(chunk)
+        if limit is not None and size >= limit:
+            break
+    return b''.join(chunks)[:limit]
+
+
+def hex_dump(data, offset=0, width=16):
+    """Classic offset / hex / ASCII dump of a byte string"""
+    lines = []
+    for start in range(0, len(data), width):
+        row = data[start:start + width]
+        hex_part = ' '.join(f"{byte:02x}" for byte in row)
+        text = ''.join(chr(byte) if 32 <= byte <= 126 else '.' for byte in row)
+        lines.append(f"{offset + start:08x}  {hex_part:<{width * 3}} {text}")
+    return '\n'.join(lines)
+
+
+def _chi2_sf(chi2, df):
+    """Survival function of the chi-square distribution (Wilson-Hilferty)"""
+    chi2 = np.asarray(chi2, dtype=np.float64)
+    df = np.maximum(np.asarray(df, dtype=np.float64), 1)
+    scale = 2 / (9 * df)
+    z = (np.cbrt(chi2 / df) - (1 - scale)) / np.sqrt(scale)
+    return 0.5 * np.vectorize(math.erfc, otypes=[np.float64])(z / math.sqrt(2))
+
+
+def _smaller_root(a, b, c):
+    """Root of a*x^2 + b*x + c = 0 with the smaller absolute value, elementwise"""
+    a, b, c = (np.asarray(v, dtype=np.float64) for v in (a, b, c))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        disc = np.sqrt(np.maximum(b * b - 4 * a * c, 0))
+        roots = np.stack([(-b + disc) / (2 * a), (-b - disc) / (2 * a)])
+        linear = -c / b
+    root = np.where(np.abs(roots[0]) < np.abs(roots[1]), roots[0], roots[1])
+    return np.where(np.abs(a) < 1e-12, linear, root)
+
+
+def _block_sums(columns, per_block, blocks):
+    """Sum per-column counts into consecutive blocks of per_block columns"""
+    sums = np.zeros(blocks, dtype=np.int64)
+    if len(columns):
+        reduced = np.add.reduceat(columns, np.arange(0, len(columns), per_block))
+        sums[:len(reduced)] = reduced
+    return sums
+
+
+def chi_square_probability(pair_histogram):
+    """Westfeld-Pfitzmann chi-square attack on (..., 128, 2) pair-of-values counts
+
+    Returns the probability that the even/odd value pairs were equalized
+    by LSB embedding. Pairs with fewer than 5 samples are ignored.
+    """
+    pair_histogram = pair_histogram.astype(np.float64)
+    total = pair_histogram.sum(axis=-1)
+    used = total >= 5
+    expected = np.where(used, total / 2, 1)
+    chi2 = np.where(used, (pair_histogram[..., 0] - expected) ** 2 / expected, 0).sum(axis=-1)
+    df = used.sum(axis=-1) - 1
+    return np.where(df > 0, _chi2_sf(chi2, df), 0.0)
+
+
+def rs_estimate(counts):
+    """Fridrich RS estimate of the embedding rate from (..., 8) group counts
+
+    counts holds R_M, S_M, R_-M, S_-M for the image and then for the
+    image with all LSBs flipped.
+    """
+    counts = counts.astype(np.float64)
+    d0 = counts[..., 0] - counts[..., 1]
+    e0 = counts[..., 2] - counts[..., 3]
+    d1 = counts[..., 4] - counts[..., 5]
+    e1 = counts[..., 6] - counts[..., 7]
+    z = _smaller_root(2 * (d1 + d0), e0 - e1 - d1 - 3 * d0, d0 - e0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = z / (z - 0.5)
+    return np.clip(np.nan_to_num(rate), 0, 1)
+
+
+def spa_estimate(counts):
+    """Dumitrescu sample pair estimate of the embedding rate from (..., 5) counts
+
+    counts holds |X|, |Y|, |Z|, |W| and the number of pairs |P|.
+    """
+    counts = counts.astype(np.float64)
+    x, y, z, w, pairs = (counts[..., i] for i in range(5))
+    rate = _smaller_root(0.5 * (w + z), 2 * x - pairs, y - x)
+    return np.clip(np.nan_to_num(rate), 0, 1)
+
+
+def _column_counts(mask):
+    """Number of set entries in every column of a 2D boolean or 0/1 mask"""
+    # A narrow accumulator is several times faster; strips never reach 65536 rows
+    return mask.view(np.uint8).sum(axis=0, dtype=np.uint16).astype(np.int64)
+
+
+def _strip_counts(strip, block_size, blocks):
+    """Per-block histogram, RS and sample pair counts for one strip of rows"""
+    rows, width = strip.shape
+
+    # Value histogram of every block from a single bincount
+    keys = (np.arange(width, dtype=np.intp) // block_size * 256)[None, :] + strip
+    histogram = np.bincount(keys.ravel(), minlength=blocks * 256).reshape(blocks, 256)
+
+    # Sample pairs: horizontally adjacent pixels, owned by the left one's block.
+    # Every pair that is not in X or Z is in Y, so Y needs no mask of its own
+    u, v = strip[:, :-1], strip[:, 1:]
+    differ = u != v
+    equal = rows - _column_counts(differ)
+    x = _column_counts(((u < v).view(np.uint8) ^ (v & 1)) & differ)  # u < v for even v, u > v for odd
+    w = _column_counts((u ^ v) == 1)
+    spa = [_block_sums(column, block_size, blocks) for column in (x, rows - equal - x, equal, w)]
+    spa.append(_block_sums(np.full(width - 1, rows), block_size, blocks))
+
+    # RS: groups of 4 pixels (a, b, c, d) with mask [0, 1, 1, 0], on the
+    # strip and its LSB-flipped copy. Only b and c change under the flipping
+    # functions, so the discrimination terms are built from the strided columns
+    groups = strip[:, :width // 4 * 4].astype(np.int16).reshape(rows, -1, 4)
+    columns = [groups[..., i] for i in range(4)]
+    rs = []
+    for flip in (0, 1):
+        a, b, c, d = (column ^ flip for column in columns) if flip else columns
+        base = np.abs(b - a) + np.abs(c - b) + np.abs(d - c)
+        positive = (b ^ 1, c ^ 1)  # F1: 2k <-> 2k+1
+        negative = (((b + 1) ^ 1) - 1, ((c + 1) ^ 1) - 1)  # F-1: 2k-1 <-> 2k
+        for fb, fc in (positive, negative):
+            changed = np.abs(fb - a) + np.abs(fc - fb) + np.abs(d - fc)
+            rs.append(_block_sums(_column_counts(changed > base), block_size // 4, blocks))
+            rs.append(_block_sums(_column_counts(changed < base), block_size // 4, blocks))
+
+    return histogram, np.stack(spa, axis=-1), np.stack(rs, axis=-1)
+
+
+def lsb_analysis(image_array, block_size=64, progress=None):
+    """Chi-square, RS and sample pair LSB steganalysis of every colour channel
+
+    Each channel is processed in strips of block_size rows; per-block
+    histograms and pair/group counts come from vectorized passes and are
+    summed for the whole-image verdict, so block maps cost nothing extra.
+    Rates are fractions of the pixels carrying message bits.
+    """
+    block_size = min(4096, max(4, block_size // 4 * 4))
+    names = [name for name in channel_names(image_array) if name != 'Alpha']
+    height, width = image_array.shape[:2]
+    blocks_y = -(-height // block_size)
+    blocks_x = -(-width // block_size)
+
+    result = {'block_size': block_size, 'channels': {}}
+    for index, name in enumerate(names):
+        data = image_array if image_array.ndim == 2 else image_array[:, :, index]
+        histograms, spa_counts, rs_counts = [], [], []
+        for top in range(0, height, block_size):
+            strip = np.ascontiguousarray(data[top:top + block_size])
+            histogram, spa, rs = _strip_counts(strip, block_size, blocks_x)
+            histograms.append(histogram)
+            spa_counts.append(spa)
+            rs_counts.append(rs)
+            if progress:
+                progress((index + min(1.0, (top + block_size) / height)) / len(names))
+
+        histograms = np.stack(histograms).reshape(blocks_y, blocks_x, 128, 2)
+        spa_counts = np.stack(spa_counts)
+        rs_counts = np.stack(rs_counts)
+
+        rs_rate = float(rs_estimate(rs_counts.sum(axis=(0, 1))))
+        spa_rate = float(spa_estimate(spa_counts.sum(axis=(0, 1))))
+        result['channels'][name] = {
+            'chi_square': float(chi_square_probability(histograms.sum(axis=(0, 1)))),
+            'rs': rs_rate,
+            'spa': spa_rate,
+            'payload_bytes': int((rs_rate + spa_rate) / 2 * height * width / 8),
+            'maps': {
+                'chi_square': chi_square_probability(histograms),
+                'rs': rs_estimate(rs_counts),
+                'spa': spa_estimate(spa_counts),
+            },
+        }
+
+    result['payload_bytes'] = sum(channel['payload_bytes'] for channel in result['channels'].values())
+    return result
+
+
+def format_lsb_analysis(result):
+    """Render an LSB steganalysis report as text"""
+    text = ""
+    for name, channel in result['channels'].items():
+        text += "Grayscale Image:\n" if name == 'Gray' else f"{name} Channel:\n"
+        text += f"  Chi-square embedding probability: {channel['chi_square']:.3f}\n"
+        text += f"  RS estimated rate: {channel['rs'] * 100:.1f}%\n"
+        text += f"  Sample pairs estimated rate: {channel['spa'] * 100:.1f}%\n"
+        text += f"  Estimated payload: {channel['payload_bytes']} bytes\n\n"
+    text += f"Estimated total payload: {result['payload_bytes']} bytes\n"
+    return text
+
+
+def heatmap_overlay(image_array, block_map, block_size, opacity=0.5):
+    """Blend a per-block map (0..1) in red over a grayscale copy of the image"""
+    height, width = image_array.shape[:2]
+    base = Image.fromarray(image_array if image_array.ndim == 2 else image_array[:, :, :3]).convert('L')
+
+    values = (np.clip(block_map, 0, 1) * 255).astype(np.uint8)
+    heat = np.dstack([values, np.zeros_like(values), 255 - values])
+    heat = Image.fromarray(heat).resize((values.shape[1] * block_size, values.shape[0] * block_size),
+                                        Image.Resampling.NEAREST).crop((0, 0, width, height))
+    return Image.blend(base.convert('RGB'), heat, opacity)
+
+
+class ImagePyramid:
+    """Multi-resolution copies of an image for fast zoomed display
+
+    Level k is the source reduced by 2**k. Levels are built lazily, each
+    from the previous one, so any zoom level is resampled from a copy at
+    most twice its size. Binary images (bit planes) are scaled with
+    nearest neighbour so single-pixel patterns are never blurred.
+    """
+
+    def __init__(self, image, binary=False):
+        # Show multi-band colour spaces (HSV, YCbCr, ...) band for band as RGB
+        if image.mode not in ('L', 'RGB', 'RGBA'):
+            if len(image.getbands()) == 3 and image.mode not in ('P', 'PA'):
+                image = Image.merge('RGB', image.split())
+            else:
+                transparent = 'A' in image.getbands() or 'transparency' in image.info
+                image = image.convert('RGBA' if transparent else 'RGB')
+
+        self.binary = binary
+        self.size = image.size
+        self.levels = [image]
+
+    def level(self, index):
+        while len(self.levels) <= index:
+            previous = self.levels[-1]
+            if previous.width <= 1 and previous.height <= 1:
+                return previous
+            if self.binary:
+                size = ((previous.width + 1) // 2, (previous.height + 1) // 2)
+                self.levels.append(previous.resize(size, Image.Resampling.NEAREST))
+            else:
+                self.levels.append(previous.reduce(2))
+        return self.levels[index]
+
+    def fit_zoom(self, width, height):
+        """Zoom that fits the image into width x height without enlarging it"""
+        img_width, img_height = self.size
+        return min(1.0, width / img_width, height / img_height)
+
+    def prepare(self, width, height):
+        """Build the levels needed to show the image fitted to width x height"""
+        self.level(self.level_for(self.fit_zoom(width, height)))
+        return self
+
+    def level_for(self, zoom):
+        """Smallest level that still has at least one pixel per screen pixel"""
+        return max(0, int(math.floor(math.log2(1 / zoom)))) if zoom < 1 else 0
+
+    def render_tile(self, zoom, tx, ty, tile_size=256):
+        """Render one tile of the image scaled by zoom, or None if off the image
+
+        Tiles are addressed in scaled-image pixels: tile (tx, ty) covers
+        [tx * tile_size, (tx + 1) * tile_size) horizontally.
+        """
+        width, height = self.size
+        x0, y0 = tx * tile_size, ty * tile_size
+        x1 = min((tx + 1) * tile_size, width * zoom)
+        y1 = min((ty + 1) * tile_size, height * zoom)
+        if x1 <= x0 or y1 <= y0:
+            return None
+
+        level = self.level(self.level_for(zoom))
+        sx, sy = level.width / width, level.height / height
+        box = (x0 / zoom * sx, y0 / zoom * sy, x1 / zoom * sx, y1 / zoom * sy)
+        size = (int(math.ceil(x1)) - x0, int(math.ceil(y1)) - y0)
+
+        resample = Image.Resampling.NEAREST if self.binary or zoom >= 1 else Image.Resampling.BILINEAR
+        return level.resize(size, resample, box=box)
+
+
+# Default memory budget of cached operation results
+RESULT_CACHE_BYTES = 512 * 1024 * 1024
+
+
+def content_key(image_array):
+    """Short digest identifying an image by its pixels, shape and type"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((image_array.shape, image_array.dtype.str)).encode())
+    digest.update(np.ascontiguousarray(image_array).data)
+    return digest.hexdigest()
+
+
+def file_key(filepath):
+    """Short digest identifying a file by its bytes, read in chunks"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(SCAN_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def result_size(value):
+    """Approximate memory held by a cached result in bytes"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, Image.Image):
+        return value.width * value.height * len(value.getbands())
+    if isinstance(value, ImagePyramid):
+        # Reduced levels add at most a third of the full image
+        return result_size(value.levels[0]) * 4 // 3
+    if isinstance(value, (tuple, list)):
+        return sum(result_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(result_size(item) for item in value.values())
+    return 0
+
+
+class ResultCache:
+    """Operation results keyed by (image, operation, parameters) with LRU eviction
+
+    The least recently used results are dropped once the total size
+    exceeds budget_bytes; a result larger than the whole budget is
+    not stored at all.
+    """
+
+    def __init__(self, budget_bytes=RESULT_CACHE_BYTES):
+        self.budget_bytes = budget_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, size=None):
+        size = result_size(value) if size is None else size
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            if size > self.budget_bytes:
+                return value
+            self.entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.budget_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted
+        return value
+
+    def get_or_compute(self, key, compute):
+        """Cached result for key, computing and storing it on a miss"""
+        value = self.get(key, self)
+        if value is self:
+            value = self.put(key, compute())
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+
+# Default memory budget of decoded animation frames
+FRAME_CACHE_BYTES = 256 * 1024 * 1024
+
+# Parsed GIF frame: placement, palette and LZW data ranges in the file
+GifFrame = namedtuple('GifFrame', 'left top width height flags palette data disposal transparency duration')
+
+
+def _skip_sub_blocks(data, position):
+    """Position after a chain of GIF data sub-blocks"""
+    while position < len(data):
+        length = data[position]
+        position += 1 + length
+        if not length:
+            break
+    return position
+
+
+def parse_gif(data):
+    """Screen size, global palette range and the frames of a GIF, without decoding pixels"""
+    width, height = struct.unpack('<HH', data[6:10])
+    flags = data[10]
+    position = 13
+    palette = None
+    if flags & 0x80:
+        palette = (position, position + (3 << ((flags & 7) + 1)))
+        position = palette[1]
+
+    frames = []
+    control = None
+    while position < len(data):
+        block = data[position]
+        if block == 0x21:
+            if data[position + 1] == 0xF9 and data[position + 2] >= 4:
+                control = data[position + 3:position + 7]
+            position = _skip_sub_blocks(data, position + 2)
+        elif block == 0x2C:
+            left, top, frame_width, frame_height, frame_flags = struct.unpack('<HHHHB', data[position + 1:position + 10])
+            position += 10
+            local = None
+            if frame_flags & 0x80:
+                local = (position, position + (3 << ((frame_flags & 7) + 1)))
+                position = local[1]
+            start = position
+            position = _skip_sub_blocks(data, position + 1)
+            disposal, transparency, duration = 0, None, 0
+            if control:
+                disposal = control[0] >> 2 & 7
+                transparency = control[3] if control[0] & 1 else None
+                duration = int.from_bytes(control[1:3], 'little') * 10
+            frames.append(GifFrame(left, top, frame_width, frame_height, frame_flags,
+                                   local or palette, (start, position), disposal, transparency, duration))
+            control = None
+        else:
+            break  # trailer or corrupt data
+    return (width, height), palette, frames
+
+
+class FrameDecoder:
+    """Random access to the composited frames of an animation
+
+    The decoder has its own file handle, so browsing never moves the
+    frame position of an image shown elsewhere. GIF frames are decoded
+    one at a time from their own LZW data and composited here, which
+    allows resuming from a checkpoint: the canvas a frame is drawn on
+    is kept every keyframe_interval frames, so seeking backwards
+    decodes at most that many frames instead of restarting at frame 0.
+    Displayed frames are cached as RGBA arrays in an LRU bounded by
+    budget_bytes; checkpoints use at most a quarter of it. Other
+    formats fall back to sequential Pillow seeking with the same cache
+    and no frame durations.
+    """
+
+    def __init__(self, filepath, budget_bytes=FRAME_CACHE_BYTES):
+        self.budget_bytes = budget_bytes
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()  # frame index -> RGBA array, LRU order
+        self.cache_bytes = 0
+        self.checkpoints = {}  # frame index -> canvas the frame is drawn on
+        self.cursor = None  # (next frame index, canvas it is drawn on)
+
+        self.file = open(filepath, 'rb')
+        header = self.file.read(6)
+        self.file.seek(0)
+        if header in (b'GIF87a', b'GIF89a'):
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.size, self.palette, self.frames = parse_gif(self.data)
+            self.n_frames = len(self.frames)
+            self.durations = [frame.duration for frame in self.frames]
+            self.image = None
+        else:
+            self.data = None
+            self.image = Image.open(self.file)
+            self.size = self.image.size
+            self.n_frames = getattr(self.image, 'n_frames', 1)
+            self.durations = None  # only known after decoding every frame
+
+        frame_bytes = self.size[0] * self.size[1] * 4
+        checkpoints = max(1, budget_bytes // 4 // max(1, frame_bytes))
+        self.keyframe_interval = max(1, -(-self.n_frames // checkpoints))
+
+    def close(self):
+        with self.lock:
+            if self.data is not None:
+                self.data.close()
+            self.file.close()
+
+    def cached(self, index):
+        return index in self.cache
+
+    def frame(self, index):
+        """Composited RGBA array of one frame (read-only, shared with the cache)"""
+        if not 0 <= index < self.n_frames:
+            raise IndexError(f"Frame {index} out of range (0-{self.n_frames - 1})")
+        with self.lock:
+            if index in self.cache:
+                self.cache.move_to_end(index)
+                return self.cache[index]
+            if self.data is None:
+                self.image.seek(index)
+                rgba = np.array(self.image.convert('RGBA'))
+            else:
+                rgba = self._render_gif(index)
+            self._store(index, rgba)
+            return rgba
+
+    def prefetch(self, indices, progress=None):
+        """Decode frames into the cache; progress may raise Cancelled between frames"""
+        indices = [index for index in indices if 0 <= index < self.n_frames]
+        for done, index in enumerate(indices):
+            if progress:
+                progress(done / len(indices))
+            self.frame(index)
+
+    def _store(self, index, rgba):
+        rgba.flags.writeable = False
+        self.cache[index] = rgba
+        self.cache_bytes += rgba.nbytes
+        while self.cache_bytes > self.budget_bytes and len(self.cache) > 1:
+            _, evicted = self.cache.popitem(last=False)
+            self.cache_bytes -= evicted.nbytes
+
+    def _render_gif(self, index):
+        # Start from the closest checkpoint or the last decoded position
+        start = max((key for key in self.checkpoints if key <= index), default=0)
+        canvas = self.checkpoints.get(start)
+        if self.cursor and start <= self.cursor[0] <= index:
+            start, canvas = self.cursor
+        if canvas is None:
+            canvas = np.zeros((self.size[1], self.size[0], 4), dtype=np.uint8)
+            canvas.flags.writeable = False
+
+        for current in range(start, index + 1):
+            if current % self.keyframe_interval == 0:
+                self.checkpoints[current] = canvas
+            shown = self._draw_gif_frame(canvas, self.frames[current])
+            if current < index and current not in self.cache:
+                self._store(current, shown)
+            canvas = self._dispose(canvas, shown, self.frames[current], current)
+        self.cursor = (index + 1, canvas)
+        return shown
+
+    def _draw_gif_frame(self, canvas, frame):
+        shown = canvas.copy()
+        left, top = min(frame.left, self.size[0]), min(frame.top, self.size[1])
+        right, bottom = min(frame.left + frame.width, self.size[0]), min(frame.top + frame.height, self.size[1])
+        if right > left and bottom > top:
+            indices = self._decode_gif_frame(frame)[:bottom - top, :right - left]
+            colours = np.zeros((256, 4), dtype=np.uint8)
+            if frame.palette:
+                table = np.frombuffer(self.data[frame.palette[0]:frame.palette[1]], dtype=np.uint8).reshape(-1, 3)
+                colours[:len(table), :3] = table
+                colours[:len(table), 3] = 255
+
+            # Whole RGBA pixels are moved as 32-bit words; transparent
+            # pixels leave the canvas underneath visible
+            pixels = colours.view(np.uint32)[:, 0][indices]
+            region = shown.view(np.uint32)[top:bottom, left:right, 0]
+            if frame.transparency is None:
+                region[:] = pixels
+            else:
+                np.copyto(region, pixels, where=indices != frame.transparency)
+        shown.flags.writeable = False
+        return shown
+
+    def _decode_gif_frame(self, frame):
+        # Wrap the frame's LZW data in a minimal single-frame GIF for Pillow
+        palette = b''
+        flags = 0
+        if frame.palette:
+            palette = self.data[frame.palette[0]:frame.palette[1]]
+            flags = 0x80 | (frame.flags & 7 if frame.flags & 0x80 else self.data[10] & 7)
+        mini = (b'GIF89a' + struct.pack('<HHBBB', frame.width, frame.height, flags, 0, 0) + palette
+                + b',' + struct.pack('<HHHHB', 0, 0, frame.width, frame.height, frame.flags & 0x40)
+                + self.data[frame.data[0]:frame.data[1]] + b';')
+        with Image.open(io.BytesIO(mini)) as image:
+            return np.asarray(image)
+
+    def _dispose(self, canvas, shown, frame, index):
+        """Canvas the next frame is drawn on"""
+        if frame.disposal == 2:
+            # Restore to background: clear the frame's area
+            cleared = shown.copy()
+            cleared[frame.top:frame.top + frame.height, frame.left:frame.left + frame.width] = 0
+            cleared.flags.writeable = False
+            return cleared
+        if frame.disposal == 3 and index:
+            return canvas  # restore to previous; the first frame has nothing to restore
+        return shown
+
+
+# Frame stack: every frame of an animation or multi-page image in one array
+
+# Default memory budget of a frame stack; larger stacks are kept in a temporary file
+FRAME_STACK_BYTES = 512 * 1024 * 1024
+
+# Bytes of frames the stack analyses process at a time
+FRAME_STACK_CHUNK_BYTES = 16 * 1024 * 1024
+
+# Channels of every stacked frame
+FRAME_STACK_CHANNELS = ('Red', 'Green', 'Blue', 'Alpha')
+
+# Whole-stack bit plane views
+STACK_VIEWS = ('xor', 'changes')
+
+# Browsers show frames with shorter delays (GIF 0 or 1 centiseconds) for 100 ms
+MIN_FRAME_DURATION = 20
+
+
+class FrameStack:
+    """Every composited frame of an animation decoded once into one (frames, height, width, 4) array
+
+    GIF frames are rendered by FrameDecoder; APNG, multi-page TIFF and
+    other formats are seeked through with Pillow, pages smaller than
+    the largest one placed at the top left. A stack larger than
+    budget_bytes is written to an anonymous temporary file and
+    memory-mapped, and the analyses stream through it in chunks of
+    frames. durations (ms, None for formats without timing), palettes
+    (RGB bytes or None) and regions (left, top, width, height of the
+    frame data) are kept per frame, and key identifies the file's content.
+    """
+
+    def __init__(self, filepath, budget_bytes=FRAME_STACK_BYTES, progress=None):
+        self.backing = None
+        self.key = file_key(filepath)
+        with open(filepath, 'rb') as f:
+            header = f.read(6)
+        if header in (b'GIF87a', b'GIF89a'):
+            self._read_gif(filepath, budget_bytes, progress)
+        else:
+            self._read_pillow(filepath, budget_bytes, progress)
+
+    @property
+    def n_frames(self):
+        return len(self.frames)
+
+    def close(self):
+        # The temporary file is already unlinked; its space is freed with the last view of the map
+        if self.backing is not None:
+            self.backing.close()
+            self.backing = None
+
+    def _allocate(self, count, width, height, budget_bytes):
+        self.size = (width, height)
+        shape = (count, height, width, 4)
+        if count * height * width * 4 <= budget_bytes:
+            self.frames = np.zeros(shape, dtype=np.uint8)
+        else:
+            self.backing = tempfile.TemporaryFile()
+            self.frames = np.memmap(self.backing, dtype=np.uint8, mode='w+', shape=shape)
+        self.mapped = self.backing is not None
+
+    def _read_gif(self, filepath, budget_bytes, progress):
+        self.format = 'GIF'
+        # A zero budget keeps just the last frame; sequential access never seeks back
+        decoder = FrameDecoder(filepath, budget_bytes=0)
+        try:
+            frames = decoder.frames
+            self._allocate(len(frames), decoder.size[0], decoder.size[1], budget_bytes)
+            self.durations = list(decoder.durations)
+            self.palettes = [None if frame.palette is None else bytes(decoder.data[frame.palette[0]:frame.palette[1]])
+                             for frame in frames]
+            self.local_palettes = [bool(frame.flags & 0x80) for frame in frames]
+            self.regions = [(frame.left, frame.top, frame.width, frame.height) for frame in frames]
+            for index in range(len(frames)):
+                if progress:
+                    progress(index / len(frames))
+                self.frames[index] = decoder.frame(index)
+        except BaseException:
+            self.close()
+            raise
+        finally:
+            decoder.close()
+
+    def _read_pillow(self, filepath, budget_bytes, progress):
+        with Image.open(filepath) as image:
+            self.format = image.format
+            # Headers first: page sizes, timing and palettes decide the stack shape
+            count = getattr(image, 'n_frames', 1)
+            sizes, durations, palettes = [], [], []
+            for index in range(count):
+                image.seek(index)
+                sizes.append(image.size)
+                durations.append(image.info.get('duration'))
+                palettes.append(bytes(image.getpalette() or b'') or None if image.mode == 'P' else None)
+            self._allocate(count, max(w for w, _ in sizes), max(h for _, h in sizes), budget_bytes)
+            timed = any(duration is not None for duration in durations)
+            self.durations = [int(duration or 0) for duration in durations] if timed else None
+            self.palettes = palettes
+            self.local_palettes = [False] * count
+            self.regions = [(0, 0, width, height) for width, height in sizes]
+
+            try:
+                for index, (width, height) in enumerate(sizes):
+                    if progress:
+                        progress(index / count)
+                    image.seek(index)
+                    self.frames[index, :height, :width] = np.asarray(image.convert('RGBA'))
+            except BaseException:
+                self.close()
+                raise
+
+    def chunks(self, chunk_bytes=FRAME_STACK_CHUNK_BYTES, frame_overhead=0):
+        """(first frame index, block of frames) covering the stack
+
+        Each block holds at most chunk_bytes of frames plus frame_overhead
+        bytes of per-frame temporaries the caller allocates.
+        """
+        step = max(1, chunk_bytes // max(1, self.frames[0].nbytes + frame_overhead))
+        for start in range(0, self.n_frames, step):
+            yield start, self.frames[start:start + step]
+
+
+def frame_statistics(stack, chunk_bytes=FRAME_STACK_CHUNK_BYTES, progress=None):
+    """Per-frame, per-channel statistics of a frame stack from one offset bincount per chunk and channel
+
+    Returns arrays over (frames, channels): min, max, mean, std,
+    entropy and ones (frames, channels, 8) for every bit plane. The
+    histograms only exist for one chunk at a time.
+    """
+    stats = {'min': np.zeros((stack.n_frames, 4), dtype=np.intp), 'max': np.zeros((stack.n_frames, 4), dtype=np.intp),
+             'mean': np.zeros((stack.n_frames, 4)), 'std': np.zeros((stack.n_frames, 4)),
+             'entropy': np.zeros((stack.n_frames, 4)), 'ones': np.zeros((stack.n_frames, 4, 8))}
+    values = np.arange(256)
+    bits = (values[:, None] >> np.arange(8)) & 1
+    total = stack.size[0] * stack.size[1]
+    # Per frame: the offset values of one channel, and its histograms with their float temporaries
+    overhead = total * np.dtype(np.intp).itemsize + 4 * 4 * 256 * 8
+    for start, block in stack.chunks(chunk_bytes, overhead):
+        count = len(block)
+        histograms = np.empty((count, 4, 256), dtype=np.int64)
+        # Offsetting every frame by 256 gives all its histograms in one bincount
+        offsets = (np.arange(count, dtype=np.intp) << 8)[:, None, None]
+        for channel in range(4):
+            counts = np.bincount((block[..., channel] + offsets).ravel(), minlength=count << 8)
+            histograms[:, channel] = counts.reshape(count, 256)
+
+        frames = slice(start, start + count)
+        mean = histograms @ values / total
+        probabilities = histograms / total
+        present = histograms > 0
+        stats['min'][frames] = present.argmax(axis=-1)
+        stats['max'][frames] = 255 - present[..., ::-1].argmax(axis=-1)
+        stats['mean'][frames] = mean
+        stats['std'][frames] = np.sqrt(np.maximum(0.0, histograms @ (values * values) / total - mean * mean))
+        stats['entropy'][frames] = -(probabilities * np.log2(np.where(present, probabilities, 1))).sum(axis=-1)
+        stats['ones'][frames] = histograms @ bits / total
+        if progress:
+            progress(min(1.0, (start + count) / stack.n_frames))
+    return stats
+
+
+def frame_differences(stack, chunk_bytes=FRAME_STACK_CHUNK_BYTES, progress=None):
+    """Changes between consecutive frames of a stack, vectorized over chunks of frames
+
+    Pixels are compared as 32-bit RGBA words. Returns arrays over the
+    n - 1 frame pairs: changed pixels, low_bit (pixels where nothing
+    but bit 0 of some channels changed), mean absolute difference per
+    channel value, and the bounding box of the changes (None if equal).
+    """
+    pairs = max(0, stack.n_frames - 1)
+    changed = np.zeros(pairs, dtype=np.int64)
+    low_bit = np.zeros(pairs, dtype=np.int64)
+    difference = np.zeros(pairs)
+    boxes = [None] * pairs
+    step = max(1, chunk_bytes // max(1, stack.frames[0].nbytes))
+    for start in range(0, pairs, step):
+        # Overlapping windows: the last frame of one is the first of the next
+        window = stack.frames[start:start + step + 1]
+        earlier, later = window[:-1], window[1:]
+        words = window.view(np.uint32)[..., 0]
+        xor = words[:-1] ^ words[1:]
+        differ = xor != 0
+        count = np.count_nonzero(differ, axis=(1, 2))
+        changed[start:start + len(later)] = count
+        low_bit[start:start + len(later)] = np.count_nonzero(differ & (xor & np.uint32(0xFEFEFEFE) == 0), axis=(1, 2))
+        difference[start:start + len(later)] = (np.maximum(earlier, later) - np.minimum(earlier, later)).reshape(
+            len(later), -1).sum(axis=1, dtype=np.uint64) / later[0].size
+
+        rows, columns = differ.any(axis=2), differ.any(axis=1)
+        for offset in np.flatnonzero(count):
+            ys, xs = np.flatnonzero(rows[offset]), np.flatnonzero(columns[offset])
+            boxes[start + offset] = (int(xs[0]), int(ys[0]), int(xs[-1]) + 1, int(ys[-1]) + 1)
+        if progress:
+            progress(min(1.0, (start + len(later)) / pairs))
+    return {'changed': changed, 'low_bit': low_bit, 'difference': difference, 'bbox': boxes,
+            'total': stack.size[0] * stack.size[1]}
+
+
+def frame_palettes(stack):
+    """Per-frame palette size, local flag, entries changed since the previous palette and duplicate colours"""
+    result = []
+    previous = None
+    for index, palette in enumerate(stack.palettes):
+        if palette is None:
+            previous = None
+            continue
+        entries = np.frombuffer(palette, dtype=np.uint8)[:len(palette) // 3 * 3].reshape(-1, 3)
+        changed = 0
+        if previous is not None:
+            common = min(len(entries), len(previous))
+            changed = int(np.count_nonzero((entries[:common] != previous[:common]).any(axis=1)))
+            changed += abs(len(entries) - len(previous))
+        result.append({'frame': index, 'entries': len(entries), 'local': stack.local_palettes[index],
+                       'changed': changed, 'duplicates': len(entries) - len(np.unique(entries, axis=0))})
+        previous = entries
+    return result
+
+
+def frame_timing(durations):
+    """Frame delay summary and anomalies: short or zero delays, irregular frames, delays spelling text or bits"""
+    if not durations:
+        return None
+    delays = np.asarray(durations)
+    values, counts = np.unique(delays, return_counts=True)
+    usual = int(values[counts.argmax()])
+    # GIF delays are centiseconds; other formats count milliseconds
+    units = delays // 10 if not (delays % 10).any() else delays
+    timing = {
+        'total': int(delays.sum()),
+        'usual': usual,
+        'distinct': len(values),
+        'short': np.flatnonzero(delays < MIN_FRAME_DURATION).tolist(),
+        'irregular': np.flatnonzero(delays != usual).tolist(),
+        'text': None,
+        'bits': None,
+        'bytes': None,
+    }
+    if len(delays) >= 4 and ((units >= 32) & (units < 127)).all():
+        timing['text'] = bytes(units.astype(np.uint8)).decode('ascii')
+    if len(values) == 2 and len(delays) >= 8:
+        # Two delays alternating as bit values, longer delay = 1
+        bits = (delays == values[1]).astype(np.uint8)
+        timing['bits'] = ''.join(map(str, bits))
+        timing['bytes'] = np.packbits(bits[:len(bits) // 8 * 8]).tobytes().hex()
+    return timing
+
+
+def stack_plane(stack, channel, bit, view='xor', chunk_bytes=FRAME_STACK_CHUNK_BYTES, progress=None):
+    """One bit plane over the whole stack as a 0-255 image
+
+    'xor' is the parity of the bit across all frames, which reveals data
+    split over frames; 'changes' counts per pixel how often the bit
+    flips from one frame to the next, scaled so the busiest pixel is white.
+    """
+    if view not in STACK_VIEWS:
+        raise ValueError(f"Unknown stack view: {view}")
+    index = FRAME_STACK_CHANNELS.index(channel)
+    width, height = stack.size
+    parity = np.zeros((height, width), dtype=np.uint8)
+    flips = np.zeros((height, width), dtype=np.uint32)
+    last = None
+    for start, block in stack.chunks(chunk_bytes):
+        planes = block[..., index] >> bit & 1
+        if view == 'xor':
+            parity ^= np.bitwise_xor.reduce(planes, axis=0)
+        else:
+            if last is not None:
+                flips += planes[0] ^ last
+            flips += np.count_nonzero(planes[1:] != planes[:-1], axis=0).astype(np.uint32)
+            last = planes[-1]
+        if progress:
+            progress(min(1.0, (start + len(block)) / stack.n_frames))
+    if view == 'xor':
+        return parity * 255
+    peak = flips.max()
+    return (flips * (255.0 / peak)).astype(np.uint8) if peak else flips.astype(np.uint8)
+
+
+def frame_analysis(stack, progress=None):
+    """JSON-ready statistics, inter-frame changes, palettes, timing and anomalies of a frame stack"""
+    report = lambda low, high: (lambda done: progress(low + done * (high - low))) if progress else None
+    stats = frame_statistics(stack, progress=report(0.0, 0.5))
+    changes = frame_differences(stack, progress=report(0.5, 1.0))
+    palettes = frame_palettes(stack)
+    timing = frame_timing(stack.durations)
+    width, height = stack.size
+
+    # Alpha is reported only where some frame is not fully opaque
+    channels = list(FRAME_STACK_CHANNELS[:3])
+    if (stats['min'][:, 3] < 255).any():
+        channels.append('Alpha')
+    frames = []
+    for index in range(stack.n_frames):
+        frame = {'frame': index, 'region': list(stack.regions[index])}
+        if stack.durations is not None:
+            frame['duration'] = stack.durations[index]
+        frame['channels'] = {name: {'mean': float(stats['mean'][index, channel]),
+                                    'std': float(stats['std'][index, channel]),
+                                    'entropy': float(stats['entropy'][index, channel]),
+                                    'lsb_ones': float(stats['ones'][index, channel, 0])}
+                             for channel, name in enumerate(channels)}
+        if index:
+            frame['changed'] = int(changes['changed'][index - 1])
+            frame['low_bit'] = int(changes['low_bit'][index - 1])
+            frame['difference'] = float(changes['difference'][index - 1])
+            frame['bbox'] = changes['bbox'][index - 1]
+        frames.append(frame)
+
+    anomalies = []
+    for index, (left, top, region_width, region_height) in enumerate(stack.regions):
+        if left + region_width > width or top + region_height > height:
+            anomalies.append(f"Frame {index} extends beyond the {width}x{height} canvas "
+                             f"({region_width}x{region_height} at {left},{top}); the excess is never shown")
+    sizes = [tuple(region[2:]) for region in stack.regions]
+    if stack.format != 'GIF' and len(set(sizes)) > 1:
+        usual_width, usual_height = max(set(sizes), key=sizes.count)
+        odd = [index for index, size in enumerate(sizes) if size != (usual_width, usual_height)]
+        anomalies.append(f"{len(odd)} pages are not {usual_width}x{usual_height} (frames {odd[:20]}); "
+                         f"smaller pages are padded to {width}x{height}")
+    for index in np.flatnonzero(changes['low_bit'] * 2 > changes['changed']):
+        anomalies.append(f"Frame {index + 1} differs from frame {index} mostly in bit 0 "
+                         f"({int(changes['low_bit'][index])} of {int(changes['changed'][index])} changed pixels)")
+    identical = int(np.count_nonzero(changes['changed'] == 0))
+    if identical:
+        anomalies.append(f"{identical} frames are identical to the previous frame")
+
+    # LSB ones ratios far from those of the other frames
+    lsb = stats['ones'][:, :len(channels), 0]
+    spread = np.median(np.abs(lsb - np.median(lsb, axis=0)), axis=0)
+    outliers = np.abs(lsb - np.median(lsb, axis=0)) > np.maximum(4 * spread, 0.05)
+    for index, channel in zip(*np.nonzero(outliers)):
+        anomalies.append(f"Frame {index} {channels[channel]} LSB ones ratio {lsb[index, channel]:.3f} "
+                         f"(median {np.median(lsb[:, channel]):.3f})")
+
+    changed_palettes = [palette for palette in palettes if palette['changed']]
+    if changed_palettes:
+        anomalies.append(f"Palette changes in {len(changed_palettes)} frames")
+    if timing:
+        if timing['short']:
+            anomalies.append(f"{len(timing['short'])} frames have delays under {MIN_FRAME_DURATION} ms "
+                             "(zero delay frames are hardly visible)")
+        if timing['text']:
+            anomalies.append(f"Frame delays spell text: {timing['text']!r}")
+        if timing['bits']:
+            anomalies.append(f"Frame delays alternate between two values (bytes {timing['bytes'][:64]})")
+
+    return {
+        'format': stack.format,
+        'frames': stack.n_frames,
+        'width': width,
+        'height': height,
+        'mapped': stack.mapped,
+        'channels': channels,
+        'per_frame': frames,
+        'palettes': palettes,
+        'timing': timing,
+        'anomalies': anomalies,
+    }
+
+
+def format_frame_analysis(result, max_frames=50):
+    """Render a frame stack analysis as text, with at most max_frames frame lines"""
+    text = f"{result['format']} frame stack: {result['frames']} frames of {result['width']}x{result['height']}"
+    text += " (streamed from disk)\n" if result['mapped'] else "\n"
+    timing = result['timing']
+    if timing:
+        text += (f"Total duration {timing['total']} ms, usual delay {timing['usual']} ms, "
+                 f"{timing['distinct']} distinct delays\n")
+    text += "\nAnomalies:\n" if result['anomalies'] else "\nNo anomalies found\n"
+    for anomaly in result['anomalies']:
+        text += f"  {anomaly}\n"
+
+    text += "\nFrame  Delay  Changed  Bit 0 only  Mean diff  " + "  ".join(
+        f"{name[0]} LSB" for name in result['channels']) + "\n"
+    for frame in result['per_frame'][:max_frames]:
+        delay = f"{frame['duration']:5d}" if 'duration' in frame else "    -"
+        changes = (f"{frame['changed']:7d}  {frame['low_bit']:10d}  {frame['difference']:9.3f}"
+                   if frame['frame'] else f"{'-':>7}  {'-':>10}  {'-':>9}")
+        text += f"{frame['frame']:5d}  {delay}  {changes}  " + "  ".join(
+            f"{channel['lsb_ones']:5.3f}" for channel in frame['channels'].values()) + "\n"
+    if result['frames'] > max_frames:
+        text += f"... {result['frames'] - max_frames} more frames\n"
+
+    changed = [palette for palette in result['palettes'] if palette['changed'] or palette['duplicates']]
+    if changed:
+        text += "\nPalettes:\n"
+        for palette in changed[:max_frames]:
+            text += (f"  Frame {palette['frame']}: {palette['entries']} {'local' if palette['local'] else 'global'} "
+                     f"entries, {palette['changed']} changed, {palette['duplicates']} duplicates\n")
+    return text
+
+
+# Colour engine: float32 conversions of sRGB images, computed in row blocks
+
+# Components of every colour space and the range each is quantized from to 0-255
+COLOUR_SPACES = {
+    'HSV': (('H', 0.0, 360.0), ('S', 0.0, 1.0), ('V', 0.0, 1.0)),
+    'YCbCr': (('Y', 0.0, 255.0), ('Cb', 0.0, 255.0), ('Cr', 0.0, 255.0)),
+    'LAB': (('L*', 0.0, 100.0), ('a*', -128.0, 127.0), ('b*', -128.0, 127.0)),
+    'XYZ': (('X', 0.0, 0.95047), ('Y', 0.0, 1.0), ('Z', 0.0, 1.08883)),
+}
+
+# Pixels converted at a time
+COLOUR_CHUNK_PIXELS = 1 << 18
+
+# sRGB to linear light for every 8-bit value, and linear sRGB to CIE XYZ (D65)
+SRGB_LINEAR = np.where(np.arange(256) <= 10, np.arange(256) / 255 / 12.92,
+                       ((np.arange(256) / 255 + 0.055) / 1.055) ** 2.4).astype(np.float32)
+SRGB_TO_XYZ = np.array([[0.4124564, 0.3575761, 0.1804375],
+                        [0.2126729, 0.7151522, 0.0721750],
+                        [0.0193339, 0.1191920, 0.9503041]], dtype=np.float32)
+
+# Full-range (JFIF) YCbCr, as used by JPEG and Pillow
+RGB_TO_YCBCR = np.array([[0.299, 0.587, 0.114],
+                         [-0.168736, -0.331264, 0.5],
+                         [0.5, -0.418688, -0.081312]], dtype=np.float32)
+
+
+def colour_channel_names(space):
+    """Channel names of the components of a colour space, such as 'HSV H'"""
+    return [f"{space} {component}" for component, _, _ in COLOUR_SPACES[space]]
+
+
+def component_space(channel):
+    """Colour space a component channel name belongs to, or None for image channels"""
+    space = channel.split(' ', 1)[0]
+    return space if space in COLOUR_SPACES and channel in colour_channel_names(space) else None
+
+
+def _hsv(pixels):
+    red, green, blue = pixels.T.astype(np.float32) / 255
+    value = np.maximum(np.maximum(red, green), blue)
+    delta = value - np.minimum(np.minimum(red, green), blue)
+    saturation = np.divide(delta, value, out=np.zeros_like(value), where=value > 0)
+    scale = np.divide(np.float32(60), delta, out=np.zeros_like(delta), where=delta > 0)
+    hue = np.where(value == red, (green - blue) * scale,
+                   np.where(value == green, (blue - red) * scale + 120, (red - green) * scale + 240))
+    hue[hue < 0] += 360
+    return np.stack((hue, saturation, value), axis=1)
+
+
+def _lab(xyz):
+    xyz = xyz / np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+    delta = np.float32(6 / 29)
+    f = np.where(xyz > delta ** 3, np.cbrt(xyz), xyz / (3 * delta ** 2) + np.float32(4 / 29))
+    return np.stack((116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])), axis=1)
+
+
+def colour_components(pixels, space):
+    """(n, 3) uint8 sRGB pixels converted to float32 components in their natural units
+
+    HSV hue is in degrees with S and V in 0-1, YCbCr is full range 0-255,
+    CIELAB and XYZ use the D65 white point with Y in 0-1.
+    """
+    if space == 'YCbCr':
+        return pixels.astype(np.float32) @ RGB_TO_YCBCR.T + np.array([0, 128, 128], dtype=np.float32)
+    if space == 'HSV':
+        return _hsv(pixels)
+    xyz = SRGB_LINEAR[pixels] @ SRGB_TO_XYZ.T
+    return xyz if space == 'XYZ' else _lab(xyz)
+
+
+def convert_colour(image_array, space, quantize=True, chunk_pixels=COLOUR_CHUNK_PIXELS, progress=None):
+    """Colour space components of an image as a (height, width, 3) array
+
+    Gray images are treated as R = G = B and alpha is ignored. With
+    quantize every component is mapped from its range in COLOUR_SPACES
+    to uint8, so it can be shown and split into bit planes; otherwise
+    the float32 components are returned. Only one block of rows is
+    held in float32 at a time.
+    """
+    height, width = image_array.shape[:2]
+    output = np.empty((height, width, 3), dtype=np.uint8 if quantize else np.float32)
+    low = np.array([low for _, low, _ in COLOUR_SPACES[space]], dtype=np.float32)
+    scale = np.array([255 / (high - low) for _, low, high in COLOUR_SPACES[space]], dtype=np.float32)
+    rows = max(1, chunk_pixels // max(1, width))
+
+    for top in range(0, height, rows):
+        block = image_array[top:top + rows]
+        pixels = np.repeat(block.reshape(-1, 1), 3, axis=1) if block.ndim == 2 else block[:, :, :3].reshape(-1, 3)
+        components = colour_components(pixels, space)
+        if quantize:
+            components = np.clip((components - low) * scale + np.float32(0.5), 0, 255)
+        output[top:top + rows] = components.reshape(len(block), width, 3)
+        if progress:
+            progress(min(1.0, (top + rows) / height))
+    return output
+
+
+# Bytes of each channel read at a time when building histograms
+STATISTICS_CHUNK_BYTES = 16 * 1024 * 1024
+
+# Colours of histogram plots per channel
+CHANNEL_COLOURS = {'Red': (220, 50, 50), 'Green': (40, 170, 60), 'Blue': (50, 90, 220),
+                   'Alpha': (120, 120, 120), 'Gray': (80, 80, 80)}
+
+
+def _pair_counts(strip):
+    """65536-bin histogram of horizontally adjacent value pairs (left << 8 | right)
+
+    The contiguous strip is read as big-endian 16-bit words at even and
+    odd offsets, which covers every adjacent pair without building keys;
+    the pairs that wrap from one row to the next are taken out again.
+    """
+    flat = strip.ravel()
+    size = flat.size
+    pairs = np.bincount(np.frombuffer(flat, dtype='>u2', count=size // 2), minlength=65536)
+    pairs += np.bincount(np.frombuffer(flat, dtype='>u2', count=(size - 1) // 2, offset=1), minlength=65536)
+    if strip.shape[0] > 1:
+        wrapped = (strip[:-1, -1].astype(np.intp) << 8) | strip[1:, 0]
+        pairs -= np.bincount(wrapped, minlength=65536)
+    return pairs
+
+
+def channel_histograms(image_array, chunk_bytes=STATISTICS_CHUNK_BYTES, progress=None, channels=None):
+    """256-bin value histogram and 256x256 adjacent pair histogram of every channel
+
+    Each channel is read once, in strips of rows; the value histogram
+    is derived from the pair counts plus the last column. channels
+    names the channels of other arrays, such as colour space components.
+    """
+    names = list(channels) if channels else channel_names(image_array)
+    height, width = image_array.shape[:2]
+    histograms = {name: {'histogram': np.zeros(256, dtype=np.int64),
+                         'pairs': np.zeros(65536, dtype=np.int64)} for name in names}
+    rows = max(1, chunk_bytes // max(1, width))
+
+    for top in range(0, height, rows):
+        for index, name in enumerate(names):
+            block = image_array[top:top + rows]
+            strip = np.ascontiguousarray(block if block.ndim == 2 else block[:, :, index])
+            pairs = _pair_counts(strip) if width > 1 else np.zeros(65536, dtype=np.int64)
+            counts = histograms[name]
+            counts['pairs'] += pairs
+            counts['histogram'] += pairs.reshape(256, 256).sum(axis=1)
+            counts['histogram'] += np.bincount(strip[:, -1], minlength=256)
+        if progress:
+            progress(min(1.0, (top + rows) / height))
+
+    for counts in histograms.values():
+        counts['pairs'] = counts['pairs'].reshape(256, 256)
+    return histograms
+
+
+def histogram_statistics(histogram, pairs=None):
+    """Summary statistics derived from a 256-bin histogram (and optional pair histogram)"""
+    values = np.arange(256)
+    total = int(histogram.sum())
+    present = np.flatnonzero(histogram)
+    if not total:
+        return {'min': 0, 'max': 0, 'mean': 0.0, 'std': 0.0, 'entropy': 0.0, 'ones': [0.0] * 8}
+
+    mean = int(histogram @ values) / total
+    variance = max(0.0, int(histogram @ (values * values)) / total - mean * mean)
+    probabilities = histogram[present] / total
+    bits = (values[:, None] >> np.arange(8)) & 1
+    stats = {
+        'min': int(present[0]),
+        'max': int(present[-1]),
+        'mean': mean,
+        'std': math.sqrt(variance),
+        'entropy': float(-(probabilities * np.log2(probabilities)).sum()),
+        'ones': [float(ratio) for ratio in (histogram @ bits) / total],
+    }
+
+    if pairs is not None and pairs.any():
+        # Pearson correlation of horizontally adjacent values
+        count = int(pairs.sum())
+        left, right = pairs.sum(axis=1), pairs.sum(axis=0)
+        mean_left, mean_right = int(left @ values) / count, int(right @ values) / count
+        var_left = int(left @ (values * values)) / count - mean_left ** 2
+        var_right = int(right @ (values * values)) / count - mean_right ** 2
+        covariance = int(values @ pairs @ values) / count - mean_left * mean_right
+        spread = math.sqrt(max(0.0, var_left * var_right))
+        stats['neighbour_correlation'] = covariance / spread if spread else 1.0
+        stats['neighbour_equal'] = int(np.trace(pairs)) / count
+    return stats
+
+
+def channel_statistics(image_array, chunk_bytes=STATISTICS_CHUNK_BYTES, progress=None, channels=None):
+    """Min, max, mean, standard deviation, entropy and bit plane ones ratios of every channel"""
+    histograms = channel_histograms(image_array, chunk_bytes, progress, channels)
+    return {name: histogram_statistics(counts['histogram'], counts['pairs'])
+            for name, counts in histograms.items()}
+
+
+def histogram_plot(histogram, colour=(80, 80, 80), height=120, log=False):
+    """Bar chart of a 256-bin histogram as a (height, 512, 3) uint8 image"""
+    counts = np.log1p(histogram.astype(float)) if log else histogram.astype(float)
+    peak = counts.max()
+    bars = np.zeros(256, dtype=int) if not peak else np.ceil(counts / peak * (height - 1)).astype(int)
+    filled = np.arange(height)[:, None] >= height - np.repeat(bars, 2)[None, :]
+    plot = np.full((height, 512, 3), 255, dtype=np.uint8)
+    plot[filled] = colour
+    return plot
+
+
+def pair_histogram_image(pairs):
+    """Log-scaled 256x256 image of a pair histogram (left value down, right value across)"""
+    counts = np.log1p(pairs.astype(float))
+    peak = counts.max()
+    return (255 - counts * (255 / peak)).astype(np.uint8) if peak else np.full((256, 256), 255, dtype=np.uint8)
+
+
+def format_statistics(stats):
+    """Render channel statistics as the text shown in the GUI"""
+    text = ""
+    for name, values in stats.items():
+        text += "Grayscale Image:\n" if name == 'Gray' else f"{name} Channel:\n"
+        text += f"  Min: {values['min']}\n"
+        text += f"  Max: {values['max']}\n"
+        text += f"  Mean: {values['mean']:.2f}\n"
+        text += f"  Std: {values['std']:.2f}\n"
+        text += f"  Entropy: {values['entropy']:.4f} bits\n"
+        if 'neighbour_correlation' in values:
+            text += f"  Neighbour correlation: {values['neighbour_correlation']:.4f}\n"
+            text += f"  Equal neighbours: {values['neighbour_equal'] * 100:.2f}%\n"
+        text += "  Ones per bit (7..0): " + " ".join(f"{ratio:.3f}" for ratio in reversed(values['ones'])) + "\n\n"
+    return text
+
+
+# Pixel-wise comparison views of two images
+COMPARE_MODES = ('xor', 'sub', 'diff', 'bitplane')
+
+# Bytes of each input processed at a time when comparing images
+COMPARE_TILE_BYTES = 16 * 1024 * 1024
+
+
+def _as_channels(tile, depth):
+    """A tile with depth channels: gray is repeated to RGB and opaque alpha is added"""
+    if tile.ndim == 2:
+        tile = tile[:, :, None]
+    if tile.shape[2] < 3 <= depth:
+        tile = np.repeat(tile[:, :, :1], 3, axis=2)
+    if tile.shape[2] < depth:
+        tile = np.dstack([tile, np.full(tile.shape[:2], 255, dtype=np.uint8)])
+    return tile
+
+
+def compare_images(first, second, mode='xor', bit=0, tile_bytes=COMPARE_TILE_BYTES, progress=None):
+    """Compare two image arrays of the same size, strip by strip
+
+    mode is 'xor', 'sub' (wrapping subtraction), 'diff' (absolute
+    difference) or 'bitplane' (white where the given bit differs).
+    Only one strip of temporaries exists at a time; the result view
+    holds the colour channels, while the changed-pixel count, bounding
+    box and per-channel counts also include alpha.
+    """
+    if first.shape[:2] != second.shape[:2]:
+        raise ValueError(f"Images differ in size: {first.shape[1]}x{first.shape[0]} "
+                         f"and {second.shape[1]}x{second.shape[0]}")
+
+    height, width = first.shape[:2]
+    depth = max(1 if a.ndim == 2 else a.shape[2] for a in (first, second))
+    names = channel_names(np.empty((0, 0, depth)) if depth > 1 else first)
+    colour = 1 if depth == 1 else 3
+    view = np.empty((height, width, colour), dtype=np.uint8)
+
+    changed = 0
+    channel_changes = np.zeros(depth, dtype=np.int64)
+    changed_rows = np.zeros(height, dtype=bool)
+    changed_columns = np.zeros(width, dtype=bool)
+    rows = max(1, tile_bytes // (width * depth))
+    for top in range(0, height, rows):
+        a = _as_channels(first[top:top + rows], depth)
+        b = _as_channels(second[top:top + rows], depth)
+        xor = a ^ b
+
+        # Reductions over the short channel axis are slow; combine the
+        # channel slices instead
+        differ = xor[:, :, 0].copy()
+        for channel in range(depth):
+            channel_changes[channel] += np.count_nonzero(xor[:, :, channel])
+            if channel:
+                differ |= xor[:, :, channel]
+        changed += int(np.count_nonzero(differ))
+        changed_rows[top:top + rows] = differ.any(axis=1)
+        changed_columns |= differ.any(axis=0)
+
+        a, b, xor = a[:, :, :colour], b[:, :, :colour], xor[:, :, :colour]
+        if mode == 'xor':
+            view[top:top + rows] = xor
+        elif mode == 'sub':
+            np.subtract(a, b, out=view[top:top + rows])
+        elif mode == 'diff':
+            np.subtract(np.maximum(a, b), np.minimum(a, b), out=view[top:top + rows])
+        elif mode == 'bitplane':
+            view[top:top + rows] = (xor >> bit & 1) * 255
+        else:
+            raise ValueError(f"Unknown comparison mode: {mode}")
+        if progress:
+            progress(min(1.0, (top + rows) / height))
+
+    ys = np.flatnonzero(changed_rows)
+    xs = np.flatnonzero(changed_columns)
+    return {
+        'mode': mode,
+        'image': view[:, :, 0] if colour == 1 else view,
+        'changed': changed,
+        'total': height * width,
+        'bbox': (int(xs[0]), int(ys[0]), int(xs[-1]) + 1, int(ys[-1]) + 1) if changed else None,
+        'channels': dict(zip(names, channel_changes.tolist())),
+    }
+
+
+def format_comparison(result):
+    """Render a comparison summary as the text shown in the GUI"""
+    text = f"Changed pixels: {result['changed']} of {result['total']} "
+    text += f"({result['changed'] / max(1, result['total']) * 100:.2f}%)\n"
+    if result['bbox']:
+        left, top, right, bottom = result['bbox']
+        text += f"Bounding box: ({left}, {top}) - ({right}, {bottom}), {right - left}x{bottom - top}\n"
+    for name, count in result['channels'].items():
+        text += f"  {name}: {count} changed\n"
+    return text
+
+
+def row_autocorrelation(image_array, chunk_rows=256, progress=None):
+    """Circular autocorrelation of the image rows for every horizontal offset
+
+    Colour channels are summed and every row made zero-mean; the power
+    spectra of all rows are added up and transformed back once, so every
+    offset is scored in O(w log w) per row instead of O(w^2). The result
+    is normalised so that offset 0 is 1.
+    """
+    data = image_array if image_array.ndim == 2 else image_array[:, :, :3]
+    height, width = data.shape[:2]
+    power = np.zeros(width // 2 + 1, dtype=np.float64)
+    for top in range(0, height, chunk_rows):
+        strip = data[top:top + chunk_rows]
+        if strip.ndim == 2:
+            rows = strip.astype(np.float32)
+        else:
+            rows = strip[:, :, 0].astype(np.float32)
+            for channel in range(1, strip.shape[2]):
+                rows += strip[:, :, channel]
+        rows -= rows.mean(axis=1, keepdims=True)
+        spectrum = np.fft.rfft(rows, axis=1)
+        power += (spectrum.real ** 2 + spectrum.imag ** 2).sum(axis=0)
+        if progress:
+            progress(min(1.0, (top + chunk_rows) / height))
+
+    correlation = np.fft.irfft(power, n=width)
+    return correlation / correlation[0] if correlation[0] > 0 else np.zeros(width)
+
+
+def rank_offsets(correlation, count=10, min_offset=2):
+    """(offset, score) of the strongest autocorrelation peaks, best first
+
+    Only local maxima count, so the slow fall-off of smooth images at
+    small offsets is not mistaken for a repeat; offsets beyond half the
+    width mirror the ones below it.
+    """
+    half = len(correlation) // 2
+    if half <= min_offset:
+        return []
+    values = correlation[min_offset - 1:half + 2]
+    middle = values[1:-1]
+    peaks = np.flatnonzero((middle >= values[:-2]) & (middle > values[2:])) + min_offset
+    peaks = peaks[peaks <= half]
+    best = peaks[np.argsort(correlation[peaks])[::-1][:count]]
+    return [(int(offset), float(correlation[offset])) for offset in best]
+
+
+def stereogram_view(image_array, offset):
+    """Absolute difference between the image and itself shifted left by offset (wrapping)
+
+    Alpha is left out so the result is always opaque.
+    """
+    data = image_array if image_array.ndim == 2 else image_array[:, :, :3]
+    shifted = np.roll(data, -offset, axis=1)
+    return np.maximum(data, shifted) - np.minimum(data, shifted)
+
+
+# High-pass filters as sums of separable (vertical taps, horizontal taps) terms
+# and a scale; the SRM 5x5 "KV" kernel has rank 2, so two terms suffice
+NOISE_FILTERS = {
+    'laplacian': ([((0, 1, 0), (-1, 2, -1)), ((-1, 2, -1), (0, 1, 0))], 1 / 4),
+    'srm3': ([((-1, 2, -1), (-1, 2, -1))], 1 / 4),
+    'srm5': ([((1, 0, -2, 0, 1), (-1, 2, -2, 2, -1)), ((0, 1, -2, 1, 0), (2, -6, 8, -6, 2))], 1 / 12),
+    'median': None,
+}
+NOISE_VIEWS = ('residual', 'variance')
+
+
+def _shifted(data, offset, length, axis):
+    return data[offset:offset + length] if axis == 0 else data[:, offset:offset + length]
+
+
+def _correlate(data, taps, axis):
+    """Valid 1-D correlation of data with integer taps along axis
+
+    A lone unit tap returns a view of data.
+    """
+    length = data.shape[axis] - len(taps) + 1
+    parts = [(tap, _shifted(data, offset, length, axis)) for offset, tap in enumerate(taps) if tap]
+    if len(parts) == 1 and parts[0][0] == 1:
+        return parts[0][1]
+
+    result = None
+    for tap, part in parts:
+        if result is None:
+            result = part * np.float32(tap)
+        elif tap == 1:
+            result += part
+        elif tap == -1:
+            result -= part
+        else:
+            result += part * np.float32(tap)
+    return result
+
+
+def _window_sum(data, window, axis):
+    """Valid sums of window consecutive values along axis, built by doubling spans"""
+    length = data.shape[axis] - window + 1
+    result = None
+    offset = 0
+    power, span = data, 1
+    while True:
+        if window & span:
+            part = _shifted(power, offset, length, axis)
+            result = part.copy() if result is None else np.add(result, part, out=result)
+            offset += span
+        if span * 2 > window:
+            return result
+        count = power.shape[axis] - span
+        power = _shifted(power, 0, count, axis) + _shifted(power, span, count, axis)
+        span *= 2
+
+
+def _median3x3(data):
+    """Valid 3x3 median: sort every column triple once, then combine neighbours"""
+    a, b, c = data[:-2], data[1:-1], data[2:]
+    low, high = np.minimum(a, b), np.maximum(a, b)
+    middle = np.minimum(high, c)
+    high = np.maximum(high, c)
+    low, middle = np.minimum(low, middle), np.maximum(low, middle)
+
+    # Median of 9 = median(max of lows, median of middles, min of highs)
+    lows = np.maximum(np.maximum(low[:, :-2], low[:, 1:-1]), low[:, 2:])
+    highs = np.minimum(np.minimum(high[:, :-2], high[:, 1:-1]), high[:, 2:])
+    m0, m1, m2 = middle[:, :-2], middle[:, 1:-1], middle[:, 2:]
+    middles = np.maximum(np.minimum(m0, m1), np.minimum(np.maximum(m0, m1), m2))
+    return np.maximum(np.minimum(lows, middles), np.minimum(np.maximum(lows, middles), highs))
+
+
+def noise_residual(data, method='laplacian'):
+    """High-pass residual of a 2-D channel, shrinking it by the filter radius on every side"""
+    if method == 'median':
+        return data[1:-1, 1:-1].astype(np.float32) - _median3x3(data)
+    terms, scale = NOISE_FILTERS[method]
+    data = data.astype(np.float32, copy=False)
+    result = None
+    for vertical, horizontal in terms:
+        term = _correlate(_correlate(data, horizontal, 1), vertical, 0)
+        result = term if result is None else result + term
+    return result * np.float32(scale)
+
+
+def _box_mean(data, window):
+    """Valid window x window means, summed separably"""
+    sums = _window_sum(_window_sum(data, window, 1), window, 0)
+    sums *= np.float32(1 / (window * window))
+    return sums
+
+
+def _edge_tile(plane, top, bottom, halo, dtype):
+    """Rows top:bottom of a plane with halo pixels around, repeating the edges"""
+    height, width = plane.shape
+    tile = np.empty((bottom - top + 2 * halo, width + 2 * halo), dtype=dtype)
+    first, last = max(0, top - halo), min(height, bottom + halo)
+    start = first - (top - halo)
+    tile[start:start + last - first, halo:halo + width] = plane[first:last]
+    tile[:start, halo:halo + width] = tile[start, halo:halo + width]
+    tile[start + last - first:, halo:halo + width] = tile[start + last - first - 1, halo:halo + width]
+    tile[:, :halo] = tile[:, halo:halo + 1]
+    tile[:, halo + width:] = tile[:, halo + width - 1:halo + width]
+    return tile
+
+
+def noise_analysis(image_array, method='laplacian', view='residual', window=7, gain=8.0,
+                   tile_rows=128, progress=None):
+    """Noise residual or local noise variance of every colour channel
+
+    view 'residual' shows |residual| * gain; 'variance' shows the local
+    standard deviation of the residual over a window x window box
+    (separable box sums) times gain, where smoothed or
+    pasted regions stand out as dark patches. The image is processed in
+    strips of tile_rows rows overlapping by the filter and window
+    radius, so memory stays proportional to the strip. Returns a dict
+    with the uint8 'image' (alpha left out) and the RMS residual of
+    every channel as 'noise'.
+    """
+    if method not in NOISE_FILTERS:
+        raise ValueError(f"Unknown noise filter: {method}")
+    if view not in NOISE_VIEWS:
+        raise ValueError(f"Unknown noise view: {view}")
+
+    data = image_array if image_array.ndim == 2 else image_array[:, :, :3]
+    names = channel_names(image_array)[:1 if data.ndim == 2 else data.shape[2]]
+    planes = [data] if data.ndim == 2 else [data[:, :, index] for index in range(data.shape[2])]
+    height, width = data.shape[:2]
+
+    radius = 1 if method in ('laplacian', 'srm3', 'median') else 2
+    window = max(1, window | 1) if view == 'variance' else 1
+    halo = radius + window // 2
+    tile_rows = max(1, tile_rows)
+
+    result = np.empty(data.shape, dtype=np.uint8)
+    outputs = [result] if data.ndim == 2 else [result[:, :, index] for index in range(data.shape[2])]
+    squares = [0.0] * len(planes)
+    dtype = np.uint8 if method == 'median' else np.float32
+
+    for top in range(0, height, tile_rows):
+        bottom = min(height, top + tile_rows)
+        for index, (plane, output) in enumerate(zip(planes, outputs)):
+            # Borders repeat the edge pixels so every residual has full support
+            tile = _edge_tile(plane, top, bottom, halo, dtype)
+            residual = noise_residual(tile, method)
+            inner = residual[window // 2:residual.shape[0] - window // 2, window // 2:residual.shape[1] - window // 2]
+            squares[index] += float(np.einsum('ij,ij->', inner, inner, dtype=np.float64))
+            if view == 'residual':
+                np.abs(inner, out=inner)
+                values = inner
+            else:
+                mean = _box_mean(residual, window)
+                variance = _box_mean(residual * residual, window) - mean * mean
+                values = np.sqrt(np.maximum(variance, 0, out=variance), out=variance)
+            values *= gain
+            np.minimum(values, 255, out=values)
+            output[top:bottom] = values
+        if progress:
+            progress(bottom / height)
+
+    pixels = max(1, height * width)
+    return {
+        'method': method,
+        'view': view,
+        'image': result,
+        'noise': {name: math.sqrt(total / pixels) for name, total in zip(names, squares)},
+    }
+
+
+def format_noise_analysis(result):
+    """Text summary of noise_analysis output"""
+    lines = [f"Filter: {result['method']}  View: {result['view']}", "", "RMS residual per channel:"]
+    for name, level in result['noise'].items():
+        lines.append(f"  {name:<6} {level:8.3f}")
+    return "\n".join(lines)
+
+
+def _true_runs(mask, min_length):
+    """(starts, lengths) of every run of True at least min_length long"""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    starts, lengths = edges[0::2], edges[1::2] - edges[0::2]
+    keep = lengths >= min_length
+    return starts[keep], lengths[keep]
+
+
+def find_printable_runs(data, min_length=4, encoding='ascii'):
+    """(offsets, lengths) in bytes of every printable run in a buffer"""
+    array = np.frombuffer(data, dtype=np.uint8)
+    if encoding == 'ascii':
+        return _true_runs(PRINTABLE[array], min_length)
+
+    # UTF-16LE: printable low byte followed by a zero byte, at either
+    # alignment; runs of the two alignments can never overlap
+    offsets, lengths = [], []
+    for align in (0, 1):
+        pairs = array[align:align + (len(array) - align) // 2 * 2].reshape(-1, 2)
+        starts, counts = _true_runs(PRINTABLE[pairs[:, 0]] & (pairs[:, 1] == 0), min_length)
+        offsets.append(starts * 2 + align)
+        lengths.append(counts * 2)
+    offsets, lengths = np.concatenate(offsets), np.concatenate(lengths)
+    order = np.argsort(offsets, kind='stable')
+    return offsets[order], lengths[order]
+
+
+def extract_strings(data, min_length=4, encoding='ascii'):
+    """Extract printable strings from in-memory binary data"""
+    offsets, lengths = find_printable_runs(data, min_length, encoding)
+    return [bytes(data[o:o + n]).decode(encoding) for o, n in zip(offsets.tolist(), lengths.tolist())]
+
+
+def scan_strings(fileobj, min_length=4, encoding='ascii', chunk_size=SCAN_CHUNK_SIZE):
+    """Yield (offsets, lengths) arrays of the printable runs in a binary stream
+
+    The stream is read chunk by chunk. A run that may continue past the
+    end of a chunk is carried over and completed with the next one, so
+    the result is the same as scanning the whole file at once.
+    """
+    unit = STRING_ENCODINGS[encoding]
+    tail = (min_length + 1) * unit
+    buffer = b''
+    base = 0
+
+    while True:
+        chunk = fileobj.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+        offsets, lengths = find_printable_runs(buffer, min_length, encoding)
+        if eof:
+            yield base + offsets, lengths
+            return
+
+        # A run reaching the end of the buffer may continue: rescan it
+        # with the next chunk instead of emitting it now
+        done = offsets + lengths <= len(buffer) - unit
+        yield base + offsets[done], lengths[done]
+
+        if not done.all():
+            cut = int(offsets[~done].min())
+        else:
+            last_end = int(offsets[-1] + lengths[-1]) if len(offsets) else 0
+            # Keep enough bytes for a short partial run to grow past min_length
+            cut = max(last_end, len(buffer) - tail, 0)
+        base += cut
+        buffer = buffer[cut:]
+
+
+class StringIndex:
+    """Every printable string in a file, stored as offsets and decoded on demand
+
+    Only offsets, lengths and encodings are kept in memory, so files with
+    millions of hits can be browsed page by page.
+    """
+
+    def __init__(self, filepath, min_length=4, encodings=('ascii',), chunk_size=SCAN_CHUNK_SIZE,
+                 progress=None):
+        self.filepath = filepath
+        self.min_length = min_length
+        self.encodings = list(encodings)
+
+        total = max(1, os.path.getsize(filepath) * len(self.encodings))
+        offsets, lengths, kinds = [], [], []
+        for kind, encoding in enumerate(self.encodings):
+            with open(filepath, 'rb') as f:
+                for chunk_offsets, chunk_lengths in scan_strings(f, min_length, encoding, chunk_size):
+                    offsets.append(chunk_offsets.astype(np.int64))
+                    lengths.append(chunk_lengths.astype(np.int64))
+                    kinds.append(np.full(len(chunk_offsets), kind, dtype=np.uint8))
+                    if progress:
+                        progress(min(1.0, (kind * total / len(self.encodings) + f.tell()) / total))
+
+        offsets = np.concatenate(offsets or [np.zeros(0, dtype=np.int64)])
+        order = np.argsort(offsets, kind='stable')
+        self.offsets = offsets[order]
+        self.lengths = np.concatenate(lengths or [np.zeros(0, dtype=np.int64)])[order]
+        self.kinds = np.concatenate(kinds or [np.zeros(0, dtype=np.uint8)])[order]
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def get(self, index):
+        """(offset, encoding, text) of one hit"""
+        return self.get_range(index, index + 1)[0]
+
+    def get_range(self, start, stop):
+        """Decode the hits in [start, stop) by reading them from the file"""
+        rows = []
+        with open(self.filepath, 'rb') as f:
+            for index in range(max(0, start), min(stop, len(self))):
+                offset = int(self.offsets[index])
+                encoding = self.encodings[self.kinds[index]]
+                f.seek(offset)
+                rows.append((offset, encoding, f.read(int(self.lengths[index])).decode(encoding)))
+        return rows
+
+    def find(self, text, chunk_size=SCAN_CHUNK_SIZE, progress=None):
+        """Indices of every hit containing text, found by scanning the file
+
+        Encodings that cannot represent text (e.g. 'café' in ASCII) have
+        no hits. progress gets the fraction of the passes done and may
+        raise Cancelled between chunks.
+        """
+        found = []
+        for kind, encoding in enumerate(self.encodings):
+            try:
+                needle = text.encode(encoding)
+            except UnicodeEncodeError:
+                continue
+            selected = np.flatnonzero(self.kinds == kind)
+            if not needle or not len(selected):
+                continue
+
+            # Locate the needle in the raw file, then map occurrences to hits
+            scanned = None if progress is None else \
+                lambda done, kind=kind: progress((kind + done) / len(self.encodings))
+            occurrences = np.array(list(find_all(self.filepath, needle, chunk_size, scanned)), dtype=np.int64)
+            starts = self.offsets[selected]
+            hit = np.searchsorted(starts, occurrences, side='right') - 1
+            valid = hit >= 0
+            hit, occurrences = hit[valid], occurrences[valid]
+            inside = occurrences + len(needle) <= starts[hit] + self.lengths[selected][hit]
+            found.append(selected[hit[inside]])
+
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+
+def find_all(filepath, needle, chunk_size=SCAN_CHUNK_SIZE, progress=None):
+    """Yield the offset of every occurrence of needle in a file; progress is called per chunk read"""
+    overlap = len(needle) - 1
+    base = 0
+    buffer = b''
+    total = max(1, os.path.getsize(filepath))
+    with open(filepath, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            if progress:
+                progress(min(1.0, f.tell() / total))
+            buffer += chunk
+            position = buffer.find(needle)
+            while position != -1:
+                yield base + position
+                position = buffer.find(needle, position + 1)
+            cut = max(0, len(buffer) - overlap)
+            base += cut
+            buffer = buffer[cut:]
+
+
+def identify_file_type(data):
+    """Match the leading bytes of a file against known signatures"""
+    for magic, file_type, signature in FILE_SIGNATURES:
+        if data.startswith(magic):
+            return file_type, signature
+    return "Unknown or custom format", None
+
+
+# Container structure: a streaming walk of PNG chunks, JPEG segments, GIF blocks and BMP headers
+
+class _StructureWalker:
+    """State of one structure walk: bounded reads, the node tree and the anomalies found
+
+    Data is only ever read in blocks of at most STRUCTURE_BLOCK_SIZE and
+    the tree stops growing at STRUCTURE_MAX_NODES, so memory does not
+    depend on the file size.
+    """
+
+    def __init__(self, fileobj, size, progress=None):
+        self.fileobj = fileobj
+        self.size = size
+        self.progress = progress
+        self.step = max(size // 100, 1)
+        self.reported = 0
+        self.nodes = []
+        self.anomalies = []
+        self.count = 0
+        self.omitted = 0
+
+    def read(self, offset, size):
+        self.fileobj.seek(offset)
+        return self.fileobj.read(size)
+
+    def blocks(self, offset, size):
+        """The bytes of [offset, offset + size) in bounded blocks"""
+        end = offset + size
+        while offset < end:
+            data = self.read(offset, min(STRUCTURE_BLOCK_SIZE, end - offset))
+            if not data:
+                return
+            offset += len(data)
+            self.tick(offset)
+            yield data
+
+    def tick(self, position):
+        if self.progress and position - self.reported >= self.step:
+            self.reported = position
+            self.progress(min(position / self.size, 1.0))
+
+    def add(self, name, offset, size, info='', parent=None):
+        """New tree node; past the node limit it is returned but not attached"""
+        node = {'name': name, 'offset': offset, 'size': size, 'info': info, 'children': []}
+        self.tick(offset)
+        if self.count >= STRUCTURE_MAX_NODES:
+            self.omitted += 1
+        else:
+            self.count += 1
+            (parent['children'] if parent else self.nodes).append(node)
+        return node
+
+    def flag(self, offset, message, node=None):
+        if node is not None:
+            node['anomaly'] = True
+        if len(self.anomalies) >= STRUCTURE_MAX_NODES:
+            self.omitted += 1
+        else:
+            self.anomalies.append({'offset': offset, 'message': message})
+
+    def unparsed(self, offset, reason):
+        """Stop the walk: everything from offset on is left as one opaque node"""
+        node = self.add("Unparsed data", offset, self.size - offset, reason)
+        self.flag(offset, f"{reason}; {self.size - offset} bytes not parsed", node)
+        return self.size
+
+
+def _text_preview(data, encoding='latin-1', length=60):
+    """(one-line preview, whether the text has only printable characters) of comment bytes"""
+    text = data.decode(encoding, 'replace')
+    clean = '�' not in text and all(ch.isprintable() or ch in '\t\n\r' for ch in text)
+    preview = ' '.join(text[:length].split())
+    return (preview + '...' if len(text) > length else preview), clean
+
+
+def _check_comment(walker, node, size, data, encoding='latin-1'):
+    """Describe a comment and flag one that is very large or holds binary data"""
+    preview, clean = _text_preview(data, encoding)
+    node['info'] = f"{node['info']}{preview!r}" if node['info'] else repr(preview)
+    if size > STRUCTURE_COMMENT_BYTES:
+        walker.flag(node['offset'], f"{node['name']} is unusually large ({size} bytes)", node)
+    if not clean:
+        walker.flag(node['offset'], f"{node['name']} contains non-printable bytes", node)
+
+
+def _trailing_description(data):
+    for signature in CARVE_SIGNATURES:
+        if signature.offset == 0 and data.startswith(signature.magic):
+            return f"starts like {signature.description}"
+    return "all zero bytes" if not data.strip(b'\x00') else ""
+
+
+PNG_COLOUR_TYPES = {0: ("grayscale", 1, (1, 2, 4, 8, 16)), 2: ("RGB", 3, (8, 16)),
+                    3: ("palette", 1, (1, 2, 4, 8)), 4: ("grayscale + alpha", 2, (8, 16)),
+                    6: ("RGBA", 4, (8, 16))}
+
+# Registered chunk types; anything else is flagged
+PNG_CHUNK_TYPES = {
+    b'IHDR', b'PLTE', b'IDAT', b'IEND', b'tRNS', b'cHRM', b'gAMA', b'iCCP', b'sBIT', b'sRGB', b'cICP',
+    b'mDCV', b'cLLI', b'tEXt', b'zTXt', b'iTXt', b'bKGD', b'hIST', b'pHYs', b'sPLT', b'eXIf', b'tIME',
+    b'acTL', b'fcTL', b'fdAT', b'oFFs', b'pCAL', b'sCAL', b'sTER', b'gIFg', b'gIFx', b'dSIG',
+}
+
+# Adam7 passes: first column, first row, column step, row step
+_ADAM7 = ((0, 0, 8, 8), (4, 0, 8, 8), (0, 4, 4, 8), (2, 0, 4, 4), (0, 2, 2, 4), (1, 0, 2, 2), (0, 1, 1, 2))
+
+
+def png_raw_size(width, height, bit_depth, colour_type, interlace=0):
+    """Bytes of filtered scanlines the IDAT stream of such an image inflates to"""
+    bits = PNG_COLOUR_TYPES[colour_type][1] * bit_depth
+    passes = _ADAM7 if interlace else ((0, 0, 1, 1),)
+    total = 0
+    for x, y, dx, dy in passes:
+        columns = (width - x + dx - 1) // dx if width > x else 0
+        rows = (height - y + dy - 1) // dy if height > y else 0
+        if columns and rows:
+            total += rows * (1 + (columns * bits + 7) // 8)
+    return total
+
+
+class _IdatStream:
+    """Running inflate of consecutive IDAT chunks that only counts the output"""
+
+    def __init__(self, walker, offset):
+        self.node = walker.add("IDAT stream", offset, 0)
+        self.decompressor = zlib.decompressobj()
+        self.chunks = 0
+        self.compressed = 0
+        self.inflated = 0
+        self.extra = 0
+        self.error = None
+
+    def feed(self, data):
+        self.compressed += len(data)
+        if self.error or self.decompressor.eof:
+            self.extra += len(data)
+            return
+        try:
+            self.inflated += len(self.decompressor.decompress(data, STRUCTURE_BLOCK_SIZE))
+            while self.decompressor.unconsumed_tail and not self.decompressor.eof:
+                self.inflated += len(self.decompressor.decompress(self.decompressor.unconsumed_tail,
+                                                                  STRUCTURE_BLOCK_SIZE))
+        except zlib.error as e:
+            self.error = str(e)
+        if self.decompressor.eof:
+            self.extra += len(self.decompressor.unused_data)
+
+    def finish(self, walker, end, expected):
+        node = self.node
+        node['size'] = end - node['offset']
+        node['info'] = f"{self.chunks} chunks, {self.compressed} bytes inflate to {self.inflated}"
+        if expected is not None:
+            node['info'] += f" (expected {expected})"
+        if self.error:
+            walker.flag(node['offset'], f"IDAT stream does not inflate: {self.error}", node)
+        elif not self.decompressor.eof:
+            walker.flag(node['offset'], "IDAT zlib stream is truncated", node)
+        elif expected is not None and self.inflated != expected:
+            walker.flag(node['offset'], f"IDAT inflates to {self.inflated} bytes, the header implies {expected}", node)
+        if self.extra:
+            walker.flag(node['offset'], f"{self.extra} bytes follow the end of the IDAT zlib stream", node)
+
+
+def _png_chunk_info(walker, node, kind, length, data, header):
+    """Description of one chunk from its first bytes; returns the parsed IHDR if this is one"""
+    if kind == b'IHDR':
+        if len(data) < 13:
+            walker.flag(node['offset'], f"IHDR is {length} bytes, not 13", node)
+            return None
+        width, height, depth, colour, compression, filtering, interlace = struct.unpack('>IIBBBBB', data[:13])
+        name, _, depths = PNG_COLOUR_TYPES.get(colour, ("invalid colour type", 0, ()))
+        node['info'] = f"{width}x{height}, {depth}-bit {name}{', interlaced' if interlace else ''}"
+        if depth not in depths or compression or filtering or interlace > 1 or not width or not height:
+            walker.flag(node['offset'], "IHDR has invalid field values", node)
+            return None
+        return width, height, depth, colour, interlace
+    if kind == b'PLTE':
+        node['info'] = f"{length // 3} entries"
+        if length % 3 or not 0 < length <= 768:
+            walker.flag(node['offset'], f"PLTE length {length} is not 1-256 RGB entries", node)
+    elif kind == b'tEXt':
+        keyword, _, text = data.partition(b'\x00')
+        node['info'] = keyword.decode('latin-1') + ": "
+        _check_comment(walker, node, length, text)
+    elif kind == b'zTXt':
+        keyword, _, text = data.partition(b'\x00')
+        node['info'] = keyword.decode('latin-1') + ": "
+        try:
+            text = zlib.decompressobj().decompress(text[1:], STRUCTURE_KEEP_BYTES)
+        except zlib.error:
+            walker.flag(node['offset'], "zTXt text does not inflate", node)
+        _check_comment(walker, node, length, text)
+    elif kind == b'iTXt':
+        keyword, _, rest = data.partition(b'\x00')
+        node['info'] = keyword.decode('latin-1') + ": "
+        compressed = rest[:1] == b'\x01'
+        text = rest[2:].split(b'\x00', 2)[-1]
+        if compressed:
+            try:
+                text = zlib.decompressobj().decompress(text, STRUCTURE_KEEP_BYTES)
+            except zlib.error:
+                walker.flag(node['offset'], "iTXt text does not inflate", node)
+        if keyword == b'XML:com.adobe.xmp':
+            # XMP packets are routinely several KB
+            node['info'] += _text_preview(text, 'utf-8')[0]
+        else:
+            _check_comment(walker, node, length, text, 'utf-8')
+    elif kind == b'tIME' and len(data) >= 7:
+        node['info'] = "{:04d}-{:02d}-{:02d} {:02d}:{:02d}:{:02d}".format(*struct.unpack('>HBBBBB', data[:7]))
+    elif kind == b'pHYs' and len(data) >= 9:
+        x, y, unit = struct.unpack('>IIB', data[:9])
+        node['info'] = f"{x}x{y} pixels per {'metre' if unit else 'unit'}"
+    elif kind == b'gAMA' and len(data) >= 4:
+        node['info'] = f"gamma {int.from_bytes(data[:4], 'big') / 100000:g}"
+    elif kind == b'acTL' and len(data) >= 8:
+        frames, plays = struct.unpack('>II', data[:8])
+        node['info'] = f"{frames} frames, {plays or 'infinite'} plays"
+    elif kind == b'iCCP':
+        node['info'] = data.partition(b'\x00')[0].decode('latin-1')
+    elif kind == b'tRNS' and header and header[3] == 3:
+        node['info'] = f"{length} palette alphas"
+    return header
+
+
+def _png_structure(walker):
+    walker.add("Signature", 0, 8, "PNG")
+    position = 8
+    header = None
+    idat = None
+    idat_done = False
+
+    def finish_idat(end):
+        expected = png_raw_size(*header) if header else None
+        idat.finish(walker, end, expected)
+
+    while True:
+        head = walker.read(position, 8)
+        if len(head) < 8:
+            if idat and not idat_done:
+                finish_idat(position)
+            node = walker.add("End of file", position, 0)
+            walker.flag(position, "File ends without an IEND chunk", node)
+            return walker.size
+        length, kind = struct.unpack('>I4s', head)
+        if not all(0x41 <= byte <= 0x5A or 0x61 <= byte <= 0x7A for byte in kind):
+            if idat and not idat_done:
+                finish_idat(position)
+            return walker.unparsed(position, f"Invalid chunk type {kind!r}")
+        name = kind.decode('ascii')
+
+        if kind == b'IDAT':
+            if idat is None:
+                idat = _IdatStream(walker, position)
+            elif idat_done:
+                walker.flag(position, "IDAT chunk after the image data ended", idat.node)
+            parent = idat.node
+        else:
+            if idat and not idat_done:
+                finish_idat(position)
+                idat_done = True
+            parent = None
+        node = walker.add(name, position, 12 + length, parent=parent)
+
+        if length > 0x7fffffff or position + 12 + length > walker.size:
+            walker.flag(position, f"{name} chunk of {length} bytes runs past the end of the file", node)
+            if kind == b'IDAT':
+                finish_idat(walker.size)
+            return walker.size
+        if position == 8 and kind != b'IHDR':
+            walker.flag(position, "First chunk is not IHDR", node)
+        if kind not in PNG_CHUNK_TYPES:
+            critical = "critical" if kind[0] < 0x61 else "ancillary"
+            walker.flag(position, f"Unknown {critical} chunk {name}", node)
+        if length > STRUCTURE_LARGE_CHUNK and kind not in (b'IDAT', b'fdAT'):
+            walker.flag(position, f"{name} chunk is unusually large ({length} bytes)", node)
+
+        crc = zlib.crc32(kind)
+        kept = b''
+        for data in walker.blocks(position + 8, length):
+            crc = zlib.crc32(data, crc)
+            if kind == b'IDAT':
+                idat.feed(data)
+            elif len(kept) < STRUCTURE_KEEP_BYTES:
+                kept += data[:STRUCTURE_KEEP_BYTES - len(kept)]
+        stored = int.from_bytes(walker.read(position + 8 + length, 4), 'big')
+        if crc != stored:
+            walker.flag(position, f"{name} CRC mismatch (stored {stored:08X}, computed {crc:08X})", node)
+
+        if kind == b'IDAT':
+            idat.chunks += 1
+            node['info'] = f"{length} bytes"
+        else:
+            header = _png_chunk_info(walker, node, kind, length, kept, header)
+        position += 12 + length
+        if kind == b'IEND':
+            if idat is None:
+                walker.flag(position, "No IDAT chunks before IEND", node)
+            return position
+
+
+JPEG_MARKERS = {0x01: "TEM", 0xC4: "DHT", 0xC8: "JPG", 0xCC: "DAC", 0xD8: "SOI", 0xD9: "EOI", 0xDA: "SOS",
+                0xDB: "DQT", 0xDC: "DNL", 0xDD: "DRI", 0xDE: "DHP", 0xDF: "EXP", 0xFE: "COM"}
+JPEG_MARKERS.update({0xC0 + n: f"SOF{n}" for n in range(16) if n not in (4, 8, 12)})
+JPEG_MARKERS.update({0xD0 + n: f"RST{n}" for n in range(8)})
+JPEG_MARKERS.update({0xE0 + n: f"APP{n}" for n in range(16)})
+JPEG_MARKERS.update({0xF0 + n: f"JPG{n}" for n in range(14)})
+
+# Identifiers of well-known application segments; others are flagged
+JPEG_APP_IDENTIFIERS = {
+    b'JFIF', b'JFXX', b'Exif', b'http://ns.adobe.com/xap/1.0/', b'http://ns.adobe.com/xmp/extension/',
+    b'ICC_PROFILE', b'Adobe', b'Ducky', b'Photoshop 3.0', b'MPF', b'FPXR', b'AROT', b'HDR_RI ver', b'Meta',
+}
+
+
+def _jpeg_scan_end(walker, position):
+    """(offset of the marker ending the entropy-coded data from position, restart markers inside)
+
+    Stuffed 0xFF00 bytes, fill bytes and RSTn markers belong to the scan.
+    """
+    restarts = 0
+    while True:
+        data = walker.read(position, STRUCTURE_BLOCK_SIZE + 1)
+        if len(data) < 2:
+            return walker.size, restarts
+        values = np.frombuffer(data, dtype=np.uint8)
+        following = values[1:]
+        markers = (values[:-1] == 0xFF) & (following != 0) & (following != 0xFF)
+        restart = markers & (following >= 0xD0) & (following <= 0xD7)
+        ends = np.flatnonzero(markers & ~restart)
+        if len(ends):
+            restarts += int(np.count_nonzero(restart[:ends[0]]))
+            return position + int(ends[0]), restarts
+        restarts += int(np.count_nonzero(restart))
+        position += len(data) - 1
+        walker.tick(position)
+
+
+def _jpeg_segment_info(walker, node, marker, length, data):
+    if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC) and len(data) >= 6:
+        precision, height, width, components = struct.unpack('>BHHB', data[:6])
+        kind = "progressive" if marker in (0xC2, 0xC6, 0xCA, 0xCE) else "baseline" if marker == 0xC0 else "sequential"
+        node['info'] = f"{kind}, {width}x{height}, {components} components, {precision}-bit"
+    elif marker == 0xDA and len(data) >= 4:
+        node['info'] = f"{data[0]} components, spectral selection {data[-3]}-{data[-2]}"
+    elif marker == 0xDD and len(data) >= 2:
+        node['info'] = f"restart interval {int.from_bytes(data[:2], 'big')}"
+    elif marker == 0xDB:
+        node['info'] = f"{max(1, length // 65)} tables"
+    elif marker == 0xFE:
+        _check_comment(walker, node, length, data)
+    elif 0xE0 <= marker <= 0xEF:
+        identifier = data.split(b'\x00', 1)[0][:40]
+        node['info'] = identifier.decode('latin-1')
+        if identifier not in JPEG_APP_IDENTIFIERS:
+            walker.flag(node['offset'], f"{node['name']} segment with unrecognised identifier {identifier[:16]!r}", node)
+
+
+def _jpeg_structure(walker):
+    walker.add("SOI", 0, 2, "start of image")
+    position = 2
+    while True:
+        head = walker.read(position, 4)
+        if len(head) < 2:
+            node = walker.add("End of file", position, 0)
+            walker.flag(position, "File ends without an EOI marker", node)
+            return walker.size
+        if head[0] != 0xFF:
+            return walker.unparsed(position, f"Expected a marker, found byte {head[0]:02X}")
+        marker = head[1]
+        if marker == 0xFF:
+            position += 1  # fill byte
+            continue
+        name = JPEG_MARKERS.get(marker, f"Reserved {marker:02X}")
+
+        if marker == 0xD9:
+            walker.add(name, position, 2, "end of image")
+            return position + 2
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            node = walker.add(name, position, 2)
+            if marker == 0xD8:
+                walker.flag(position, "SOI marker inside the image", node)
+            position += 2
+            continue
+
+        length = int.from_bytes(head[2:4], 'big')
+        node = walker.add(name, position, 2 + length)
+        if marker not in JPEG_MARKERS:
+            walker.flag(position, f"Reserved marker {marker:02X}", node)
+        if length < 2 or position + 2 + length > walker.size:
+            walker.flag(position, f"{name} segment length {length} is invalid", node)
+            return walker.size
+        _jpeg_segment_info(walker, node, marker, length - 2,
+                           walker.read(position + 4, min(length - 2, STRUCTURE_KEEP_BYTES)))
+        position += 2 + length
+
+        if marker == 0xDA:
+            end, restarts = _jpeg_scan_end(walker, position)
+            walker.add("Scan data", position, end - position, f"{restarts} restart markers" if restarts else "")
+            position = end
+
+
+GIF_EXTENSIONS = {0x01: "Plain text extension", 0xF9: "Graphic control extension",
+                  0xFE: "Comment extension", 0xFF: "Application extension"}
+
+# Application extension identifiers of well-known encoders; others are flagged
+GIF_APPLICATIONS = {b'NETSCAPE2.0', b'ANIMEXTS1.0', b'XMP DataXMP', b'ICCRGBG1012', b'MGK8BIM0000',
+                    b'MGKIPTC0000', b'STARDIV 5.0', b'ImageMagick'}
+
+
+def _gif_sub_blocks(walker, position):
+    """(end, data bytes, sub-block count, first kept bytes) of a sub-block chain, end None if truncated"""
+    size = 0
+    count = 0
+    kept = b''
+    while True:
+        data = walker.read(position, 256)
+        if not data or len(data) < data[0] + 1:
+            return None, size, count, kept
+        length = data[0]
+        position += 1 + length
+        if not length:
+            return position, size, count, kept
+        size += length
+        count += 1
+        if len(kept) < STRUCTURE_KEEP_BYTES:
+            kept += data[1:1 + length]
+
+
+def _gif_structure(walker):
+    header = walker.read(0, 13)
+    if len(header) < 13:
+        return walker.unparsed(0, "Truncated GIF header")
+    width, height, flags, background = struct.unpack('<HHBB', header[6:12])
+    walker.add("Header", 0, 6, header[:6].decode('latin-1'))
+    walker.add("Logical screen descriptor", 6, 7, f"{width}x{height}, background index {background}")
+    position = 13
+    if flags & 0x80:
+        table = 3 << ((flags & 7) + 1)
+        walker.add("Global colour table", position, table, f"{table // 3} entries")
+        position += table
+
+    frames = 0
+    while True:
+        block = walker.read(position, 1)
+        if not block:
+            node = walker.add("End of file", position, 0)
+            walker.flag(position, "File ends without a trailer", node)
+            return walker.size
+        if block == b';':
+            walker.add("Trailer", position, 1)
+            return position + 1
+
+        if block == b'!':
+            label = walker.read(position + 1, 1)
+            label = label[0] if label else -1
+            end, size, count, data = _gif_sub_blocks(walker, position + 2)
+            node = walker.add(GIF_EXTENSIONS.get(label, f"Extension {label:02X}"), position,
+                              (end or walker.size) - position, f"{size} bytes in {count} sub-blocks")
+            if label == 0xF9 and len(data) >= 4:
+                delay = int.from_bytes(data[1:3], 'little') * 10
+                node['info'] = f"delay {delay} ms, disposal {data[0] >> 2 & 7}" + \
+                               (f", transparent index {data[3]}" if data[0] & 1 else "")
+            elif label == 0xFE:
+                node['info'] = ""
+                _check_comment(walker, node, size, data)
+            elif label == 0xFF:
+                identifier = data[:11]
+                node['info'] = identifier.decode('latin-1')
+                if identifier not in GIF_APPLICATIONS:
+                    walker.flag(position, f"Application extension with unrecognised identifier {identifier!r}", node)
+            elif label not in GIF_EXTENSIONS:
+                walker.flag(position, f"Unknown extension label {label:02X}", node)
+        elif block == b',':
+            descriptor = walker.read(position, 11)
+            if len(descriptor) < 11:
+                return walker.unparsed(position, "Truncated image descriptor")
+            left, top, frame_width, frame_height, frame_flags = struct.unpack('<HHHHB', descriptor[1:10])
+            node = walker.add(f"Image {frames}", position, 0,
+                              f"{frame_width}x{frame_height} at ({left}, {top})"
+                              f"{', interlaced' if frame_flags & 0x40 else ''}")
+            frames += 1
+            if left + frame_width > width or top + frame_height > height:
+                walker.flag(position, "Image extends beyond the logical screen", node)
+            start = position
+            position += 10
+            if frame_flags & 0x80:
+                table = 3 << ((frame_flags & 7) + 1)
+                walker.add("Local colour table", position, table, f"{table // 3} entries", node)
+                position += table
+            code_size = walker.read(position, 1)
+            if not code_size:
+                return walker.unparsed(position, "Truncated image data")
+            end, size, count, _ = _gif_sub_blocks(walker, position + 1)
+            walker.add("Image data", position, (end or walker.size) - position,
+                       f"LZW code size {code_size[0]}, {size} bytes in {count} sub-blocks", node)
+            if not 2 <= code_size[0] <= 8:
+                walker.flag(position, f"Invalid LZW minimum code size {code_size[0]}", node)
+            node['size'] = (end or walker.size) - start
+        else:
+            return walker.unparsed(position, f"Unexpected block introducer {block[0]:02X}")
+
+        if end is None:
+            walker.flag(node['offset'], "Data sub-blocks run past the end of the file", node)
+            return walker.size
+        position = end
+
+
+BMP_HEADERS = {12: "BITMAPCOREHEADER", 16: "OS22XBITMAPHEADER", 40: "BITMAPINFOHEADER", 52: "BITMAPV2INFOHEADER",
+               56: "BITMAPV3INFOHEADER", 64: "OS22XBITMAPHEADER", 108: "BITMAPV4HEADER", 124: "BITMAPV5HEADER"}
+
+BMP_COMPRESSION = {0: "uncompressed", 1: "RLE8", 2: "RLE4", 3: "bit fields", 4: "JPEG", 5: "PNG",
+                   6: "alpha bit fields", 11: "CMYK", 12: "CMYK RLE8", 13: "CMYK RLE4"}
+
+
+def _bmp_structure(walker):
+    header = walker.read(0, 18)
+    if len(header) < 18:
+        return walker.unparsed(0, "Truncated BMP header")
+    declared, reserved1, reserved2, pixel_offset, dib_size = struct.unpack('<IHHII', header[2:18])
+    node = walker.add("File header", 0, 14, f"declared size {declared}, pixel data at {pixel_offset}")
+    if declared != walker.size:
+        walker.flag(0, f"Declared file size {declared} differs from the actual size {walker.size}", node)
+    if reserved1 or reserved2:
+        walker.flag(6, f"Reserved header fields are not zero ({reserved1:04X} {reserved2:04X})", node)
+
+    dib = walker.read(14, dib_size)
+    node = walker.add("DIB header", 14, dib_size, BMP_HEADERS.get(dib_size, "unknown header size"))
+    if dib_size not in BMP_HEADERS or len(dib) < dib_size:
+        walker.flag(14, f"Unknown or truncated DIB header of {dib_size} bytes", node)
+        return walker.unparsed(14, "Unsupported DIB header")
+    if dib_size == 12:
+        width, height, planes, bits = struct.unpack('<HHHH', dib[4:12])
+        compression, image_size, colours = 0, 0, 0
+    else:
+        width, height, planes, bits = struct.unpack('<iiHH', dib[4:16])
+        compression, image_size = struct.unpack('<II', dib[16:24]) if dib_size >= 24 else (0, 0)
+        colours = int.from_bytes(dib[32:36], 'little') if dib_size >= 36 else 0
+    node['info'] += f", {width}x{abs(height)}, {bits}-bit, {BMP_COMPRESSION.get(compression, compression)}"
+    if planes != 1:
+        walker.flag(14, f"Plane count is {planes}, not 1", node)
+
+    position = 14 + dib_size
+    if dib_size == 40 and compression in (3, 6):
+        masks = 12 if compression == 3 else 16
+        walker.add("Bit field masks", position, masks)
+        position += masks
+    if colours or bits <= 8:
+        entries = colours or 1 << bits
+        table = entries * (3 if dib_size == 12 else 4)
+        walker.add("Colour table", position, table, f"{entries} entries")
+        position += table
+
+    if pixel_offset > position:
+        gap = walker.add("Gap", position, pixel_offset - position, "unused bytes before the pixel data")
+        walker.flag(position, f"{pixel_offset - position} unused bytes between the headers and the pixel data", gap)
+    elif pixel_offset < position:
+        walker.flag(pixel_offset, "Pixel data overlaps the headers", node)
+
+    if compression in (0, 3, 6, 11):
+        pixels = (width * bits + 31) // 32 * 4 * abs(height)
+    else:
+        pixels = image_size
+    node = walker.add("Pixel data", pixel_offset, pixels)
+    end = pixel_offset + pixels
+    if end > walker.size:
+        walker.flag(pixel_offset, f"Pixel data needs {pixels} bytes, the file ends {end - walker.size} bytes early", node)
+        return walker.size
+
+    if dib_size == 124:
+        profile_offset, profile_size = struct.unpack('<II', dib[112:120])
+        if profile_size:
+            walker.add("ICC profile", 14 + profile_offset, profile_size)
+            end = max(end, 14 + profile_offset + profile_size)
+    return end
+
+
+# Structure walkers by leading bytes; each returns the offset where the format ends
+STRUCTURE_PARSERS = [
+    (b'\x89PNG\r\n\x1a\n', "PNG", _png_structure),
+    (b'\xff\xd8', "JPEG", _jpeg_structure),
+    (b'GIF87a', "GIF", _gif_structure),
+    (b'GIF89a', "GIF", _gif_structure),
+    (b'BM', "BMP", _bmp_structure),
+]
+
+
+def analyze_file_structure(filepath, progress=None):
+    """File information plus a walk of the whole PNG, JPEG, GIF or BMP container
+
+    The file is streamed in bounded blocks, so memory stays flat for
+    files of any size. PNG chunk CRCs are verified and the IDAT stream
+    is inflated to check its size against the header. Returns the tree
+    of nodes (name, offset, size, info, children and an anomaly flag),
+    the anomalies found, the number of trailing bytes after the end of
+    the format, and how many nodes or anomalies were left out.
+    """
+    size = os.path.getsize(filepath)
+    with open(filepath, 'rb') as f:
+        data = f.read(1024)  # Read first 1KB
+        file_type, signature = identify_file_type(data)
+        walker = _StructureWalker(f, size, progress)
+        fmt = None
+        end = size
+        for magic, name, parser in STRUCTURE_PARSERS:
+            if data.startswith(magic):
+                fmt = name
+                end = parser(walker)
+                break
+
+        if end < size:
+            trailing = walker.add("Trailing data", end, size - end, _trailing_description(walker.read(end, 64)))
+            walker.flag(end, f"{size - end} bytes of data after the end of the {fmt} image", trailing)
+
+    return {
+        'file': os.path.basename(filepath),
+        'size': size,
+        'type': file_type,
+        'signature': signature,
+        'format': fmt,
+        'nodes': walker.nodes,
+        'anomalies': walker.anomalies,
+        'trailing': size - end,
+        'omitted': walker.omitted,
+    }
+
+
+def iter_structure(nodes, depth=0):
+    """(depth, node) of a structure tree in file order"""
+    for node in nodes:
+        yield depth, node
+        yield from iter_structure(node['children'], depth + 1)
+
+
+def format_file_structure(structure):
+    """Render a file structure report as the text shown in the GUI"""
+    info = f"File: {structure['file']}\n"
+    info += f"Size: {structure['size']} bytes\n"
+    info += f"Type: {structure['type']}\n"
+    if structure['signature']:
+        info += f"Signature: {structure['signature']}\n"
+    if structure.get('format') is None:
+        return info
+
+    info += f"Trailing data: {structure['trailing']} bytes\n"
+    info += f"\nAnomalies ({len(structure['anomalies'])}):\n"
+    for anomaly in structure['anomalies']:
+        info += f"  {anomaly['offset']:08X}  {anomaly['message']}\n"
+    info += "\nStructure:\n"
+    for depth, node in iter_structure(structure['nodes']):
+        mark = "!" if node.get('anomaly') else " "
+        info += f"{mark} {node['offset']:08X} {'  ' * depth}{node['name']} ({node['size']} bytes)"
+        info += f"  {node['info']}\n" if node['info'] else "\n"
+    if structure['omitted']:
+        info += f"... {structure['omitted']} more nodes and anomalies not listed\n"
+    return info
+
+
+# Data carving: many signatures found in one pass, sized from their headers or footers
+
+def _printable(data):
+    return all(0x20 <= byte < 0x7f for byte in data)
+
+
+def _inflate_size(read, decompressor):
+    """Bytes used by the compressed stream at offset 0, or None if it does not decode
+
+    The stream is decompressed in bounded steps and the output thrown
+    away; random bytes are rejected within a few bytes of input.
+    """
+    position = 0
+    block = 4096
+    while not decompressor.eof:
+        data = read(position, block)
+        if not data:
+            return None
+        position += len(data)
+        block = min(block * 4, 1 << 20)
+        try:
+            decompressor.decompress(data, 1 << 20)
+            # zlib keeps unprocessed input in unconsumed_tail, bz2 and lzma
+            # buffer it internally until needs_input is set again
+            while not decompressor.eof and (getattr(decompressor, 'unconsumed_tail', b'')
+                                            or not getattr(decompressor, 'needs_input', True)):
+                decompressor.decompress(getattr(decompressor, 'unconsumed_tail', b''), 1 << 20)
+        except (zlib.error, lzma.LZMAError, OSError, EOFError):
+            return None
+    return position - len(decompressor.unused_data)
+
+
+def _png_size(read):
+    # The IEND footer gives the end; only check that IHDR follows the signature
+    return 33 if read(12, 4) == b'IHDR' else None
+
+
+def _jpeg_size(read):
+    # Walk the marker segments up to the start of scan, so thumbnails inside
+    # APP segments do not end the image early
+    position = 2
+    for _ in range(256):
+        marker = read(position, 4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            return None
+        if marker[1] == 0xDA:
+            return position
+        if marker[1] == 0xFF:
+            position += 1
+            continue
+        position += 2 + int.from_bytes(marker[2:4], 'big')
+    return None
+
+
+def _gif_size(read):
+    header = read(0, 13)
+    if len(header) < 13:
+        return None
+    position = 13
+    if header[10] & 0x80:
+        position += 3 << ((header[10] & 7) + 1)
+
+    while True:
+        block = read(position, 1)
+        if block == b';':
+            return position + 1
+        if block == b',':
+            descriptor = read(position, 10)
+            if len(descriptor) < 10:
+                return None
+            position += 10
+            if descriptor[9] & 0x80:
+                position += 3 << ((descriptor[9] & 7) + 1)
+            position += 1  # LZW minimum code size
+        elif block == b'!':
+            position += 2
+        else:
+            return None
+
+        # Data sub-blocks up to the zero-length terminator
+        while True:
+            length = read(position, 1)
+            if not length:
+                return None
+            position += 1 + length[0]
+            if length[0] == 0:
+                break
+
+
+def _bmp_size(read):
+    header = read(0, 18)
+    if len(header) < 18:
+        return None
+    size, reserved, _, dib_size = struct.unpack('<IIII', header[2:18])
+    return size if reserved == 0 and dib_size in (12, 40, 52, 56, 64, 108, 124) and size > 26 else None
+
+
+def _tiff_size(read):
+    # The image data can sit anywhere after the IFDs: size is unknown
+    header = read(0, 8)
+    if len(header) < 8:
+        return None
+    first_ifd = int.from_bytes(header[4:8], 'little' if header[:2] == b'II' else 'big')
+    return 0 if first_ifd >= 8 else None
+
+
+def _zip_size(read):
+    header = read(0, 30)
+    if len(header) < 30:
+        return None
+    version = int.from_bytes(header[4:6], 'little')
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    return 30 + name_length + extra_length if version < 100 else None
+
+
+def _zip_end(read):
+    # End of central directory record plus its comment
+    record = read(0, 22)
+    return 22 + int.from_bytes(record[20:22], 'little') if len(record) == 22 else 4
+
+
+def _pdf_size(read):
+    return 8 if read(5, 2) in (b'1.', b'2.') else None
+
+
+def _pdf_end(read):
+    # %%EOF and the line break after it
+    tail = read(5, 2)
+    return 5 + (2 if tail == b'\r\n' else 1 if tail[:1] in (b'\r', b'\n') else 0)
+
+
+def _7z_size(read):
+    header = read(0, 32)
+    if len(header) < 32 or header[6] != 0 or zlib.crc32(header[12:32]) != int.from_bytes(header[8:12], 'little'):
+        return None
+    next_offset, next_size = struct.unpack('<QQ', header[12:28])
+    return 32 + next_offset + next_size
+
+
+def _rar_size(read):
+    # RAR 4 archives end with a fixed end-of-archive block; RAR 5 size is unknown
+    version = read(6, 2)
+    if version[:1] == b'\x00':
+        return 7
+    return 0 if version == b'\x01\x00' else None
+
+
+def _gzip_size(read):
+    flags = read(3, 1)
+    return _inflate_size(read, zlib.decompressobj(31)) if flags and not flags[0] & 0xE0 else None
+
+
+def _zlib_size(read):
+    return _inflate_size(read, zlib.decompressobj(15))
+
+
+def _bzip2_size(read):
+    header = read(3, 7)
+    if len(header) < 7 or not b'1' <= header[:1] <= b'9' or header[1:] != b'1AY&SY':
+        return None
+    return _inflate_size(read, bz2.BZ2Decompressor())
+
+
+def _xz_size(read):
+    flags = read(6, 6)
+    if len(flags) < 6 or zlib.crc32(flags[:2]) != int.from_bytes(flags[2:6], 'little'):
+        return None
+    return _inflate_size(read, lzma.LZMADecompressor(lzma.FORMAT_XZ))
+
+
+def _elf_size(read):
+    header = read(0, 64)
+    if len(header) < 52 or header[4] not in (1, 2) or header[5] not in (1, 2) or header[6] != 1:
+        return None
+    endian = '<' if header[5] == 1 else '>'
+    if header[4] == 1:
+        phoff, shoff = struct.unpack(endian + 'II', header[28:36])
+        ehsize, phentsize, phnum, shentsize, shnum = struct.unpack(endian + 'HHHHH', header[40:50])
+        entry = endian + 'IIIIII'
+    else:
+        phoff, shoff = struct.unpack(endian + 'QQ', header[32:48])
+        ehsize, phentsize, phnum, shentsize, shnum = struct.unpack(endian + 'HHHHH', header[52:62])
+        entry = endian + 'IIQQQQ'
+    size = max(ehsize, phoff + phentsize * phnum, shoff + shentsize * shnum)
+
+    # Section contents usually lie before the section table, but not always
+    table = b''
+    if shoff and struct.calcsize(entry) <= shentsize and shentsize * shnum <= 1 << 20:
+        table = read(shoff, shentsize * shnum)
+    for index in range(len(table) // shentsize if table else 0):
+        _, kind, _, _, offset, length = struct.unpack_from(entry, table, index * shentsize)
+        if kind != 8:  # SHT_NOBITS occupies no file space
+            size = max(size, offset + length)
+    return size
+
+
+def _pe_size(read):
+    header = read(0, 64)
+    if len(header) < 64:
+        return None
+    pe_offset = int.from_bytes(header[60:64], 'little')
+    if not 64 <= pe_offset <= 4096 or read(pe_offset, 4) != b'PE\x00\x00':
+        return None
+    coff = read(pe_offset + 4, 20)
+    if len(coff) < 20:
+        return None
+    sections = int.from_bytes(coff[2:4], 'little')
+    table_offset = pe_offset + 24 + int.from_bytes(coff[16:18], 'little')
+    table = read(table_offset, 40 * sections)
+
+    # Raw section data ends the image; anything after it is an overlay
+    size = table_offset + 40 * sections
+    for index in range(len(table) // 40):
+        raw_size, raw_offset = struct.unpack_from('<II', table, index * 40 + 16)
+        size = max(size, raw_offset + raw_size)
+    return size
+
+
+def _riff_size(read):
+    header = read(0, 12)
+    if len(header) < 12 or not _printable(header[8:12]):
+        return None
+    size = 8 + int.from_bytes(header[4:8], 'little')
+    return size + (size & 1)
+
+
+def _ogg_size(read):
+    position = 0
+    while True:
+        header = read(position, 27)
+        if len(header) < 27 or header[:4] != b'OggS' or header[4] != 0:
+            return position or None
+        segments = read(position + 27, header[26])
+        if len(segments) < header[26]:
+            return None
+        position += 27 + header[26] + sum(segments)
+        if header[5] & 4:  # end of stream
+            return position
+
+
+def _mp4_size(read):
+    # Sum of the top-level boxes
+    position = 0
+    while True:
+        header = read(position, 16)
+        if len(header) < 8 or not _printable(header[4:8]):
+            break
+        size = int.from_bytes(header[:4], 'big')
+        if size == 1 and len(header) == 16:
+            size = int.from_bytes(header[8:16], 'big')
+        if size < 8:
+            break
+        position += size
+    return position or None
+
+
+def _tar_size(read):
+    position = 0
+    while True:
+        header = read(position, 512)
+        if len(header) < 512:
+            return position or None
+        if header == bytes(512):
+            return position + 1024  # two zero blocks end the archive
+        if header[257:262] != b'ustar':
+            return position or None
+        try:
+            size = int(header[124:136].strip(b'\x00 ') or b'0', 8)
+        except ValueError:
+            return position or None
+        position += 512 + -(-size // 512) * 512
+
+
+def _sqlite_size(read):
+    header = read(0, 100)
+    if len(header) < 100:
+        return None
+    page_size, = struct.unpack('>H', header[16:18])
+    page_size = 65536 if page_size == 1 else page_size
+    pages, = struct.unpack('>I', header[28:32])
+    return page_size * pages if page_size >= 512 and not page_size & (page_size - 1) and pages else None
+
+
+def _id3_size(read):
+    return 0 if read(3, 1) in (b'\x02', b'\x03', b'\x04') else None
+
+
+# What the carver looks for. The parser validates a hit and returns its size
+# (or 0 when unknown); with a footer the parsed size is where the footer
+# search starts and footer_end measures the footer. last_footer picks the
+# last footer before the next header of the same type (incremental PDFs);
+# types that are not nested are only reported outside other files
+Signature = namedtuple('Signature', 'extension description magic offset parser footer footer_end last_footer nested',
+                       defaults=(0, None, None, None, False, True))
+
+CARVE_SIGNATURES = [
+    Signature('png', "PNG image", b'\x89PNG\r\n\x1a\n', parser=_png_size, footer=b'IEND\xaeB`\x82'),
+    Signature('jpg', "JPEG image", b'\xff\xd8\xff', parser=_jpeg_size, footer=b'\xff\xd9'),
+    Signature('gif', "GIF image", b'GIF87a', parser=_gif_size),
+    Signature('gif', "GIF image", b'GIF89a', parser=_gif_size),
+    Signature('bmp', "BMP image", b'BM', parser=_bmp_size),
+    Signature('tif', "TIFF image", b'II*\x00', parser=_tiff_size),
+    Signature('tif', "TIFF image", b'MM\x00*', parser=_tiff_size),
+    Signature('zip', "ZIP archive (also DOCX, JAR, APK)", b'PK\x03\x04', parser=_zip_size,
+              footer=b'PK\x05\x06', footer_end=_zip_end),
+    Signature('pdf', "PDF document", b'%PDF-', parser=_pdf_size, footer=b'%%EOF', footer_end=_pdf_end,
+              last_footer=True),
+    Signature('7z', "7-Zip archive", b"7z\xbc\xaf'\x1c", parser=_7z_size),
+    Signature('rar', "RAR archive", b'Rar!\x1a\x07', parser=_rar_size, footer=b'\xc4={\x00@\x07\x00'),
+    Signature('gz', "gzip data", b'\x1f\x8b\x08', parser=_gzip_size),
+    Signature('zlib', "zlib data", b'x\x01', parser=_zlib_size, nested=False),
+    Signature('zlib', "zlib data", b'x^', parser=_zlib_size, nested=False),
+    Signature('zlib', "zlib data", b'x\x9c', parser=_zlib_size, nested=False),
+    Signature('zlib', "zlib data", b'x\xda', parser=_zlib_size, nested=False),
+    Signature('bz2', "bzip2 data", b'BZh', parser=_bzip2_size),
+    Signature('xz', "xz data", b'\xfd7zXZ\x00', parser=_xz_size),
+    Signature('elf', "ELF executable", b'\x7fELF', parser=_elf_size),
+    Signature('exe', "PE executable", b'MZ', parser=_pe_size),
+    Signature('riff', "RIFF container (WAV, AVI, WebP)", b'RIFF', parser=_riff_size),
+    Signature('ogg', "Ogg stream", b'OggS', parser=_ogg_size),
+    Signature('flac', "FLAC audio", b'fLaC'),
+    Signature('mp3', "MP3 audio (ID3)", b'ID3', parser=_id3_size),
+    Signature('mp4', "MP4/MOV video", b'ftyp', offset=4, parser=_mp4_size),
+    Signature('tar', "tar archive", b'ustar', offset=257, parser=_tar_size),
+    Signature('sqlite', "SQLite database", b'SQLite format 3\x00', parser=_sqlite_size),
+]
+
+# Largest size given to a carved file whose end cannot be determined
+CARVE_MAX_SIZE = 64 * 1024 * 1024
+
+
+class SignatureMatcher:
+    """Find every occurrence of many byte patterns in a single pass
+
+    Every position is looked up by its first two bytes in a 64K-entry
+    table, so the cost of a pass does not grow with the number of
+    patterns; only the rare table hits are compared in full.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.longest = max(len(pattern) for pattern in self.patterns)
+        self.table = np.zeros(65536, dtype=bool)
+        self.by_prefix = {}
+        for index, pattern in enumerate(self.patterns):
+            self.table[pattern[0] << 8 | pattern[1]] = True
+            self.by_prefix.setdefault(pattern[:2], []).append(index)
+
+    def find(self, data, limit=None):
+        """(offset, pattern index) of every match starting before limit, in offset order"""
+        limit = len(data) if limit is None else limit
+        if len(data) < 2:
+            return []
+
+        # Big-endian 16-bit views at even and odd offsets cover every position
+        candidates = []
+        for parity in (0, 1):
+            keys = np.frombuffer(data, dtype='>u2', count=(len(data) - parity) // 2, offset=parity)
+            candidates.append(np.flatnonzero(self.table[keys]) * 2 + parity)
+        positions = np.sort(np.concatenate(candidates))
+
+        matches = []
+        for position in positions[positions < limit].tolist():
+            for index in self.by_prefix[data[position:position + 2]]:
+                if data.startswith(self.patterns[index], position):
+                    matches.append((position, index))
+        return matches
+
+
+def scan_signatures(fileobj, matcher, chunk_size=SCAN_CHUNK_SIZE, progress=None):
+    """Yield (offset, pattern index) for every match in a binary stream, read chunk by chunk"""
+    overlap = matcher.longest - 1
+    fileobj.seek(0, os.SEEK_END)
+    total = max(1, fileobj.tell())
+    fileobj.seek(0)
+    buffer = b''
+    base = 0
+    while True:
+        chunk = fileobj.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+        # A match starting in the last overlap bytes may continue in the next chunk
+        limit = len(buffer) if eof else len(buffer) - overlap
+        for position, index in matcher.find(buffer, limit):
+            yield base + position, index
+        if eof:
+            return
+        if progress:
+            progress(min(1.0, (base + len(buffer)) / total))
+
+        cut = max(0, limit)
+        base += cut
+        buffer = buffer[cut:]
+
+
+_CARVE_FOOTERS = sorted({signature.footer for signature in CARVE_SIGNATURES if signature.footer})
+_CARVE_MATCHER = SignatureMatcher([signature.magic for signature in CARVE_SIGNATURES] + _CARVE_FOOTERS)
+_CARVE_TOP_LEVEL = {signature.extension for signature in CARVE_SIGNATURES if not signature.nested}
+
+
+def carve(fileobj, max_size=CARVE_MAX_SIZE, chunk_size=SCAN_CHUNK_SIZE, progress=None):
+    """Embedded files found in a seekable binary stream, in offset order
+
+    One streaming pass collects every header and footer occurrence;
+    each header is then validated and sized from its own structure,
+    its footer, or else runs up to the next header (at most max_size).
+    Hits nested inside an earlier file of the same type, such as ZIP
+    members or JPEG thumbnails, are dropped. Returns dicts with offset,
+    size, extension, description and whether the size is exact.
+    """
+    headers = []
+    footers = {footer: [] for footer in _CARVE_FOOTERS}
+    for offset, index in scan_signatures(fileobj, _CARVE_MATCHER, chunk_size, progress):
+        if index < len(CARVE_SIGNATURES):
+            start = offset - CARVE_SIGNATURES[index].offset
+            if start >= 0:
+                headers.append((start, index))
+        else:
+            footers[_CARVE_FOOTERS[index - len(CARVE_SIGNATURES)]].append(offset)
+    fileobj.seek(0, os.SEEK_END)
+    total = fileobj.tell()
+    headers.sort()
+    starts = np.array([start for start, _ in headers], dtype=np.int64)
+    type_starts = {}
+    for start, index in headers:
+        type_starts.setdefault(CARVE_SIGNATURES[index].extension, []).append(start)
+    footers = {footer: np.array(positions, dtype=np.int64) for footer, positions in footers.items()}
+
+    def reader(base):
+        def read(offset, size):
+            fileobj.seek(base + offset)
+            return fileobj.read(size)
+        return read
+
+    found = []
+    for start, index in headers:
+        signature = CARVE_SIGNATURES[index]
+        read = reader(start)
+        size = signature.parser(read) if signature.parser else 0
+        if size is None:
+            continue
+        exact = size > 0
+
+        if signature.footer:
+            positions = footers[signature.footer]
+            first = np.searchsorted(positions, start + max(size, len(signature.magic)))
+            if signature.last_footer:
+                same = type_starts[signature.extension]
+                following = same[bisect.bisect_right(same, start):]
+                first = max(first, np.searchsorted(positions, following[0] if following else total) - 1)
+            exact = bool(first < len(positions))
+            if exact:
+                footer = int(positions[first])
+                size = footer - start + (signature.footer_end(reader(footer)) if signature.footer_end
+                                         else len(signature.footer))
+
+        if not exact:
+            # Unknown end: run up to the next header
+            following = starts[np.searchsorted(starts, start, side='right'):]
+            size = min(int(following[0]) if len(following) else total, start + max_size) - start
+        elif start + size > total:
+            size, exact = total - start, False
+
+        found.append({'offset': start, 'size': int(size), 'extension': signature.extension,
+                      'description': signature.description, 'exact': exact})
+
+    # Drop hits inside an earlier file of the same type, and files of
+    # unknown size or top-level-only type inside an exactly sized one
+    carved = []
+    type_ends = {}
+    exact_end = 0
+    for candidate in sorted(found, key=lambda c: (c['offset'], -c['size'])):
+        end = candidate['offset'] + candidate['size']
+        if candidate['offset'] < type_ends.get(candidate['extension'], 0):
+            continue
+        if candidate['offset'] < exact_end and (not candidate['exact'] or candidate['extension'] in _CARVE_TOP_LEVEL):
+            continue
+        carved.append(candidate)
+        type_ends[candidate['extension']] = end
+        if candidate['exact']:
+            exact_end = max(exact_end, end)
+    return carved
+
+
+def carve_file(filepath, max_size=CARVE_MAX_SIZE, progress=None):
+    """Embedded files found in a file on disk"""
+    with open(filepath, 'rb') as f:
+        return carve(f, max_size, progress=progress)
+
+
+def lsb_streams(image_array):
+    """Common LSB embeddings searched for hidden files: (label, bit masks, order, bit order)"""
+    names = channel_names(image_array)
+    colour = [name for name in names if name != 'Alpha']
+    letters = ''.join(name[0] for name in colour) if len(colour) > 1 else colour[0]
+
+    streams = []
+    for order in ('row', 'column'):
+        for bit_order in ('msb', 'lsb'):
+            streams.append((f"{letters} bit 0, {order}s, {bit_order.upper()} first",
+                            dict.fromkeys(colour, 1), order, bit_order))
+    if len(colour) > 1:
+        for name in colour:
+            streams.append((f"{name} bit 0, rows, MSB first", {name: 1}, 'row', 'msb'))
+    if 'Alpha' in names:
+        streams.append(("ARGB bit 0, rows, MSB first", dict.fromkeys(names, 1), 'row', 'msb'))
+    return streams
+
+
+def carve_lsb_streams(image_array, max_size=CARVE_MAX_SIZE, progress=None):
+    """Embedded files found in the byte streams of the common LSB embeddings
+
+    Every candidate also carries the stream label as 'source' and its
+    index in lsb_streams() as 'stream'.
+    """
+    streams = lsb_streams(image_array)
+    carved = []
+    for index, (label, masks, order, bit_order) in enumerate(streams):
+        data = extract_data(image_array, masks, order, bit_order)
+        done = (lambda fraction, index=index: progress((index + fraction) / len(streams))) if progress else None
+        for candidate in carve(io.BytesIO(data), max_size, progress=done):
+            candidate.update(source=label, stream=index)
+            carved.append(candidate)
+    return carved
+
+
+def save_carved(candidates, directory, filepath, image_array=None, chunk_size=SCAN_CHUNK_SIZE):
+    """Write carved candidates into directory and return the paths written
+
+    Candidates from the file are copied from filepath in chunks; those
+    from LSB streams are cut from the re-extracted stream.
+    """
+    streams = lsb_streams(image_array) if image_array is not None else []
+    extracted = {}
+    paths = []
+    for candidate in candidates:
+        stream = candidate.get('stream')
+        if stream is None:
+            source = open(filepath, 'rb')
+            prefix = 'file'
+        else:
+            if stream not in extracted:
+                _, masks, order, bit_order = streams[stream]
+                extracted[stream] = extract_data(image_array, masks, order, bit_order)
+            source = io.BytesIO(extracted[stream])
+            prefix = f'lsb{stream}'
+
+        path = os.path.join(directory, f"{prefix}_{candidate['offset']:08X}.{candidate['extension']}")
+        with source, open(path, 'wb') as out:
+            source.seek(candidate['offset'])
+            remaining = candidate['size']
+            while remaining > 0:
+                chunk = source.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                out.write(chunk)
+                remaining -= len(chunk)
+        paths.append(path)
+    return paths
+
+
+# Auto-solve: every extraction configuration, pruned early and scored across a process pool
+
+# Bit selections tried in every channel: each single bit, then the low two and three bits
+SOLVE_BIT_MASKS = (1, 2, 4, 8, 16, 32, 64, 128, 0b11, 0b111)
+
+# Stream prefix scored for every configuration, and for those that look promising
+SOLVE_PREFIX_BYTES = 2048
+SOLVE_DEEP_BYTES = 64 * 1024
+
+# Configurations handed to a worker at a time
+SOLVE_BATCH = 64
+
+# Bytes whose printable ratio counts, and the distinct values that tell
+# text from the repeated patterns of smooth high bit planes; text also
+# allows tab and line breaks
+SOLVE_TEXT_BYTES = 256
+SOLVE_TEXT_DISTINCT = 12
+TEXT_BYTES = PRINTABLE.copy()
+TEXT_BYTES[[0x09, 0x0a, 0x0d]] = True
+
+# CTF-style flags such as flag{...} or picoCTF{...}
+SOLVE_FLAG_PATTERN = re.compile(rb'[A-Za-z][A-Za-z0-9_]{1,19}\{[\w\-!?.,:;@#$%&+=/ ]{4,100}\}')
+
+SolveConfig = namedtuple('SolveConfig', 'label bit_masks order bit_order channel_order')
+
+
+def solve_configurations(image_array, bit_masks=SOLVE_BIT_MASKS):
+    """Every (channel sequence, bit selection, scan order, bit order) extraction of an image
+
+    Channel sequences are all ordered selections of the channels, so
+    an RGBA image gives 64 sequences x 10 bit selections x 4 orders.
+    """
+    names = channel_names(image_array)
+    letters = {name: letter for letter, name in CHANNEL_LETTERS.items()}
+    configs = []
+    for count in range(1, len(names) + 1):
+        for sequence in itertools.permutations(names, count):
+            order_letters = ''.join(letters[name] for name in sequence)
+            for mask in bit_masks:
+                bits = [bit for bit in range(8) if mask >> bit & 1]
+                plane = f"bit {bits[0]}" if len(bits) == 1 else f"bits {bits[0]}-{bits[-1]}"
+                for order in ('row', 'column'):
+                    for bit_order in ('msb', 'lsb'):
+                        configs.append(SolveConfig(f"{order_letters} {plane}, {order}s, {bit_order.upper()} first",
+                                                   dict.fromkeys(sequence, mask), order, bit_order, order_letters))
+    return configs
+
+
+def _stream_magic(data, shift, validate):
+    """Description of a file format starting at shift in data
+
+    With validate, formats whose magic is three bytes or less (easily
+    matched by chance) must also pass their header parser; a parser
+    that runs out of data gives the stream the benefit of the doubt.
+    """
+    for signature in CARVE_SIGNATURES:
+        if not data.startswith(signature.magic, shift + signature.offset):
+            continue
+        if validate and signature.parser and len(signature.magic) <= 3:
+            exhausted = []
+
+            def read(offset, size, start=shift):
+                chunk = data[start + offset:start + offset + size]
+                if len(chunk) < size:
+                    exhausted.append(True)
+                return chunk
+
+            if signature.parser(read) is None and not exhausted:
+                continue
+        return signature.description
+    return None
+
+
+def score_stream(data, validate=False):
+    """(score, reasons, entropy, printable ratio) of a candidate byte stream
+
+    Magic bytes of a known format at the start (or after a 4-byte
+    length field), CTF-style flags, a printable start and text-like
+    entropy all raise the score; random or constant streams score 0.
+    """
+    score = 0.0
+    reasons = []
+    for shift in (0, 4):
+        description = _stream_magic(data, shift, validate)
+        if description:
+            score += 50
+            reasons.append(description if not shift else f"{description} after a length field")
+            break
+
+    values = np.frombuffer(data, dtype=np.uint8)
+    text = TEXT_BYTES[values]
+    printable = float(text[:SOLVE_TEXT_BYTES].mean()) if len(values) else 0.0
+    run = int(np.argmin(text)) if not text.all() else len(text)
+
+    # Short flag-like matches turn up in random bytes too; only one that
+    # starts within the leading text (or its length field) counts fully
+    match = SOLVE_FLAG_PATTERN.search(data)
+    if match:
+        leading = match.start() <= run + 4
+        score += 60 if leading else 10
+        reasons.append(f"{'flag' if leading else 'possible flag'} {match.group()[:60].decode('latin-1')!r}")
+    distinct = np.count_nonzero(np.bincount(values[:SOLVE_TEXT_BYTES], minlength=256))
+    counts = np.bincount(values, minlength=256)
+    counts = counts[counts > 0] / max(len(values), 1)
+    entropy = float(-(counts * np.log2(counts)).sum())
+
+    if printable >= 0.75 and run >= 8 and distinct >= SOLVE_TEXT_DISTINCT:
+        # Longer text runs rank higher, up to 4 KB
+        score += 20 * printable + 10 * min(run, 4096) / 4096
+        reasons.append(f"{run} printable bytes at the start")
+        if 3.0 <= entropy <= 6.0:
+            score += 10
+            reasons.append(f"text-like entropy {entropy:.2f}")
+    return round(score, 1), reasons, entropy, printable
+
+
+def _solve_batch(configs, rows=None, columns=None):
+    """Worker entry point: (scored results, pruned count) of a batch of configurations
+
+    Every configuration is scored on a short prefix first; only those
+    that score at all are extracted further and scored again.
+    """
+    if rows is None:
+        rows, columns = _SOLVE_ARRAYS
+    results = []
+    pruned = 0
+    for config in configs:
+        data = rows if config.order == 'row' else columns
+        options = dict(bit_order=config.bit_order, channel_order=config.channel_order)
+        prefix = extract_data(data, config.bit_masks, limit=SOLVE_PREFIX_BYTES, **options)
+        if not score_stream(prefix)[0]:
+            pruned += 1
+            continue
+        stream = extract_data(data, config.bit_masks, limit=SOLVE_DEEP_BYTES, **options)
+        score, reasons, entropy, printable = score_stream(stream, validate=True)
+        if score:
+            results.append({**config._asdict(), 'score': score, 'reasons': reasons, 'entropy': entropy,
+                            'printable': printable, 'preview': stream[:256]})
+    return results, pruned
+
+
+_SOLVE_ARRAYS = None
+
+
+def _solve_init(rows, columns):
+    global _SOLVE_ARRAYS
+    _SOLVE_ARRAYS = rows, columns
+
+
+def auto_solve(image_array, workers=None, top=100, progress=None):
+    """Extract and score the stream of every configuration, best first
+
+    Workers only receive the leading rows and columns that the deepest
+    extraction reads, so a large image is never copied whole; the
+    columns are stored transposed so both scan orders read rows. workers
+    of 0 or 1 scores in this process; otherwise a spawned process pool
+    is used, which is safe from threaded callers such as the GUI.
+    Returns the top results with their configuration, score, reasons
+    and the first bytes of the stream, and how many configurations
+    were tested and pruned after the prefix.
+    """
+    configs = solve_configurations(image_array)
+    height, width = image_array.shape[:2]
+    pixels = SOLVE_DEEP_BYTES * 8 + 64
+    rows = image_array[:-(-pixels // width)]
+    columns = np.ascontiguousarray(image_array[:, :-(-pixels // height)].swapaxes(0, 1))
+    batches = [configs[start:start + SOLVE_BATCH] for start in range(0, len(configs), SOLVE_BATCH)]
+    workers = os.cpu_count() if workers is None else workers
+
+    results = []
+    pruned = 0
+    if workers <= 1:
+        for index, batch in enumerate(batches):
+            found, skipped = _solve_batch(batch, rows, columns)
+            results += found
+            pruned += skipped
+            if progress:
+                progress((index + 1) / len(batches))
+    else:
+        context = multiprocessing.get_context('spawn')
+        pool = ProcessPoolExecutor(min(workers, len(batches)), mp_context=context,
+                                   initializer=_solve_init, initargs=(rows, columns))
+        try:
+            futures = [pool.submit(_solve_batch, batch) for batch in batches]
+            for index, future in enumerate(as_completed(futures)):
+                found, skipped = future.result()
+                results += found
+                pruned += skipped
+                if progress:
+                    progress((index + 1) / len(batches))
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    results.sort(key=lambda result: (-result['score'], result['label']))
+    return {'results': results[:top], 'tested': len(configs), 'pruned': pruned, 'promising': len(results)}
+
+
+def format_auto_solve(result):
+    """Ranked auto-solve results as text"""
+    lines = [f"{result['tested']} configurations, {result['pruned']} pruned after "
+             f"{SOLVE_PREFIX_BYTES} bytes, {result['promising']} promising"]
+    for candidate in result['results']:
+        lines.append(f"{candidate['score']:6.1f}  {candidate['label']}: {'; '.join(candidate['reasons'])}")
+    return '\n'.join(lines) + '\n'
+
+
+# Zigzag scan position -> natural (row-major) index within an 8x8 block
+JPEG_ZIGZAG = np.array(sorted(range(64), key=lambda n: (n // 8 + n % 8, (n % 8) * (1 if (n // 8 + n % 8) % 2 == 0 else -1))))
+_JPEG_NATURAL = np.argsort(JPEG_ZIGZAG)
+
+# Frame types whose Huffman-coded scans can be decoded
+JPEG_PROCESSES = {0xC0: 'baseline', 0xC1: 'extended', 0xC2: 'progressive'}
+
+# Bits of the combined code and magnitude lookups; longer symbols take a slower path
+JPEG_LOOKUP_BITS = 12
+JPEG_LOOKUP_MASK = (1 << JPEG_LOOKUP_BITS) - 1
+
+# Blocks decoded between progress updates
+JPEG_PROGRESS_BLOCKS = 8192
+
+# Orthonormal 8-point DCT-II basis, DCT_BASIS[frequency, sample]
+DCT_BASIS = np.array([[math.sqrt((1 if u else 0.5) / 4) * math.cos((2 * x + 1) * u * math.pi / 16)
+                       for x in range(8)] for u in range(8)], dtype=np.float32)
+
+_WORD_MASK = (1 << 64) - 1
+
+
+@functools.lru_cache(maxsize=32)
+def _huffman_lookup(spec):
+    """(plain, combined) 65536-entry lookups of a Huffman table given as its 16 counts and symbols
+
+    plain maps the next 16 bits to code length << 8 | symbol, 0 for an
+    invalid code. combined maps them to (bits, run, value) with the
+    magnitude bits read and sign-extended, or (0, 0, 0) when code and
+    magnitude do not fit in 16 bits. DC symbols are sizes, which the
+    same layout covers with a run of 0. Camera JPEGs share a handful of
+    tables, so the lookups are cached.
+    """
+    counts, symbols = spec[:16], spec[16:]
+    plain = np.zeros(65536, dtype=np.int64)
+    code = 0
+    index = 0
+    for length in range(1, 17):
+        for _ in range(counts[length - 1]):
+            if code >= 1 << length:
+                raise ValueError("Invalid Huffman table")
+            start = code << (16 - length)
+            plain[start:start + (1 << (16 - length))] = length << 8 | symbols[index]
+            code += 1
+            index += 1
+        code <<= 1
+
+    length = plain >> 8
+    size = plain & 15
+    total = length + size
+    extra = (np.arange(65536) >> np.maximum(16 - total, 0)) & ((1 << size) - 1)
+    value = np.where(extra >= (1 << size) >> 1, extra, extra - (1 << size) + 1)
+    fits = (length > 0) & (total <= JPEG_LOOKUP_BITS)
+    short = slice(None, None, 1 << (16 - JPEG_LOOKUP_BITS))
+    combined = zip(np.where(fits, total, 0)[short].tolist(), np.where(fits, plain >> 4 & 15, 0)[short].tolist(),
+                   np.where(fits, value, 0)[short].tolist())
+    return plain.tolist(), list(combined)
+
+
+def _slow_symbol(plain, acc, nbits):
+    """(bits left, run, value) of a symbol whose code and magnitude need more than 16 bits"""
+    entry = plain[acc >> (nbits - 16) & 0xFFFF]
+    if not entry >> 8:
+        raise ValueError("Invalid Huffman code")
+    size = entry & 15
+    nbits -= (entry >> 8) + size
+    value = acc >> nbits & ((1 << size) - 1)
+    if value < (1 << size) >> 1:
+        value -= (1 << size) - 1
+    return nbits, entry >> 4 & 15, value
+
+
+def _entropy_end(data, position):
+    """Offset of the marker ending the entropy-coded data that starts at position"""
+    values = np.frombuffer(data, dtype=np.uint8, offset=position)
+    following = values[1:]
+    markers = np.flatnonzero((values[:-1] == 0xFF) & (following != 0) & (following != 0xFF) &
+                             ((following < 0xD0) | (following > 0xD7)))
+    return position + int(markers[0]) if len(markers) else len(data)
+
+
+def _scan_segments(data):
+    """Restart intervals of a scan as arrays of 32-bit big-endian words
+
+    Stuffed zero bytes are dropped. Every interval is padded with two
+    zero words, so a decoder that runs past its end reads zeros briefly
+    and then stops with an IndexError.
+    """
+    values = np.frombuffer(data, dtype=np.uint8)
+    following = np.append(values[1:], np.uint8(0))
+    marker = values == 0xFF
+    restarts = np.flatnonzero(marker & (following >= 0xD0) & (following <= 0xD7))
+    keep = np.ones(len(values), dtype=bool)
+    keep[np.flatnonzero(marker & (following == 0)) + 1] = False
+
+    segments = []
+    for start, stop in zip(np.append(0, restarts + 2), np.append(restarts, len(values))):
+        payload = values[start:stop][keep[start:stop]]
+        padded = np.zeros(-(-len(payload) // 4) + 2, dtype='>u4')
+        padded.view(np.uint8)[:len(payload)] = payload
+        words = array.array('I')
+        words.frombytes(padded.astype(np.uint32).tobytes())
+        segments.append(words)
+    return segments
+
+
+def _scan_blocks(frame, components):
+    """(component index in the scan, block offset) of every block in decode order, and blocks per MCU"""
+    if len(components) == 1:
+        component = components[0]
+        offsets = np.arange(component['bh'])[:, None] * component['pbw'] + np.arange(component['bw'])
+        return np.zeros(offsets.size, dtype=np.intp), offsets.ravel() * 64, 1
+
+    indices, offsets = [], []
+    for index, component in enumerate(components):
+        y, x = np.divmod(np.arange(component['v'] * component['h']), component['h'])
+        rows = np.arange(frame['mcu_rows'])[:, None, None] * component['v'] + y
+        columns = np.arange(frame['mcu_cols'])[None, :, None] * component['h'] + x
+        offsets.append(((rows * component['pbw'] + columns) * 64).reshape(-1, len(y)))
+        indices.append(np.full(offsets[-1].shape, index))
+    return np.hstack(indices).ravel(), np.hstack(offsets).ravel(), sum(o.shape[1] for o in offsets)
+
+
+def _scan_runs(segments, indices, offsets, per_segment, progress=None):
+    """Yield (words, chunks) per restart interval; chunks yields lists of (component, offset)"""
+    def chunks(start, stop):
+        for first in range(start, stop, JPEG_PROGRESS_BLOCKS):
+            last = min(stop, first + JPEG_PROGRESS_BLOCKS)
+            yield zip(indices[first:last].tolist(), offsets[first:last].tolist())
+            if progress:
+                progress(last / len(offsets))
+
+    for number, words in enumerate(segments):
+        start = number * per_segment
+        if start >= len(offsets):
+            break
+        yield words, chunks(start, min(len(offsets), start + per_segment))
+
+
+# The decoders below keep the bit reader in local variables: acc holds
+# the next nbits bits of the interval (refilled 32 at a time from words
+# to at least 32 bits before every symbol), so a symbol is one lookup
+
+
+def _decode_sequential(runs, buffers, dc_tables, ac_tables):
+    lookup, mask = JPEG_LOOKUP_BITS, JPEG_LOOKUP_MASK
+    for words, chunks in runs:
+        acc = nbits = position = 0
+        predictions = [0] * len(buffers)
+        for blocks in chunks:
+            for index, base in blocks:
+                out = buffers[index]
+                dc_plain, dc = dc_tables[index]
+                ac_plain, ac = ac_tables[index]
+                if nbits < 32:
+                    acc = (acc << 32 | words[position]) & _WORD_MASK
+                    position += 1
+                    nbits += 32
+                bits, _, value = dc[acc >> (nbits - lookup) & mask]
+                if bits:
+                    nbits -= bits
+                else:
+                    nbits, _, value = _slow_symbol(dc_plain, acc, nbits)
+                predictions[index] += value
+                out[base] = predictions[index]
+
+                k = 1
+                while k < 64:
+                    if nbits < 32:
+                        acc = (acc << 32 | words[position]) & _WORD_MASK
+                        position += 1
+                        nbits += 32
+                    bits, run, value = ac[acc >> (nbits - lookup) & mask]
+                    if bits:
+                        nbits -= bits
+                    else:
+                        nbits, run, value = _slow_symbol(ac_plain, acc, nbits)
+                    if value:
+                        k += run
+                        out[base + k] = value
+                        k += 1
+                    elif run == 15:
+                        k += 16
+                    else:
+                        break
+
+
+def _decode_dc_first(runs, buffers, dc_tables, shift):
+    lookup, mask = JPEG_LOOKUP_BITS, JPEG_LOOKUP_MASK
+    for words, chunks in runs:
+        acc = nbits = position = 0
+        predictions = [0] * len(buffers)
+        for blocks in chunks:
+            for index, base in blocks:
+                if nbits < 32:
+                    acc = (acc << 32 | words[position]) & _WORD_MASK
+                    position += 1
+                    nbits += 32
+                dc_plain, dc = dc_tables[index]
+                bits, _, value = dc[acc >> (nbits - lookup) & mask]
+                if bits:
+                    nbits -= bits
+                else:
+                    nbits, _, value = _slow_symbol(dc_plain, acc, nbits)
+                predictions[index] += value
+                buffers[index][base] = predictions[index] << shift
+
+
+def _decode_dc_refine(runs, buffers, shift):
+    for words, chunks in runs:
+        acc = nbits = position = 0
+        for blocks in chunks:
+            for index, base in blocks:
+                if nbits < 32:
+                    acc = (acc << 32 | words[position]) & _WORD_MASK
+                    position += 1
+                    nbits += 32
+                nbits -= 1
+                if acc >> nbits & 1:
+                    buffers[index][base] |= 1 << shift
+
+
+def _decode_ac_first(runs, out, ac_table, start, end, shift):
+    lookup, mask = JPEG_LOOKUP_BITS, JPEG_LOOKUP_MASK
+    ac_plain, ac = ac_table
+    for words, chunks in runs:
+        acc = nbits = position = 0
+        skip = 0
+        for blocks in chunks:
+            for _, base in blocks:
+                if skip:
+                    skip -= 1
+                    continue
+                k = start
+                while k <= end:
+                    if nbits < 32:
+                        acc = (acc << 32 | words[position]) & _WORD_MASK
+                        position += 1
+                        nbits += 32
+                    bits, run, value = ac[acc >> (nbits - lookup) & mask]
+                    if bits:
+                        nbits -= bits
+                    else:
+                        nbits, run, value = _slow_symbol(ac_plain, acc, nbits)
+                    if value:
+                        k += run
+                        out[base + k] = value << shift
+                        k += 1
+                    elif run == 15:
+                        k += 16
+                    else:
+                        # End of band for this block and the next skip blocks
+                        skip = (1 << run) - 1
+                        if run:
+                            nbits -= run
+                            skip += acc >> nbits & ((1 << run) - 1)
+                        break
+
+
+def _band_history(out, blocks, start, end):
+    """(first block, per-block lists of the band positions start..end that are non-zero) for a chunk of blocks
+
+    Every list ends with 64, past any band position, so it needs no bounds checks.
+    """
+    first, last = blocks[0][1] >> 6, (blocks[-1][1] >> 6) + 1
+    band = np.frombuffer(out, dtype=np.int16).reshape(-1, 64)[first:last, start:end + 1]
+    rows, columns = np.nonzero(band)
+    bounds = np.searchsorted(rows, np.arange(last - first + 1)).tolist()
+    positions = (columns + start).tolist()
+    return first, [positions[bounds[n]:bounds[n + 1]] + [64] for n in range(last - first)]
+
+
+def _decode_ac_refine(runs, out, ac_table, start, end, shift):
+    # Coefficients of a block only change while the block is decoded, so
+    # the non-zero history of each chunk is found with numpy beforehand
+    # and only those positions are visited for correction bits
+    lookup, mask = JPEG_LOOKUP_BITS, JPEG_LOOKUP_MASK
+    ac_plain, ac = ac_table
+    positive, negative = 1 << shift, -1 << shift
+    for words, chunks in runs:
+        acc = nbits = position = 0
+        skip = 0
+        for blocks in chunks:
+            blocks = list(blocks)
+            first, history = _band_history(out, blocks, start, end)
+            for _, base in blocks:
+                nonzero = history[(base >> 6) - first]
+                j = 0
+                k = start
+                while not skip and k <= end:
+                    if nbits < 32:
+                        acc = (acc << 32 | words[position]) & _WORD_MASK
+                        position += 1
+                        nbits += 32
+                    bits, run, value = ac[acc >> (nbits - lookup) & mask]
+                    if bits:
+                        nbits -= bits
+                    else:
+                        nbits, run, value = _slow_symbol(ac_plain, acc, nbits)
+                    if value:
+                        value = positive if value > 0 else negative
+                    elif run != 15:
+                        skip = 1 << run
+                        if run:
+                            nbits -= run
+                            skip += acc >> nbits & ((1 << run) - 1)
+                        break
+
+                    # Correction bits for coefficients already non-zero,
+                    # up to the run-th zero which takes the new value
+                    while k <= end:
+                        if nonzero[j] == k:
+                            if nbits < 32:
+                                acc = (acc << 32 | words[position]) & _WORD_MASK
+                                position += 1
+                                nbits += 32
+                            nbits -= 1
+                            if acc >> nbits & 1:
+                                coefficient = out[base + k]
+                                if not coefficient & positive:
+                                    out[base + k] = coefficient + (positive if coefficient >= 0 else negative)
+                            j += 1
+                        elif run:
+                            run -= 1
+                        else:
+                            break
+                        k += 1
+                    if value and k <= end:
+                        out[base + k] = value
+                    k += 1
+
+                if skip:
+                    # Inside an end-of-band run only correction bits follow
+                    for k in nonzero[j:-1]:
+                        if nbits < 32:
+                            acc = (acc << 32 | words[position]) & _WORD_MASK
+                            position += 1
+                            nbits += 32
+                        nbits -= 1
+                        if acc >> nbits & 1:
+                            coefficient = out[base + k]
+                            if not coefficient & positive:
+                                out[base + k] = coefficient + (positive if coefficient >= 0 else negative)
+                    skip -= 1
+
+
+def _jpeg_frame(marker, segment):
+    precision, height, width, count = struct.unpack('>BHHB', segment[:6])
+    if not height or not width or len(segment) < 6 + 3 * count:
+        raise ValueError("Invalid or DNL-sized frame header")
+    components = [{'id': segment[6 + 3 * n], 'h': segment[7 + 3 * n] >> 4, 'v': segment[7 + 3 * n] & 15,
+                   'table': segment[8 + 3 * n], 'quantization': None} for n in range(count)]
+    h_max = max(component['h'] for component in components)
+    v_max = max(component['v'] for component in components)
+    if not all(1 <= component['h'] <= 4 and 1 <= component['v'] <= 4 for component in components):
+        raise ValueError("Invalid sampling factors")
+    frame = {'process': JPEG_PROCESSES[marker], 'precision': precision, 'width': width, 'height': height,
+             'components': components,
+             'mcu_cols': -(-width // (8 * h_max)), 'mcu_rows': -(-height // (8 * v_max))}
+    for component in components:
+        component['bw'] = -(-(-(-width * component['h'] // h_max)) // 8)
+        component['bh'] = -(-(-(-height * component['v'] // v_max)) // 8)
+        component['pbw'] = frame['mcu_cols'] * component['h']
+        component['pbh'] = frame['mcu_rows'] * component['v']
+        component['buffer'] = array.array('h', bytes(128 * component['pbw'] * component['pbh']))
+    return frame
+
+
+def _read_quantization(segment, tables):
+    position = 0
+    while position < len(segment):
+        precision, table = segment[position] >> 4, segment[position] & 15
+        size = 128 if precision else 64
+        values = np.frombuffer(segment[position + 1:position + 1 + size], dtype='>u2' if precision else np.uint8)
+        if len(values) < 64:
+            raise ValueError("Truncated quantization table")
+        natural = np.zeros(64, dtype=np.uint16)
+        natural[JPEG_ZIGZAG] = values
+        tables[table] = natural.reshape(8, 8)
+        position += 1 + size
+
+
+def _read_huffman(segment, tables):
+    position = 0
+    while position + 17 <= len(segment):
+        kind = segment[position]
+        count = sum(segment[position + 1:position + 17])
+        tables[kind >> 4, kind & 15] = _huffman_lookup(bytes(segment[position + 1:position + 17 + count]))
+        position += 17 + count
+
+
+def _decode_jpeg_scan(frame, header, data, quantization, huffman, restart_interval, progress=None):
+    """Entropy-decode one scan into the frame's coefficient buffers; returns a warning or None"""
+    count = header[0]
+    by_id = {component['id']: component for component in frame['components']}
+    components, dc_tables, ac_tables = [], [], []
+    for n in range(count):
+        component = by_id.get(header[1 + 2 * n])
+        if component is None:
+            raise ValueError(f"Scan refers to unknown component {header[1 + 2 * n]}")
+        if component['quantization'] is None:
+            component['quantization'] = quantization.get(component['table'])
+        components.append(component)
+        dc_tables.append(huffman.get((0, header[2 + 2 * n] >> 4)))
+        ac_tables.append(huffman.get((1, header[2 + 2 * n] & 15)))
+    start, end, approximation = header[1 + 2 * count:4 + 2 * count]
+    high, low = approximation >> 4, approximation & 15
+
+    progressive = frame['process'] == 'progressive'
+    needs_dc = not progressive or (start == 0 and not high)
+    needs_ac = not progressive or start > 0
+    if (needs_dc and None in dc_tables) or (needs_ac and None in ac_tables):
+        raise ValueError("Scan uses an undefined Huffman table")
+    if progressive and start > 0 and (count != 1 or start > end or end > 63):
+        raise ValueError("Invalid progressive AC scan")
+
+    indices, offsets, per_mcu = _scan_blocks(frame, components)
+    segments = _scan_segments(data)
+    per_segment = restart_interval * per_mcu if restart_interval else len(offsets)
+    runs = _scan_runs(segments, indices, offsets, per_segment, progress)
+    buffers = [component['buffer'] for component in components]
+    try:
+        if not progressive:
+            _decode_sequential(runs, buffers, dc_tables, ac_tables)
+        elif start == 0 and not high:
+            _decode_dc_first(runs, buffers, dc_tables, low)
+        elif start == 0:
+            _decode_dc_refine(runs, buffers, low)
+        elif not high:
+            _decode_ac_first(runs, buffers[0], ac_tables[0], start, end, low)
+        else:
+            _decode_ac_refine(runs, buffers[0], ac_tables[0], start, end, low)
+    except IndexError:
+        return "Entropy-coded data ended early or is corrupt"
+    if len(segments) * per_segment < len(offsets):
+        return f"{len(offsets) - len(segments) * per_segment} blocks without restart interval"
+    return None
+
+
+def _jpeg_component_names(ids):
+    if bytes(ids) == b'RGB':
+        return ['R', 'G', 'B']
+    return {1: ['Y'], 3: ['Y', 'Cb', 'Cr'], 4: ['C', 'M', 'Y', 'K']}.get(len(ids), [f"C{i}" for i in ids])
+
+
+def read_jpeg_coefficients(source, progress=None):
+    """Quantized DCT coefficients of a JPEG file or bytes, entropy-decoded without inverse DCT
+
+    Baseline, extended and progressive Huffman-coded frames are
+    supported; arithmetic, lossless and hierarchical coding raise
+    ValueError. Restart intervals and truncated scans are handled, the
+    latter with a warning. Returns a dict with width, height, precision,
+    process, scans, warnings and components, each with its name,
+    sampling factors, (8, 8) quantization table in natural order and
+    coefficients as an int16 array of (block rows, block columns, 8, 8).
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+    else:
+        with open(source, 'rb') as f:
+            data = f.read()
+    if data[:2] != b'\xff\xd8':
+        raise ValueError("Not a JPEG file")
+
+    quantization, huffman = {}, {}
+    frame = None
+    restart_interval = 0
+    scans = 0
+    warnings = []
+    position = 2
+    while position < len(data) - 1:
+        if data[position] != 0xFF:
+            following = data.find(b'\xff', position)
+            warnings.append(f"Skipped {(following if following >= 0 else len(data)) - position} "
+                            f"stray bytes at offset {position}")
+            if following < 0:
+                break
+            position = following
+            continue
+        marker = data[position + 1]
+        position += 2
+        if marker == 0xFF:
+            position -= 1
+            continue
+        if marker == 0xD9:
+            break
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            continue
+
+        length = int.from_bytes(data[position:position + 2], 'big')
+        segment = data[position + 2:position + length]
+        position += length
+        if marker == 0xDB:
+            _read_quantization(segment, quantization)
+        elif marker == 0xC4:
+            _read_huffman(segment, huffman)
+        elif marker == 0xDD:
+            restart_interval = int.from_bytes(segment[:2], 'big')
+        elif 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if marker not in JPEG_PROCESSES:
+                raise ValueError(f"Unsupported JPEG coding ({JPEG_MARKERS[marker]})")
+            if frame is not None:
+                raise ValueError("More than one frame")
+            frame = _jpeg_frame(marker, segment)
+        elif marker == 0xDA:
+            if frame is None:
+                raise ValueError("Scan before the frame header")
+            end = _entropy_end(data, position)
+            scan_progress = None
+            if progress:
+                scan_progress = lambda done, start=position, size=end - position: progress(
+                    min(1.0, (start + done * size) / len(data)))
+            warning = _decode_jpeg_scan(frame, segment, data[position:end], quantization, huffman,
+                                        restart_interval, scan_progress)
+            scans += 1
+            if warning:
+                warnings.append(f"Scan {scans}: {warning}")
+            position = end
+    if frame is None:
+        raise ValueError("No frame header")
+
+    components = []
+    names = _jpeg_component_names([component['id'] for component in frame['components']])
+    for name, component in zip(names, frame['components']):
+        blocks = np.frombuffer(component['buffer'], dtype=np.int16).reshape(component['pbh'], component['pbw'], 64)
+        coefficients = blocks[:component['bh'], :component['bw']][..., _JPEG_NATURAL]
+        table = component['quantization']
+        components.append({
+            'name': name,
+            'id': component['id'],
+            'sampling': (component['h'], component['v']),
+            'quantization': quantization.get(component['table']) if table is None else table,
+            'coefficients': coefficients.reshape(component['bh'], component['bw'], 8, 8),
+        })
+    if progress:
+        progress(1.0)
+    return {'width': frame['width'], 'height': frame['height'], 'precision': frame['precision'],
+            'process': frame['process'], 'scans': scans, 'warnings': warnings, 'components': components}
+
+
+def dct_pixels(coefficients, quantization):
+    """Samples (float, 0-255 range) of one component from its quantized coefficients by a separable inverse DCT"""
+    blocks = coefficients.astype(np.float32) * quantization.astype(np.float32)
+    pixels = DCT_BASIS.T @ blocks @ DCT_BASIS + 128
+    rows, columns = coefficients.shape[:2]
+    return pixels.transpose(0, 2, 1, 3).reshape(rows * 8, columns * 8)
+
+
+# Coefficient values counted in histograms; larger magnitudes pile up at the ends
+DCT_HISTOGRAM_RANGE = 1024
+
+# Equal slices of the coefficients for the sequential JSteg chi-square
+JSTEG_SEGMENTS = 100
+
+# Low-frequency luminance modes (1, 2), (2, 1) and (2, 2) of the F5 estimate
+F5_MODES = (1, 8, 9)
+
+# Layouts of the coefficient bit plane view
+DCT_LAYOUTS = ('blocks', 'frequency')
+
+
+def dct_histogram(coefficients, frequencies=None, limit=DCT_HISTOGRAM_RANGE):
+    """Counts of the values -limit..limit of the AC coefficients (or the given natural-order frequencies)"""
+    flat = coefficients.reshape(-1, 64)[:, slice(1, None) if frequencies is None else list(frequencies)]
+    return np.bincount(np.clip(flat, -limit, limit).ravel() + limit, minlength=2 * limit + 1)
+
+
+def jsteg_chi_square(components, segments=JSTEG_SEGMENTS, limit=DCT_HISTOGRAM_RANGE):
+    """Chi-square attack on sequential LSB replacement of AC coefficients (JSteg)
+
+    JSteg overwrites the LSB of every AC coefficient except 0 and 1, in
+    order, which equalizes the counts of the value pairs (2i, 2i + 1).
+    The coefficients of all components are cut into segments equal
+    slices with one bincount each; cumulative sums give the embedding
+    probability over a growing prefix ('curve'), the slices alone a
+    probability per window, where randomly spread embedding such as
+    OutGuess 0.1 shows up. The payload estimate is the longest prefix
+    with a probability of at least 0.5.
+    """
+    values = np.concatenate([component['coefficients'].reshape(-1, 64)[:, 1:].ravel() for component in components])
+    values = np.clip(values, -limit, limit - 1) + limit
+    values = values[(values != limit) & (values != limit + 1)]
+    bounds = np.linspace(0, len(values), segments + 1).astype(np.intp)
+    counts = np.stack([np.bincount(values[bounds[n]:bounds[n + 1]], minlength=2 * limit)
+                       for n in range(segments)]).reshape(segments, limit, 2)
+
+    curve = chi_square_probability(np.cumsum(counts, axis=0))
+    windows = chi_square_probability(counts)
+    embedded = np.flatnonzero(curve >= 0.5)
+    fraction = 0.0 if not len(embedded) else (embedded[-1] + 1) / segments
+    return {'probability': float(curve[-1]), 'curve': curve.tolist(), 'windows': windows.tolist(),
+            'usable': len(values), 'payload_bytes': int(fraction * len(values) / 8)}
+
+
+def _magnitude_counts(coefficients, mode):
+    return np.bincount(np.minimum(np.abs(coefficients.reshape(-1, 64)[:, mode]), 3), minlength=4)[:3].astype(float)
+
+
+def calibrate_jpeg(component, width, height):
+    """Coefficients of one component decoded, cropped by 4 pixels and quantized again with its table
+
+    The crop moves the 8x8 grid, so the result approximates the
+    statistics of the cover image before any embedding. Recompression
+    is a forward DCT of the cropped samples, without an encoder round trip.
+    """
+    pixels = np.clip(np.round(dct_pixels(component['coefficients'], component['quantization'])), 0, 255)
+    pixels = pixels[4:height, 4:width]
+    rows, columns = pixels.shape[0] // 8, pixels.shape[1] // 8
+    blocks = pixels[:rows * 8, :columns * 8].reshape(rows, 8, columns, 8).transpose(0, 2, 1, 3) - 128
+    return np.round(DCT_BASIS @ blocks @ DCT_BASIS.T / component['quantization']).astype(np.int16)
+
+
+def f5_estimate(coefficients, calibrated):
+    """Fridrich-Goljan-Hogea estimate of the share of non-zero AC coefficients changed by F5
+
+    F5 shrinks |coefficients| towards zero, so h(0) = c(0) + b c(1) and
+    h(1) = (1 - b) c(1) + b c(2), with c the histogram of the calibrated
+    image; b is their least-squares solution, averaged over the modes.
+    """
+    scale = coefficients[..., 0, 0].size / max(1, calibrated[..., 0, 0].size)
+    betas = []
+    for mode in F5_MODES:
+        h = _magnitude_counts(coefficients, mode)
+        c = _magnitude_counts(calibrated, mode) * scale
+        denominator = c[1] ** 2 + (c[2] - c[1]) ** 2
+        betas.append(float((c[1] * (h[0] - c[0]) + (h[1] - c[1]) * (c[2] - c[1])) / denominator)
+                     if denominator else 0.0)
+    beta = min(1.0, max(0.0, sum(betas) / len(betas)))
+    nonzero = int(np.count_nonzero(coefficients.reshape(-1, 64)[:, 1:]))
+    return {'beta': beta, 'modes': betas, 'nonzero': nonzero, 'changes': int(beta * nonzero)}
+
+
+def jpeg_analysis(jpeg, calibrate=True):
+    """JSON-ready summary and JSteg/F5 statistics of decoded JPEG coefficients"""
+    components = jpeg['components']
+    result = {
+        'process': jpeg['process'],
+        'width': jpeg['width'],
+        'height': jpeg['height'],
+        'scans': jpeg['scans'],
+        'warnings': jpeg['warnings'],
+        'components': [{'name': component['name'], 'sampling': list(component['sampling']),
+                        'blocks': int(component['coefficients'][..., 0, 0].size),
+                        'nonzero_ac': int(np.count_nonzero(component['coefficients'].reshape(-1, 64)[:, 1:]))}
+                       for component in components],
+        'jsteg': jsteg_chi_square(components),
+    }
+    luminance = components[0]
+    if calibrate and luminance['quantization'] is not None and jpeg['precision'] == 8:
+        full = luminance['sampling'] == tuple(max(c['sampling'][n] for c in components) for n in (0, 1))
+        rows, columns = luminance['coefficients'].shape[:2]
+        width, height = (jpeg['width'], jpeg['height']) if full else (columns * 8, rows * 8)
+        result['f5'] = f5_estimate(luminance['coefficients'], calibrate_jpeg(luminance, width, height))
+    return result
+
+
+def format_jpeg_analysis(result):
+    """Render a JPEG coefficient report as text"""
+    text = f"{result['process'].capitalize()} JPEG, {result['width']}x{result['height']}, {result['scans']} scans\n"
+    for component in result['components']:
+        h, v = component['sampling']
+        text += (f"  {component['name']}: {h}x{v} sampling, {component['blocks']} blocks, "
+                 f"{component['nonzero_ac']} non-zero AC coefficients\n")
+    for warning in result['warnings']:
+        text += f"  Warning: {warning}\n"
+    jsteg = result['jsteg']
+    text += f"\nJSteg chi-square embedding probability: {jsteg['probability']:.3f}\n"
+    text += f"  Highest window probability: {max(jsteg['windows']):.3f}\n"
+    text += f"  Estimated payload: {jsteg['payload_bytes']} bytes of {jsteg['usable'] // 8} usable\n"
+    if 'f5' in result:
+        f5 = result['f5']
+        text += f"\nF5 estimated change rate: {f5['beta'] * 100:.1f}% "
+        text += f"({', '.join(f'{beta:.3f}' for beta in f5['modes'])} per mode)\n"
+        text += f"  Estimated changed coefficients: {f5['changes']} of {f5['nonzero']}\n"
+    return text
+
+
+def dct_plane(coefficients, bit=0, layout='blocks', zero=64):
+    """One bit of every quantized coefficient of a component as a 0/255 image, zeros shown as grey
+
+    Negative values use their two's complement bits, as LSB embedding
+    sees them. 'blocks' puts every coefficient at its place in the 8x8
+    block; 'frequency' gathers each frequency into one tile of an 8x8
+    grid, DC at the top left, so embedding in some frequencies only
+    stands out.
+    """
+    if layout not in DCT_LAYOUTS:
+        raise ValueError(f"Unknown coefficient layout: {layout}")
+    plane = ((coefficients >> bit) & 1).astype(np.uint8) * 255
+    if zero is not None:
+        plane[coefficients == 0] = zero
+    rows, columns = coefficients.shape[:2]
+    axes = (0, 2, 1, 3) if layout == 'blocks' else (2, 0, 3, 1)
+    return np.ascontiguousarray(plane.transpose(axes)).reshape(rows * 8, columns * 8)
+
+
+def iter_image_files(paths, extensions=IMAGE_EXTENSIONS):
+    """Yield every image file found under the given files and directories"""
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith(extensions):
+                    yield os.path.join(dirpath, filename)
+
+
+def analyze_file(filepath, min_length=4, max_strings=50):
+    """Run every headless analysis on one file and return a JSON-ready dict"""
+    result = {'path': filepath}
+    result['structure'] = analyze_file_structure(filepath)
+
+    image, image_array = load_image(filepath)
+    result['width'], result['height'] = image.size
+    result['mode'] = image.mode
+    result['frames'] = getattr(image, 'n_frames', 1)
+    result['statistics'] = channel_statistics(image_array)
+    result['bit_plane_ratios'] = bit_plane_ratios(image_array)
+    lsb = lsb_analysis(image_array)
+    result['lsb'] = {name: {key: channel[key] for key in ('chi_square', 'rs', 'spa', 'payload_bytes')}
+                     for name, channel in lsb['channels'].items()}
+
+    if result['frames'] > 1:
+        stack = FrameStack(filepath)
+        try:
+            result['frame_stack'] = frame_analysis(stack)
+        finally:
+            stack.close()
+
+    if image.format == 'JPEG':
+        try:
+            result['jpeg'] = jpeg_analysis(read_jpeg_coefficients(filepath))
+        except ValueError as e:
+            result['jpeg'] = {'error': str(e)}
+
+    result['carved'] = carve_file(filepath)
+
+    strings = StringIndex(filepath, min_length)
+    result['strings_count'] = len(strings)
+    result['strings'] = [text for _, _, text in strings.get_range(0, max_strings)]
+
+    return result
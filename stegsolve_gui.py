@@ -4,14 +4,415 @@ StegSolve-like GUI Tool for Steganography Analysis
 A Python implementation with 10+ steganography analysis functions
 """
 
+import time
+
+# Measured from the first line run, for the startup time in the status bar
+STARTED = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from PIL import Image, ImageTk, ImageOps
-import numpy as np
+import tkinter.font as tkfont
+import importlib
 import os
+import sys
 import io
+import math
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from stegsolve_profile import Profiler, format_breakdown
+
+
+class LazyModule:
+    """Stand-in for a heavy module, imported on first attribute access
+
+    Keeps numpy, Pillow and the analysis engine off the startup path:
+    the window is up before any of them is loaded.
+    """
+    
+    _lock = threading.Lock()
+    
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+    
+    def __getattr__(self, attr):
+        if self._module is None:
+            with LazyModule._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+np = LazyModule('numpy')
+Image = LazyModule('PIL.Image')
+ImageTk = LazyModule('PIL.ImageTk')
+ImageOps = LazyModule('PIL.ImageOps')
+core = LazyModule('stegsolve_core')
+
+
+class VirtualListView:
+    """Scrollable list that only holds the rows currently visible
+
+    Rows are fetched through get_rows(start, stop) whenever the view
+    moves, so millions of rows can be browsed without loading them.
+    """
+    
+    def __init__(self, parent, get_rows, row_count=0):
+        self.get_rows = get_rows
+        self.row_count = row_count
+        self.first = 0
+        self.selected = None
+        
+        frame = ttk.Frame(parent)
+        frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        
+        font = tkfont.Font(family='Courier', size=10)
+        self.line_height = font.metrics('linespace') + 1
+        self.listbox = tk.Listbox(frame, font=font, activestyle='none', exportselection=False)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        self.scrollbar = ttk.Scrollbar(frame, command=self.on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        self.listbox.bind('<Configure>', lambda e: self.refresh())
+        self.listbox.bind('<MouseWheel>', lambda e: self.scroll_to(self.first - e.delta // 40))
+        self.listbox.bind('<Button-4>', lambda e: self.scroll_to(self.first - 3))
+        self.listbox.bind('<Button-5>', lambda e: self.scroll_to(self.first + 3))
+        self.listbox.bind('<Prior>', lambda e: self.scroll_to(self.first - self.visible_rows()))
+        self.listbox.bind('<Next>', lambda e: self.scroll_to(self.first + self.visible_rows()))
+    
+    def visible_rows(self):
+        return max(1, self.listbox.winfo_height() // self.line_height)
+    
+    def set_row_count(self, row_count):
+        self.row_count = row_count
+        self.first = 0
+        self.selected = None
+        self.refresh()
+    
+    def on_scroll(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.scroll_to(int(float(amount) * self.row_count))
+        elif unit == 'pages':
+            self.scroll_to(self.first + int(amount) * self.visible_rows())
+        else:
+            self.scroll_to(self.first + int(amount))
+    
+    def scroll_to(self, first):
+        self.first = max(0, min(first, self.row_count - self.visible_rows()))
+        self.refresh()
+    
+    def see(self, index):
+        # Bring a row into view and highlight it
+        self.selected = index
+        if not self.first <= index < self.first + self.visible_rows():
+            self.first = index
+        self.scroll_to(self.first)
+    
+    def refresh(self):
+        count = self.visible_rows()
+        self.listbox.delete(0, tk.END)
+        for row in self.get_rows(self.first, min(self.first + count, self.row_count)):
+            self.listbox.insert(tk.END, row)
+        
+        if self.selected is not None and self.first <= self.selected < self.first + count:
+            self.listbox.selection_set(self.selected - self.first)
+        
+        if self.row_count:
+            self.scrollbar.set(self.first / self.row_count, min(1.0, (self.first + count) / self.row_count))
+        else:
+            self.scrollbar.set(0, 1)
+
+
+class ImageViewport:
+    """Zoomable, pannable canvas view drawn from cached tiles
+
+    The displayed image is wrapped in a core.ImagePyramid. Only the tiles
+    visible at the current zoom are rendered and uploaded; they stay in
+    an LRU cache, so panning and resizing reuse them and only newly
+    exposed tiles cost anything.
+    """
+    
+    TILE_SIZE = 256
+    MAX_TILES = 192
+    MIN_ZOOM = 1 / 256
+    MAX_ZOOM = 64
+    
+    def __init__(self, canvas, on_zoom=None, profiler=None):
+        self.canvas = canvas
+        self.on_zoom = on_zoom
+        self.profiler = profiler or Profiler()
+        self.pyramid = None
+        self.zoom = 1.0
+        self.fit = True
+        self.view_x = 0
+        self.view_y = 0
+        self.drag_start = None
+        self.tiles = OrderedDict()  # (zoom, tx, ty) -> PhotoImage, LRU order
+        self.items = {}  # (zoom, tx, ty) -> canvas item currently shown
+        
+        self.canvas.bind('<Configure>', lambda e: self.on_resize())
+        self.canvas.bind('<ButtonPress-1>', self.on_press)
+        self.canvas.bind('<B1-Motion>', self.on_drag)
+        self.canvas.bind('<MouseWheel>', lambda e: self.step_zoom(1 if e.delta > 0 else -1, (e.x, e.y)))
+        self.canvas.bind('<Button-4>', lambda e: self.step_zoom(1, (e.x, e.y)))
+        self.canvas.bind('<Button-5>', lambda e: self.step_zoom(-1, (e.x, e.y)))
+    
+    def canvas_size(self):
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        
+        if width <= 1 or height <= 1:
+            width = 600
+            height = 400
+        
+        return width, height
+    
+    def show(self, image, binary=False):
+        self.show_pyramid(core.ImagePyramid(image, binary))
+    
+    def show_pyramid(self, pyramid):
+        self.pyramid = pyramid
+        self.tiles.clear()
+        self.fit_to_canvas()
+    
+    def fit_to_canvas(self):
+        if self.pyramid is None:
+            return
+        
+        # Shrink large images to fit, never enlarge small ones
+        self.set_zoom(self.pyramid.fit_zoom(*self.canvas_size()))
+        self.fit = True
+    
+    def step_zoom(self, direction, anchor=None):
+        if self.pyramid is None:
+            return
+        
+        # Snap to powers of two so magnified pixels stay square and even
+        exponent = math.log2(self.zoom)
+        exponent = math.floor(exponent + 1e-9) + 1 if direction > 0 else math.ceil(exponent - 1e-9) - 1
+        self.set_zoom(2.0 ** exponent, anchor)
+    
+    def set_zoom(self, zoom, anchor=None):
+        if self.pyramid is None:
+            return
+        
+        zoom = max(self.MIN_ZOOM, min(self.MAX_ZOOM, zoom))
+        canvas_width, canvas_height = self.canvas_size()
+        if anchor is None:
+            anchor = (canvas_width / 2, canvas_height / 2)
+        
+        # Keep the image point under the anchor in place
+        image_x = (anchor[0] + self.view_x) / self.zoom
+        image_y = (anchor[1] + self.view_y) / self.zoom
+        self.zoom = zoom
+        self.fit = False
+        self.view_x = image_x * zoom - anchor[0]
+        self.view_y = image_y * zoom - anchor[1]
+        
+        self.clear_items()
+        self.redraw()
+        if self.on_zoom:
+            self.on_zoom(self.zoom)
+    
+    def clamp_view(self):
+        canvas_width, canvas_height = self.canvas_size()
+        img_width, img_height = self.pyramid.size
+        
+        def clamp(view, content, size):
+            if content <= size:
+                return (content - size) // 2  # Center images smaller than the canvas
+            return max(0, min(int(round(view)), content - size))
+        
+        self.view_x = clamp(self.view_x, int(img_width * self.zoom), canvas_width)
+        self.view_y = clamp(self.view_y, int(img_height * self.zoom), canvas_height)
+    
+    def clear_items(self):
+        self.canvas.delete('all')
+        self.items = {}
+    
+    def tile(self, key):
+        if key in self.tiles:
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+        
+        zoom, tx, ty = key
+        with self.profiler.span('resize tile'):
+            image = self.pyramid.render_tile(zoom, tx, ty, self.TILE_SIZE)
+        with self.profiler.span('upload tile') as stage:
+            photo = ImageTk.PhotoImage(image) if image is not None else None
+            stage['bytes'] = core.result_size(image)
+        self.tiles[key] = photo
+        
+        while len(self.tiles) > self.MAX_TILES:
+            old_key, _ = self.tiles.popitem(last=False)
+            if old_key in self.items:
+                self.canvas.delete(self.items.pop(old_key))
+        
+        return photo
+    
+    def redraw(self):
+        if self.pyramid is None:
+            return
+        
+        self.clamp_view()
+        canvas_width, canvas_height = self.canvas_size()
+        size = self.TILE_SIZE
+        
+        # Tiles overlapping the visible part of the scaled image
+        first_x, first_y = max(0, self.view_x) // size, max(0, self.view_y) // size
+        last_x = (self.view_x + canvas_width - 1) // size
+        last_y = (self.view_y + canvas_height - 1) // size
+        visible = {(self.zoom, tx, ty)
+                   for tx in range(first_x, last_x + 1)
+                   for ty in range(first_y, last_y + 1)}
+        
+        for key in list(self.items):
+            if key not in visible:
+                self.canvas.delete(self.items.pop(key))
+        
+        for key in sorted(visible - set(self.items)):
+            photo = self.tile(key)
+            if photo is None:
+                continue
+            _, tx, ty = key
+            self.items[key] = self.canvas.create_image(
+                tx * size - self.view_x, ty * size - self.view_y, image=photo, anchor=tk.NW)
+    
+    def on_resize(self):
+        if self.fit:
+            self.fit_to_canvas()
+        else:
+            self.redraw()
+    
+    def on_press(self, event):
+        self.drag_start = (event.x, event.y)
+    
+    def on_drag(self, event):
+        if self.pyramid is None or self.drag_start is None:
+            return
+        
+        # Move the tiles already on screen, then fill in exposed ones
+        old_x, old_y = self.view_x, self.view_y
+        self.view_x -= event.x - self.drag_start[0]
+        self.view_y -= event.y - self.drag_start[1]
+        self.drag_start = (event.x, event.y)
+        self.fit = False
+        self.clamp_view()
+        self.canvas.move('all', old_x - self.view_x, old_y - self.view_y)
+        self.redraw()
+
+
+class Job:
+    """One background analysis; progress() is also its cancellation point"""
+    
+    def __init__(self, name):
+        self.name = name
+        self.fraction = 0.0
+        self.cancelled = threading.Event()
+    
+    def progress(self, fraction):
+        if self.cancelled.is_set():
+            raise core.Cancelled()
+        self.fraction = fraction
+    
+    def cancel(self):
+        self.cancelled.set()
+
+
+class JobScheduler:
+    """Runs analysis jobs on worker threads and hands results to the Tk thread
+
+    Every job belongs to a slot; submitting a job cancels the one it
+    supersedes in the same slot, so stale work never reaches the screen.
+    Workers only put results on a queue, which the Tk thread drains with
+    root.after. Each job is a profiler operation: its queueing, work and
+    result delivery are timed, and on_profile(operation) follows delivery.
+    """
+    
+    POLL_MS = 50
+    
+    def __init__(self, root, on_update, workers=None, profiler=None, on_profile=None):
+        self.root = root
+        self.on_update = on_update
+        self.profiler = profiler or Profiler()
+        self.on_profile = on_profile
+        self.executor = ThreadPoolExecutor(max_workers=workers or min(4, os.cpu_count() or 1))
+        self.results = queue.Queue()
+        self.active = {}  # slot -> Job
+        self.root.after(self.POLL_MS, self.poll)
+    
+    def submit(self, slot, name, work, on_done, on_error=None):
+        self.cancel(slot)
+        job = Job(name)
+        job.operation = self.profiler.new_operation(name)
+        job.submitted = time.perf_counter()
+        self.active[slot] = job
+        self.executor.submit(self.run, slot, job, work, on_done, on_error)
+        return job
+    
+    def cancel(self, slot=None):
+        slots = list(self.active) if slot is None else [slot]
+        for name in slots:
+            job = self.active.pop(name, None)
+            if job:
+                job.cancel()
+    
+    def run(self, slot, job, work, on_done, on_error):
+        # Worker thread: never touch Tk here
+        try:
+            with self.profiler.operation(job.operation):
+                self.profiler.add('queued', job.submitted, time.perf_counter())
+                with self.profiler.span('work') as stage:
+                    result = work(job.progress)
+                    stage['bytes'] = core.result_size(result)
+        except core.Cancelled:
+            callback = None
+        except Exception as e:
+            callback = (lambda error=e: on_error(error)) if on_error else None
+        else:
+            callback = lambda: on_done(result)
+        self.results.put((slot, job, callback))
+    
+    def poll(self):
+        try:
+            while True:
+                try:
+                    slot, job, callback = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                
+                if self.active.get(slot) is job:
+                    del self.active[slot]
+                if callback and not job.cancelled.is_set():
+                    try:
+                        with self.profiler.operation(job.operation):
+                            with self.profiler.span('deliver'):
+                                callback()
+                    except Exception:
+                        # E.g. a TclError from a dialog closed meanwhile;
+                        # report it like Tk does and keep delivering
+                        self.root.report_callback_exception(*sys.exc_info())
+                    if self.on_profile:
+                        self.on_profile(job.operation)
+            
+            self.on_update(list(self.active.values()))
+        finally:
+            # One bad callback must not stop the scheduler
+            self.root.after(self.POLL_MS, self.poll)
+
 
 class StegSolveGUI:
+    # Bytes shown in the Data Extract hex preview
+    EXTRACT_PREVIEW_BYTES = 4096
+    
+    # Largest side of a frame browser preview and frames decoded ahead of the slider
+    FRAME_PREVIEW_SIZE = 480
+    FRAME_PREFETCH = 8
+    
     def __init__(self, root):
         self.root = root
         self.root.title("StegSolve GUI - Python Steganography Analysis Tool")
@@ -22,6 +423,14 @@ class StegSolveGUI:
         self.image_path = None
         self.image_array = None
         self.bit_planes = None
+        self.displayed_image = None
+        
+        # Timeline of every operation in this session
+        self.profiler = Profiler()
+        
+        # Rendered views of the loaded image, keyed by content and operation
+        self.image_key = None
+        self.result_cache = None
         
         # Create GUI layout
         self.setup_ui()
@@ -39,6 +448,7 @@ class StegSolveGUI:
         menubar.add_cascade(label="File", menu=file_menu)
         file_menu.add_command(label="Open Image", command=self.open_image, accelerator="Ctrl+O")
         file_menu.add_command(label="Save Image", command=self.save_image, accelerator="Ctrl+S")
+        file_menu.add_command(label="Export Profile Trace...", command=self.export_profile)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.root.quit)
         
@@ -46,7 +456,11 @@ class StegSolveGUI:
         tools_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Tools", menu=tools_menu)
         tools_menu.add_command(label="Extract Strings", command=self.extract_strings)
+        tools_menu.add_command(label="Data Extract", command=self.data_extract)
+        tools_menu.add_command(label="Auto Solve", command=self.auto_solve)
         tools_menu.add_command(label="Analyze File Structure", command=self.analyze_file_structure)
+        tools_menu.add_command(label="JPEG Coefficients", command=self.jpeg_coefficients)
+        tools_menu.add_command(label="Frame Stack Analysis", command=self.frame_stack_analysis)
         
         # Help menu
         help_menu = tk.Menu(menubar, tearoff=0)
@@ -64,6 +478,19 @@ class StegSolveGUI:
         # Image display canvas
         self.image_canvas = tk.Canvas(left_frame, bg='gray20')
         self.image_canvas.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.viewport = ImageViewport(self.image_canvas, on_zoom=self.update_zoom_label, profiler=self.profiler)
+        
+        # Zoom controls
+        zoom_frame = ttk.Frame(left_frame)
+        zoom_frame.pack(pady=(0, 5))
+        
+        ttk.Button(zoom_frame, text="-", width=3, command=lambda: self.viewport.step_zoom(-1)).pack(side=tk.LEFT)
+        ttk.Button(zoom_frame, text="+", width=3, command=lambda: self.viewport.step_zoom(1)).pack(side=tk.LEFT)
+        ttk.Button(zoom_frame, text="Fit", width=5, command=self.viewport.fit_to_canvas).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Button(zoom_frame, text="1:1", width=5, command=lambda: self.viewport.set_zoom(1.0)).pack(side=tk.LEFT)
+        
+        self.zoom_label = ttk.Label(zoom_frame, text="100%", width=8, anchor=tk.E)
+        self.zoom_label.pack(side=tk.LEFT, padx=5)
         
         # Image info label
         self.image_info_label = ttk.Label(left_frame, text="No image loaded")
@@ -73,40 +500,68 @@ class StegSolveGUI:
         right_frame = ttk.Frame(main_frame, width=400)
         right_frame.pack(side=tk.RIGHT, fill=tk.BOTH, padx=(10, 0))
         
-        # Tool selection notebook
+        # Settings read by handlers on several tabs exist before the tabs do
+        self.bit_var = tk.StringVar(value="0")
+        self.channel_var = tk.StringVar(value="All")
+        self.component_var = tk.StringVar(value="HSV H")
+        self.expression_var = tk.StringVar(value="R bit0 XOR G bit0")
+        self.random_colours_var = tk.BooleanVar(value=False)
+        self.colour_map = None
+        
+        # Tool selection notebook; each tab is built the first time it is shown
         self.notebook = ttk.Notebook(right_frame)
         self.notebook.pack(fill=tk.BOTH, expand=True)
+        self.tab_builders = {}
         
-        # Tab 1: Basic Operations
-        basic_tab = ttk.Frame(self.notebook)
-        self.notebook.add(basic_tab, text="Basic")
-        self.setup_basic_tab(basic_tab)
-        
-        # Tab 2: Bit Plane Analysis
-        bitplane_tab = ttk.Frame(self.notebook)
-        self.notebook.add(bitplane_tab, text="Bit Planes")
-        self.setup_bitplane_tab(bitplane_tab)
-        
-        # Tab 3: RGB Analysis
-        rgb_tab = ttk.Frame(self.notebook)
-        self.notebook.add(rgb_tab, text="RGB Channels")
-        self.setup_rgb_tab(rgb_tab)
-        
-        # Tab 4: Advanced Operations
-        advanced_tab = ttk.Frame(self.notebook)
-        self.notebook.add(advanced_tab, text="Advanced")
-        self.setup_advanced_tab(advanced_tab)
+        tabs = [
+            ("Basic", self.setup_basic_tab),
+            ("Bit Planes", self.setup_bitplane_tab),
+            ("RGB Channels", self.setup_rgb_tab),
+            ("Advanced", self.setup_advanced_tab),
+        ]
+        for text, setup in tabs:
+            tab = ttk.Frame(self.notebook)
+            self.notebook.add(tab, text=text)
+            self.tab_builders[str(tab)] = (tab, setup)
+        self.notebook.bind('<<NotebookTabChanged>>', lambda e: self.build_tab(self.notebook.select()))
         
         # Status bar
         status_frame = ttk.Frame(self.root)
         status_frame.pack(fill=tk.X, padx=10, pady=5)
         
+        # Background job progress
+        self.cancel_button = ttk.Button(status_frame, text="Cancel", width=7, state=tk.DISABLED,
+                                        command=lambda: self.jobs.cancel())
+        self.cancel_button.pack(side=tk.RIGHT, padx=(5, 0))
+        
+        self.progress_bar = ttk.Progressbar(status_frame, length=150, maximum=1.0)
+        self.progress_bar.pack(side=tk.RIGHT, padx=(5, 0))
+        
+        self.job_label = ttk.Label(status_frame, text="", anchor=tk.E)
+        self.job_label.pack(side=tk.RIGHT)
+        
+        # Stage timings of the last finished operation
+        self.profile_label = ttk.Label(status_frame, text="", anchor=tk.E, foreground="gray")
+        self.profile_label.pack(side=tk.RIGHT, padx=(0, 10))
+        
         self.status_label = ttk.Label(status_frame, text="Ready", relief=tk.SUNKEN, anchor=tk.W)
         self.status_label.pack(fill=tk.X)
         
+        self.jobs = JobScheduler(self.root, self.update_job_progress, profiler=self.profiler,
+                                 on_profile=self.show_profile)
+        
         # Bind keyboard shortcuts
         self.root.bind('<Control-o>', lambda e: self.open_image())
         self.root.bind('<Control-s>', lambda e: self.save_image())
+        self.root.bind('<Control-equal>', lambda e: self.viewport.step_zoom(1))
+        self.root.bind('<Control-minus>', lambda e: self.viewport.step_zoom(-1))
+        self.root.bind('<Control-0>', lambda e: self.viewport.fit_to_canvas())
+    
+    def build_tab(self, tab_id):
+        builder = self.tab_builders.pop(str(tab_id), None)
+        if builder:
+            tab, setup = builder
+            setup(tab)
     
     def setup_basic_tab(self, parent):
         ttk.Label(parent, text="Basic Image Operations", font=('Arial', 12, 'bold')).pack(pady=10)
@@ -121,6 +576,8 @@ class StegSolveGUI:
             ("Flip Horizontal", self.flip_horizontal),
             ("Flip Vertical", self.flip_vertical),
             ("Extract LSB", self.extract_lsb),
+            ("Data Extract", self.data_extract),
+            ("Auto Solve", self.auto_solve),
         ]
         
         for text, command in operations:
@@ -135,7 +592,6 @@ class StegSolveGUI:
         
         ttk.Label(bit_frame, text="Select Bit Plane:").pack(side=tk.LEFT)
         
-        self.bit_var = tk.StringVar(value="0")
         bit_spinbox = ttk.Spinbox(bit_frame, from_=0, to=7, textvariable=self.bit_var, width=5)
         bit_spinbox.pack(side=tk.LEFT, padx=5)
         
@@ -147,8 +603,9 @@ class StegSolveGUI:
         
         ttk.Label(channel_frame, text="Channel:").pack(side=tk.LEFT)
         
-        self.channel_var = tk.StringVar(value="All")
-        channels = ["All", "Red", "Green", "Blue", "Alpha"]
+        # Colour space components have bit planes of their own
+        channels = ["All", "Red", "Green", "Blue", "Alpha"] + [
+            name for space in core.COLOUR_SPACES for name in core.colour_channel_names(space)]
         channel_combo = ttk.Combobox(channel_frame, textvariable=self.channel_var, values=channels, state="readonly", width=10)
         channel_combo.pack(side=tk.LEFT, padx=5)
         
@@ -164,6 +621,24 @@ class StegSolveGUI:
         
         for text, command in bit_ops:
             ttk.Button(parent, text=text, command=command).pack(fill=tk.X, padx=20, pady=2)
+        
+        # Free-form plane expressions, e.g. "R bit0 XOR G bit0" or "B bits 0-2"
+        ttk.Label(parent, text="Plane Expression:", font=('Arial', 10)).pack(pady=(10, 5))
+        
+        expression_frame = ttk.Frame(parent)
+        expression_frame.pack(fill=tk.X, padx=20, pady=2)
+        
+        expression_entry = ttk.Entry(expression_frame, textvariable=self.expression_var)
+        expression_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        expression_entry.bind('<Return>', lambda e: self.apply_expression())
+        ttk.Button(expression_frame, text="Apply", command=self.apply_expression).pack(side=tk.LEFT, padx=(5, 0))
+        
+        colour_frame = ttk.Frame(parent)
+        colour_frame.pack(fill=tk.X, padx=20, pady=2)
+        
+        ttk.Checkbutton(colour_frame, text="Random colours", variable=self.random_colours_var,
+                        command=self.apply_expression).pack(side=tk.LEFT)
+        ttk.Button(colour_frame, text="New Colours", command=self.reseed_colours).pack(side=tk.RIGHT)
     
     def setup_rgb_tab(self, parent):
         ttk.Label(parent, text="RGB Channel Analysis", font=('Arial', 12, 'bold')).pack(pady=10)
@@ -186,13 +661,24 @@ class StegSolveGUI:
         ttk.Label(parent, text="Color Space Conversion:", font=('Arial', 10)).pack(pady=(15, 5))
         
         color_buttons = [
-            ("Convert to HSV", self.convert_to_hsv),
-            ("Convert to YCbCr", self.convert_to_ycbcr),
-            ("Convert to LAB", self.convert_to_lab),
+            ("Convert to HSV", lambda: self.convert_colour_space('HSV')),
+            ("Convert to YCbCr", lambda: self.convert_colour_space('YCbCr')),
+            ("Convert to LAB", lambda: self.convert_colour_space('LAB')),
+            ("Convert to XYZ", lambda: self.convert_colour_space('XYZ')),
         ]
         
         for text, command in color_buttons:
             ttk.Button(parent, text=text, command=command).pack(fill=tk.X, padx=20, pady=2)
+        
+        # Single colour space components, e.g. the hue or Cb plane
+        component_frame = ttk.Frame(parent)
+        component_frame.pack(fill=tk.X, padx=20, pady=(5, 2))
+        
+        components = [name for space in core.COLOUR_SPACES for name in core.colour_channel_names(space)]
+        ttk.Combobox(component_frame, textvariable=self.component_var, values=components,
+                     state="readonly", width=10).pack(side=tk.LEFT)
+        ttk.Button(component_frame, text="Show Component", command=self.show_component).pack(
+            side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
     
     def setup_advanced_tab(self, parent):
         ttk.Label(parent, text="Advanced Operations", font=('Arial', 12, 'bold')).pack(pady=10)
@@ -202,10 +688,13 @@ class StegSolveGUI:
             ("Extract Strings", self.extract_strings),
             ("Compare Images", self.compare_images),
             ("Frame Browser (GIF)", self.frame_browser),
+            ("Frame Stack Analysis", self.frame_stack_analysis),
             ("Data Carving", self.data_carving),
             ("Statistical Analysis", self.statistical_analysis),
             ("Noise Analysis", self.noise_analysis),
             ("LSB Replacement Detection", self.lsb_detection),
+            ("JPEG Coefficients", self.jpeg_coefficients),
+            ("Stereogram Solver", self.stereogram_solver),
         ]
         
         for text, command in advanced_ops:
@@ -222,19 +711,29 @@ class StegSolveGUI:
             )
         
         if filepath:
-            try:
+            # Work for the previous image is stale now
+            self.jobs.cancel()
+            canvas_size = self.viewport.canvas_size()
+            
+            def load(progress):
+                with self.profiler.span('decode'):
+                    image, image_array = core.load_image(filepath)
+                progress(0.4)
+                with self.profiler.span('hash'):
+                    key = core.content_key(image_array)
+                progress(0.6)
+                with self.profiler.span('pyramid'):
+                    pyramid = core.ImagePyramid(image).prepare(*canvas_size)
+                return image, image_array, key, pyramid
+            
+            def loaded(result):
                 self.image_path = filepath
-                self.current_image = Image.open(filepath)
-                
-                # Convert to RGB if necessary
-                if self.current_image.mode not in ['RGB', 'RGBA', 'L']:
-                    self.current_image = self.current_image.convert('RGB')
-                
-                # Convert to numpy array for processing
-                self.image_array = np.array(self.current_image)
+                self.current_image, self.image_array, self.image_key, pyramid = result
+                self.bit_planes = None
                 
                 # Update display
-                self.display_image(self.current_image)
+                self.displayed_image = self.current_image
+                self.viewport.show_pyramid(pyramid)
                 
                 # Update info label
                 info = f"{os.path.basename(filepath)} | {self.current_image.size[0]}x{self.current_image.size[1]} | {self.current_image.mode}"
@@ -244,453 +743,1579 @@ class StegSolveGUI:
                 
                 # Precompute bit planes
                 self.precompute_bit_planes()
+            
+            def preview(progress):
+                # A reduced JPEG decode shows something long before the full image
+                with self.profiler.span('preview'):
+                    result = core.load_preview(filepath, *canvas_size)
+                if result is None:
+                    return None
+                image, full_size = result
+                return image, full_size, core.ImagePyramid(image).prepare(*canvas_size)
+            
+            def previewed(result):
+                if result is not None:
+                    image, full_size, pyramid = result
+                    
+                    # File-based tools work right away; pixel analyses wait for the full load
+                    self.image_path = filepath
+                    self.current_image = self.image_array = self.image_key = self.bit_planes = None
+                    self.displayed_image = image
+                    self.viewport.show_pyramid(pyramid)
+                    self.image_info_label.config(
+                        text=f"{os.path.basename(filepath)} | {full_size[0]}x{full_size[1]} | "
+                             f"preview 1/{round(full_size[0] / image.width)}")
+                    self.status_label.config(text=f"Loading full resolution of {os.path.basename(filepath)}...")
                 
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to load image: {str(e)}")
+                self.jobs.submit('load', "Loading image", load, loaded,
+                                 lambda e: messagebox.showerror("Error", f"Failed to load image: {str(e)}"))
+            
+            self.status_label.config(text=f"Loading {os.path.basename(filepath)}...")
+            self.jobs.submit('load', "Loading preview", preview, previewed,
+                             lambda e: messagebox.showerror("Error", f"Failed to load image: {str(e)}"))
     
-    def display_image(self, image):
-        # Clear canvas
-        self.image_canvas.delete("all")
-        
-        # Resize image to fit canvas
-        canvas_width = self.image_canvas.winfo_width()
-        canvas_height = self.image_canvas.winfo_height()
-        
-        if canvas_width <= 1 or canvas_height <= 1:
-            canvas_width = 600
-            canvas_height = 400
-        
-        img_width, img_height = image.size
-        ratio = min(canvas_width / img_width, canvas_height / img_height)
-        new_size = (int(img_width * ratio), int(img_height * ratio))
+    def warn_no_image(self):
+        if 'load' in self.jobs.active:
+            messagebox.showinfo("Info", "The full-resolution image is still loading, please try again in a moment")
+        else:
+            messagebox.showwarning("Warning", "Please load an image first")
+    
+    def display_image(self, image, binary=False):
+        # Binary images (bit planes) are scaled with nearest neighbour
+        self.displayed_image = image
+        self.viewport.show(image, binary)
+    
+    def show_result(self, name, build, status, binary=False, key=None, source=None):
+        # Build the image and its display pyramid on a worker thread;
+        # a newer view request supersedes this one. Views with a key
+        # (operation, parameters...) are cached under the content key of
+        # the data build reads: source, which dialogs outliving a load
+        # must pass for what they captured, or else the loaded image.
+        canvas_size = self.viewport.canvas_size()
+        source = self.image_key if source is None else source
+        cache_key = None if key is None or source is None else (source, binary) + key
+        
+        def show(result):
+            self.displayed_image, pyramid = result
+            with self.profiler.span('display'):
+                self.viewport.show_pyramid(pyramid)
+            self.status_label.config(text=status)
+        
+        if self.result_cache is None:
+            self.result_cache = core.ResultCache()
+        if cache_key is not None:
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                self.jobs.cancel('view')
+                image, pyramid = cached
+                operation = self.profiler.new_operation(f"{name} (cached)")
+                with self.profiler.operation(operation):
+                    show((image, pyramid.prepare(*canvas_size)))
+                self.show_profile(operation)
+                return
         
-        if ratio < 1:
-            image = image.resize(new_size, Image.Resampling.LANCZOS)
+        def work(progress):
+            with self.profiler.span('compute'):
+                image = build(progress)
+            with self.profiler.span('pyramid'):
+                return image, core.ImagePyramid(image, binary).prepare(*canvas_size)
         
-        # Convert to PhotoImage
-        self.display_photo = ImageTk.PhotoImage(image)
+        def done(result):
+            if cache_key is not None:
+                self.result_cache.put(cache_key, result)
+            show(result)
         
-        # Display on canvas
-        self.image_canvas.create_image(
-            canvas_width // 2,
-            canvas_height // 2,
-            image=self.display_photo,
-            anchor=tk.CENTER
+        self.jobs.submit('view', name, work, done,
+                         lambda e: messagebox.showerror("Error", f"{name} failed: {str(e)}"))
+    
+    def show_profile(self, operation):
+        total, stages = self.profiler.breakdown(operation)
+        self.profile_label.config(text=format_breakdown(operation[1], total, stages))
+    
+    def export_profile(self):
+        filepath = filedialog.asksaveasfilename(
+            title="Export Profile Trace",
+            defaultextension=".json",
+            filetypes=[("Chrome trace (JSON)", "*.json"), ("All files", "*.*")]
         )
+        if filepath:
+            try:
+                self.profiler.save(filepath)
+                self.status_label.config(text=f"Profile trace saved to {os.path.basename(filepath)} "
+                                              "(open in chrome://tracing or Perfetto)")
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to export profile: {str(e)}")
+    
+    def update_zoom_label(self, zoom):
+        self.zoom_label.config(text=f"{zoom * 100:.0f}%" if zoom >= 0.01 else f"{zoom * 100:.2f}%")
+    
+    def update_job_progress(self, jobs):
+        # Show the most recently started job in the status bar
+        if jobs:
+            job = jobs[-1]
+            self.job_label.config(text=job.name if len(jobs) == 1 else f"{job.name} (+{len(jobs) - 1})")
+            self.progress_bar.config(value=job.fraction)
+            self.cancel_button.config(state=tk.NORMAL)
+        else:
+            self.job_label.config(text="")
+            self.progress_bar.config(value=0)
+            self.cancel_button.config(state=tk.DISABLED)
     
     def precompute_bit_planes(self):
         if self.image_array is None:
             return
         
-        # Convert to grayscale for bit plane analysis
-        if len(self.image_array.shape) == 3:
-            gray = np.dot(self.image_array[..., :3], [0.2989, 0.5870, 0.1140])
-        else:
-            gray = self.image_array
+        # One packed cube holds every channel x bit plane
+        image_array = self.image_array
         
-        gray = gray.astype(np.uint8)
+        def planes_ready(cube):
+            self.bit_planes = cube
+            self.status_label.config(text=f"Bit planes ready ({len(cube.channels) * 8} planes)")
         
-        # Compute bit planes
-        self.bit_planes = []
-        for i in range(8):
-            plane = ((gray >> i) & 1) * 255
-            self.bit_planes.append(plane)
+        self.jobs.submit('planes', "Computing bit planes",
+                         lambda progress: core.BitPlaneCube(image_array, progress=progress), planes_ready)
     
-    def show_bit_plane(self):
+    def check_bit_planes(self):
+        # Colour components are converted when first used
+        if core.component_space(self.channel_var.get()) is not None:
+            if self.image_array is None:
+                self.warn_no_image()
+                return False
+            return True
+        
         if self.bit_planes is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+            if self.image_array is None:
+                self.warn_no_image()
+            else:
+                messagebox.showinfo("Info", "Bit planes are still being computed")
+            return False
+        
+        channel = self.channel_var.get()
+        if channel != "All" and channel not in self.bit_planes.channels:
+            messagebox.showinfo("Info", f"Channel {channel} not available")
+            return False
+        
+        return True
+    
+    def colour_source(self, space, image_array=None, key=None):
+        # Worker-side builders of the converted image and its bit planes,
+        # cached per image so every tool converts a colour space once
+        if self.result_cache is None:
+            self.result_cache = core.ResultCache()
+        cache = self.result_cache
+        if image_array is None:
+            image_array, key = self.image_array, self.image_key
+        names = core.colour_channel_names(space)
+        
+        def convert(progress):
+            return cache.get_or_compute((key, 'colour', space),
+                                        lambda: core.convert_colour(image_array, space, progress=progress))
+        
+        def planes(progress):
+            return cache.get_or_compute(
+                (key, 'colour planes', space),
+                lambda: core.BitPlaneCube(convert(lambda done: progress(done / 2)),
+                                          progress=lambda done: progress(0.5 + done / 2), channels=names))
+        
+        return convert, planes
+    
+    def plane_source(self, channel):
+        # Image channels use the precomputed cube, components their own
+        space = core.component_space(channel)
+        if space is None:
+            cube = self.bit_planes
+            return lambda progress: cube
+        return self.colour_source(space)[1]
+    
+    @staticmethod
+    def render_bit_planes(cube, channel, render):
+        # Render for one channel; "All" stacks every colour channel
+        if channel == "All":
+            return cube.composite(render)
+        return render(channel)
+    
+    def show_bit_plane(self, status=None):
+        if not self.check_bit_planes():
             return
         
         try:
             bit = int(self.bit_var.get())
             if bit < 0 or bit > 7:
                 raise ValueError
-            
-            plane = self.bit_planes[bit]
-            plane_image = Image.fromarray(plane.astype(np.uint8))
-            self.display_image(plane_image)
-            
-            self.status_label.config(text=f"Showing bit plane {bit} (LSB={bit})")
-            
         except ValueError:
             messagebox.showerror("Error", "Bit plane must be between 0 and 7")
+            return
+        
+        channel = self.channel_var.get()
+        source = self.plane_source(channel)
+        
+        def build(progress):
+            cube = source(progress)
+            return Image.fromarray(self.render_bit_planes(cube, channel, lambda c: cube.plane(c, bit)))
+        
+        self.show_result(
+            "Bit plane", build,
+            status or f"Showing {channel} bit plane {bit} (LSB={bit})",
+            binary=True, key=('bit plane', channel, bit))
     
     def show_channel(self, channel):
         if self.image_array is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+            self.warn_no_image()
             return
         
         channel_map = {'R': 0, 'G': 1, 'B': 2, 'A': 3}
+        image_array = self.image_array
         
-        if len(self.image_array.shape) == 2:  # Grayscale
-            channel_image = Image.fromarray(self.image_array)
+        if len(image_array.shape) == 2:  # Grayscale
+            channel_array = image_array
         else:
-            if channel == 'A' and self.image_array.shape[2] < 4:
+            if channel == 'A' and image_array.shape[2] < 4:
                 messagebox.showinfo("Info", "No alpha channel in this image")
                 return
             
-            if channel in channel_map:
-                idx = channel_map[channel]
-                if idx < self.image_array.shape[2]:
-                    channel_array = self.image_array[:, :, idx]
-                    channel_image = Image.fromarray(channel_array)
-                else:
-                    messagebox.showinfo("Info", f"Channel {channel} not available")
-                    return
+            idx = channel_map.get(channel)
+            if idx is None or idx >= image_array.shape[2]:
+                messagebox.showinfo("Info", f"Channel {channel} not available")
+                return
+            channel_array = image_array[:, :, idx]
         
-        self.display_image(channel_image)
-        self.status_label.config(text=f"Showing {channel} channel")
+        self.show_result("Channel", lambda progress: Image.fromarray(channel_array),
+                         f"Showing {channel} channel", key=('channel', channel))
     
     def show_rgb_composite(self):
         if self.image_array is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+            self.warn_no_image()
             return
         
-        if len(self.image_array.shape) == 2:
-            rgb_image = Image.fromarray(self.image_array).convert('RGB')
-        else:
-            rgb_image = Image.fromarray(self.image_array)
+        image_array = self.image_array
         
-        self.display_image(rgb_image)
-        self.status_label.config(text="Showing RGB composite")
+        def build(progress):
+            if len(image_array.shape) == 2:
+                return Image.fromarray(image_array).convert('RGB')
+            return Image.fromarray(image_array)
+        
+        self.show_result("RGB composite", build, "Showing RGB composite", key=('composite',))
     
     def apply_grayscale(self):
         if self.current_image is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+            self.warn_no_image()
             return
         
-        gray_image = self.current_image.convert('L')
-        self.display_image(gray_image)
-        self.status_label.config(text="Applied grayscale conversion")
+        image = self.current_image
+        self.show_result("Grayscale", lambda progress: image.convert('L'), "Applied grayscale conversion",
+                         key=('grayscale',))
     
     def invert_colors(self):
         if self.current_image is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+            self.warn_no_image()
             return
         
-        inverted = ImageOps.invert(self.current_image.convert('RGB'))
-        self.display_image(inverted)
-        self.status_label.config(text="Inverted colors")
+        image = self.current_image
+        self.show_result("Invert", lambda progress: ImageOps.invert(image.convert('RGB')), "Inverted colors",
+                         key=('invert',))
     
     def rotate_image(self, angle):
         if self.current_image is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+            self.warn_no_image()
             return
         
-        rotated = self.current_image.rotate(angle, expand=True)
-        self.display_image(rotated)
-        self.status_label.config(text=f"Rotated {angle}°")
+        image = self.current_image
+        self.show_result("Rotate", lambda progress: image.rotate(angle, expand=True), f"Rotated {angle}°",
+                         key=('rotate', angle))
     
     def flip_horizontal(self):
         if self.current_image is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+            self.warn_no_image()
             return
         
-        flipped = self.current_image.transpose(Image.FLIP_LEFT_RIGHT)
-        self.display_image(flipped)
-        self.status_label.config(text="Flipped horizontally")
+        image = self.current_image
+        self.show_result("Flip", lambda progress: image.transpose(Image.FLIP_LEFT_RIGHT), "Flipped horizontally",
+                         key=('flip', Image.FLIP_LEFT_RIGHT))
     
     def flip_vertical(self):
         if self.current_image is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+            self.warn_no_image()
             return
         
-        flipped = self.current_image.transpose(Image.FLIP_TOP_BOTTOM)
-        self.display_image(flipped)
-        self.status_label.config(text="Flipped vertically")
+        image = self.current_image
+        self.show_result("Flip", lambda progress: image.transpose(Image.FLIP_TOP_BOTTOM), "Flipped vertically",
+                         key=('flip', Image.FLIP_TOP_BOTTOM))
     
     def extract_lsb(self):
-        if self.bit_planes is None:
-            messagebox.showwarning("Warning", "Please load an image first")
-            return
-        
         # Show LSB (bit plane 0)
         self.bit_var.set("0")
-        self.show_bit_plane()
-        self.status_label.config(text="Extracted LSB (bit plane 0)")
+        self.show_bit_plane(status="Extracted LSB (bit plane 0)")
     
-    def xor_bit_planes(self):
-        if self.bit_planes is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+    def data_extract(self):
+        if self.image_array is None:
+            self.warn_no_image()
             return
         
-        # XOR of all bit planes
-        result = np.zeros_like(self.bit_planes[0])
-        for plane in self.bit_planes:
-            result = np.bitwise_xor(result, plane // 255)
+        image_array = self.image_array
+        channels = core.channel_names(image_array)
+        
+        extract_window = tk.Toplevel(self.root)
+        extract_window.title("Data Extract")
+        extract_window.geometry("760x560")
+        
+        # Bit selection grid: one row per channel, bits 7..0
+        bits_frame = ttk.LabelFrame(extract_window, text="Bit Planes")
+        bits_frame.pack(fill=tk.X, padx=10, pady=(10, 5))
+        
+        for column, bit in enumerate(range(7, -1, -1)):
+            ttk.Label(bits_frame, text=str(bit)).grid(row=0, column=column + 1)
+        
+        bit_vars = {}
+        for row, name in enumerate(channels):
+            ttk.Label(bits_frame, text=name).grid(row=row + 1, column=0, sticky=tk.W, padx=5)
+            bit_vars[name] = []
+            for column, bit in enumerate(range(7, -1, -1)):
+                var = tk.BooleanVar(value=(bit == 0 and name != 'Alpha'))
+                ttk.Checkbutton(bits_frame, variable=var).grid(row=row + 1, column=column + 1)
+                bit_vars[name].append((bit, var))
+        
+        # Ordering options
+        options_frame = ttk.Frame(extract_window)
+        options_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        ttk.Label(options_frame, text="Order:").pack(side=tk.LEFT)
+        order_var = tk.StringVar(value='row')
+        ttk.Radiobutton(options_frame, text="Row", variable=order_var, value='row').pack(side=tk.LEFT)
+        ttk.Radiobutton(options_frame, text="Column", variable=order_var, value='column').pack(side=tk.LEFT, padx=(0, 15))
+        
+        ttk.Label(options_frame, text="Bit order:").pack(side=tk.LEFT)
+        bit_order_var = tk.StringVar(value='msb')
+        ttk.Radiobutton(options_frame, text="MSB first", variable=bit_order_var, value='msb').pack(side=tk.LEFT)
+        ttk.Radiobutton(options_frame, text="LSB first", variable=bit_order_var, value='lsb').pack(side=tk.LEFT, padx=(0, 15))
+        
+        # Alpha bits are always read first, as in StegSolve
+        ttk.Label(options_frame, text="Channel order:").pack(side=tk.LEFT)
+        channel_order_var = tk.StringVar(value="RGB")
+        ttk.Combobox(options_frame, textvariable=channel_order_var, values=["RGB", "RBG", "GRB", "GBR", "BRG", "BGR"],
+                     state="readonly", width=6).pack(side=tk.LEFT, padx=5)
+        
+        preview = tk.Text(extract_window, wrap=tk.NONE, font=('Courier', 10))
+        scrollbar = ttk.Scrollbar(extract_window, command=preview.yview)
+        preview.config(yscrollcommand=scrollbar.set)
+        
+        def settings():
+            masks = {name: sum(1 << bit for bit, var in bit_vars[name] if var.get()) for name in channels}
+            return dict(bit_masks=masks, order=order_var.get(), bit_order=bit_order_var.get(),
+                        channel_order='A' + channel_order_var.get() + 'L')
+        
+        def show_preview():
+            options = settings()
+            
+            def shown(data):
+                preview.delete('1.0', tk.END)
+                preview.insert(tk.END, core.hex_dump(data) if data else "No bits selected")
+                self.status_label.config(text=f"Data extract preview ({len(data)} bytes)")
+            
+            self.jobs.submit('extract', "Extracting data",
+                             lambda progress: core.extract_data(image_array, limit=self.EXTRACT_PREVIEW_BYTES, **options),
+                             shown)
+        
+        def save_data():
+            options = settings()
+            filepath = filedialog.asksaveasfilename(
+                parent=extract_window,
+                title="Save Extracted Data",
+                defaultextension=".bin",
+                filetypes=[("Binary files", "*.bin"), ("All files", "*.*")]
+            )
+            if not filepath:
+                return
+            
+            def write(progress):
+                # Stream the extracted chunks straight to disk
+                size = 0
+                with open(filepath, 'wb') as f:
+                    for chunk in core.iter_extract_data(image_array, progress=progress, **options):
+                        f.write(chunk)
+                        size += len(chunk)
+                return size
+            
+            self.jobs.submit('extract', "Saving extracted data", write,
+                             lambda size: self.status_label.config(text=f"Saved {size} bytes to {os.path.basename(filepath)}"),
+                             lambda e: messagebox.showerror("Error", f"Failed to save data: {str(e)}", parent=extract_window))
         
-        result = result * 255
-        xor_image = Image.fromarray(result.astype(np.uint8))
-        self.display_image(xor_image)
-        self.status_label.config(text="XOR of all bit planes")
+        buttons_frame = ttk.Frame(extract_window)
+        buttons_frame.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Button(buttons_frame, text="Preview", command=show_preview).pack(side=tk.LEFT)
+        ttk.Button(buttons_frame, text="Save Bin", command=save_data).pack(side=tk.LEFT, padx=5)
+        
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y, padx=(0, 10), pady=(0, 10))
+        preview.pack(fill=tk.BOTH, expand=True, padx=(10, 0), pady=(0, 10))
+        
+        show_preview()
     
-    def and_bit_planes(self):
-        if self.bit_planes is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+    def auto_solve(self):
+        if self.image_array is None:
+            self.warn_no_image()
             return
         
-        # AND of all bit planes
-        result = np.ones_like(self.bit_planes[0]) * 255
-        for plane in self.bit_planes:
-            result = np.bitwise_and(result, plane)
+        image_array = self.image_array
         
-        and_image = Image.fromarray(result.astype(np.uint8))
-        self.display_image(and_image)
-        self.status_label.config(text="AND of all bit planes")
+        solve_window = tk.Toplevel(self.root)
+        solve_window.title("Auto Solve")
+        solve_window.geometry("820x600")
+        
+        options_frame = ttk.Frame(solve_window)
+        options_frame.pack(fill=tk.X, padx=10, pady=(10, 5))
+        
+        ttk.Label(options_frame, text="Workers:").pack(side=tk.LEFT)
+        workers_var = tk.StringVar(value=str(os.cpu_count() or 1))
+        ttk.Spinbox(options_frame, from_=1, to=64, textvariable=workers_var, width=5).pack(side=tk.LEFT, padx=5)
+        
+        summary_label = ttk.Label(solve_window, text="")
+        summary_label.pack(anchor=tk.W, padx=10)
+        
+        panes = ttk.PanedWindow(solve_window, orient=tk.VERTICAL)
+        panes.pack(fill=tk.BOTH, expand=True, padx=10, pady=(5, 10))
+        
+        tree_frame = ttk.Frame(panes)
+        columns = ("score", "configuration", "reasons")
+        tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
+        for column, heading, width in zip(columns, ("Score", "Configuration", "Reasons"), (60, 260, 440)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, anchor=tk.W)
+        scrollbar = ttk.Scrollbar(tree_frame, command=tree.yview)
+        tree.config(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        tree.pack(fill=tk.BOTH, expand=True)
+        panes.add(tree_frame, weight=2)
+        
+        preview = tk.Text(panes, wrap=tk.NONE, height=10, font=('Courier', 10))
+        panes.add(preview, weight=1)
+        
+        candidates = []
+        
+        def run():
+            try:
+                workers = int(workers_var.get())
+            except ValueError:
+                messagebox.showerror("Error", "Workers must be an integer", parent=solve_window)
+                return
+            
+            def solved(result):
+                candidates[:] = result['results']
+                tree.delete(*tree.get_children())
+                for index, candidate in enumerate(candidates):
+                    tree.insert("", tk.END, iid=str(index), values=(
+                        f"{candidate['score']:.1f}", candidate['label'], "; ".join(candidate['reasons'])))
+                summary_label.config(text=f"{result['tested']} configurations | {result['pruned']} pruned early"
+                                          f" | {result['promising']} promising")
+                self.status_label.config(text=f"Auto solve found {result['promising']} promising configurations")
+                if candidates:
+                    tree.selection_set("0")
+            
+            summary_label.config(text="Solving...")
+            self.jobs.submit('solve', "Auto solving",
+                             lambda progress: core.auto_solve(image_array, workers, progress=progress), solved,
+                             lambda e: messagebox.showerror("Error", f"Auto solve failed: {str(e)}", parent=solve_window))
+        
+        def selected():
+            selection = tree.selection()
+            return candidates[int(selection[0])] if selection else None
+        
+        def show_preview(event=None):
+            candidate = selected()
+            preview.delete('1.0', tk.END)
+            if candidate:
+                preview.insert(tk.END, core.hex_dump(candidate['preview']))
+        
+        def save_stream():
+            candidate = selected()
+            if candidate is None:
+                messagebox.showwarning("Warning", "Select a result first", parent=solve_window)
+                return
+            filepath = filedialog.asksaveasfilename(
+                parent=solve_window, title="Save Extracted Data", defaultextension=".bin",
+                filetypes=[("Binary files", "*.bin"), ("All files", "*.*")])
+            if not filepath:
+                return
+            
+            def write(progress):
+                size = 0
+                with open(filepath, 'wb') as f:
+                    for chunk in core.iter_extract_data(image_array, candidate['bit_masks'], candidate['order'],
+                                                        candidate['bit_order'], candidate['channel_order'],
+                                                        progress=progress):
+                        f.write(chunk)
+                        size += len(chunk)
+                return size
+            
+            self.jobs.submit('solve', "Saving extracted data", write,
+                             lambda size: self.status_label.config(text=f"Saved {size} bytes to {os.path.basename(filepath)}"),
+                             lambda e: messagebox.showerror("Error", f"Failed to save data: {str(e)}", parent=solve_window))
+        
+        def close():
+            self.jobs.cancel('solve')
+            solve_window.destroy()
+        
+        ttk.Button(options_frame, text="Run", command=run).pack(side=tk.LEFT, padx=10)
+        ttk.Button(options_frame, text="Save Stream", command=save_stream).pack(side=tk.LEFT)
+        tree.bind('<<TreeviewSelect>>', show_preview)
+        solve_window.protocol("WM_DELETE_WINDOW", close)
+        
+        run()
     
-    def or_bit_planes(self):
-        if self.bit_planes is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+    def combine_bit_planes(self, operation):
+        if not self.check_bit_planes():
             return
         
-        # OR of all bit planes
-        result = np.zeros_like(self.bit_planes[0])
-        for plane in self.bit_planes:
-            result = np.bitwise_or(result, plane)
+        # Combine all 8 planes of the selected channel
+        channel = self.channel_var.get()
+        source = self.plane_source(channel)
+        
+        def build(progress):
+            cube = source(progress)
+            return Image.fromarray(self.render_bit_planes(cube, channel, lambda c: cube.combine(c, operation)))
         
-        or_image = Image.fromarray(result.astype(np.uint8))
-        self.display_image(or_image)
-        self.status_label.config(text="OR of all bit planes")
+        self.show_result(
+            f"{operation.upper()} planes", build,
+            f"{operation.upper()} of all {channel} bit planes",
+            binary=True, key=('combine', channel, operation))
     
-    def extract_all_bit_planes(self):
-        if self.bit_planes is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+    def xor_bit_planes(self):
+        self.combine_bit_planes('xor')
+    
+    def and_bit_planes(self):
+        self.combine_bit_planes('and')
+    
+    def or_bit_planes(self):
+        self.combine_bit_planes('or')
+    
+    def apply_expression(self):
+        if self.image_array is None:
+            self.warn_no_image()
             return
         
-        # Create a composite image of all bit planes
-        rows = 2
-        cols = 4
-        plane_size = self.bit_planes[0].shape
-        composite = np.zeros((plane_size[0] * rows, plane_size[1] * cols), dtype=np.uint8)
-        
-        for i in range(8):
-            row = i // cols
-            col = i % cols
-            composite[row*plane_size[0]:(row+1)*plane_size[0], 
-                     col*plane_size[1]:(col+1)*plane_size[1]] = self.bit_planes[i]
+        text = self.expression_var.get()
+        try:
+            expression = core.PlaneExpression(text)
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid expression: {str(e)}")
+            return
         
-        composite_image = Image.fromarray(composite)
-        self.display_image(composite_image)
-        self.status_label.config(text="All 8 bit planes displayed in grid")
+        image_array = self.image_array
+        if self.random_colours_var.get() and self.colour_map is None:
+            self.colour_map = core.random_colour_map()
+        colour_map = self.colour_map if self.random_colours_var.get() else None
+        self.show_result(
+            "Expression",
+            lambda progress: Image.fromarray(expression.render(image_array, colour_map, progress=progress)),
+            f"Expression: {text}",
+            binary=expression.binary and colour_map is None,
+            key=('expression', text, None if colour_map is None else colour_map.tobytes()))
     
-    def convert_to_hsv(self):
-        if self.current_image is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+    def reseed_colours(self):
+        self.colour_map = core.random_colour_map()
+        if self.random_colours_var.get():
+            self.apply_expression()
+    
+    def extract_all_bit_planes(self):
+        if not self.check_bit_planes():
             return
         
-        hsv_image = self.current_image.convert('HSV')
-        self.display_image(hsv_image)
-        self.status_label.config(text="Converted to HSV color space")
+        channel = self.channel_var.get()
+        source = self.plane_source(channel)
+        
+        def build(progress):
+            # Create a composite image of all bit planes
+            cube = source(progress)
+            rows = 2
+            cols = 4
+            planes = []
+            for i in range(8):
+                planes.append(self.render_bit_planes(cube, channel, lambda c: cube.plane(c, i)))
+                progress((i + 1) / 8)
+            
+            composite = np.concatenate(
+                [np.concatenate(planes[row * cols:(row + 1) * cols], axis=1) for row in range(rows)],
+                axis=0)
+            return Image.fromarray(composite)
+        
+        self.show_result("All bit planes", build, f"All 8 {channel} bit planes displayed in grid", binary=True,
+                         key=('all planes', channel))
     
-    def convert_to_ycbcr(self):
-        if self.current_image is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+    def convert_colour_space(self, space):
+        if self.image_array is None:
+            self.warn_no_image()
             return
         
-        ycbcr_image = self.current_image.convert('YCbCr')
-        self.display_image(ycbcr_image)
-        self.status_label.config(text="Converted to YCbCr color space")
+        # The three components are shown as R, G and B
+        convert, _ = self.colour_source(space)
+        components = ", ".join(core.colour_channel_names(space))
+        self.show_result(space, lambda progress: Image.fromarray(convert(progress)),
+                         f"Converted to {space} color space ({components} shown as R, G, B)",
+                         key=('colour', space))
     
-    def convert_to_lab(self):
-        if self.current_image is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+    def show_component(self):
+        if self.image_array is None:
+            self.warn_no_image()
             return
         
-        # PIL doesn't have direct LAB conversion, so we'll use RGB->XYZ->LAB approximation
-        # For simplicity, we'll convert to grayscale and display as LAB approximation
-        lab_image = self.current_image.convert('L')
-        self.display_image(lab_image)
-        self.status_label.config(text="Converted to grayscale (LAB approximation)")
+        channel = self.component_var.get()
+        space = core.component_space(channel)
+        convert, _ = self.colour_source(space)
+        index = core.colour_channel_names(space).index(channel)
+        self.show_result("Component", lambda progress: Image.fromarray(np.ascontiguousarray(convert(progress)[:, :, index])),
+                         f"Showing {channel} component", key=('component', channel))
     
     def analyze_file_structure(self):
         if self.image_path is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+            self.warn_no_image()
             return
         
-        try:
-            with open(self.image_path, 'rb') as f:
-                data = f.read(1024)  # Read first 1KB
-            
-            # Simple file structure analysis
-            info = f"File: {os.path.basename(self.image_path)}\n"
-            info += f"Size: {os.path.getsize(self.image_path)} bytes\n"
-            
-            # Check for common file signatures
-            if data[:4] == b'\x89PNG':
-                info += "Type: PNG image\n"
-                info += "Signature: PNG (Portable Network Graphics)\n"
-            elif data[:3] == b'\xFF\xD8\xFF':
-                info += "Type: JPEG image\n"
-                info += "Signature: JPEG (Joint Photographic Experts Group)\n"
-            elif data[:2] == b'BM':
-                info += "Type: BMP image\n"
-                info += "Signature: BMP (Bitmap)\n"
-            elif data[:6] == b'GIF87a' or data[:6] == b'GIF89a':
-                info += "Type: GIF image\n"
-                info += "Signature: GIF (Graphics Interchange Format)\n"
-            else:
-                info += "Type: Unknown or custom format\n"
+        image_path = self.image_path
+        
+        structure_window = tk.Toplevel(self.root)
+        structure_window.title("File Structure Analysis")
+        structure_window.geometry("800x600")
+        
+        summary_label = ttk.Label(structure_window, text="Parsing...", justify=tk.LEFT)
+        summary_label.pack(anchor=tk.W, padx=10, pady=(10, 5))
+        
+        panes = ttk.PanedWindow(structure_window, orient=tk.VERTICAL)
+        panes.pack(fill=tk.BOTH, expand=True, padx=10)
+        
+        tree_frame = ttk.Frame(panes)
+        columns = ("offset", "size", "info")
+        tree = ttk.Treeview(tree_frame, columns=columns)
+        tree.heading("#0", text="Structure")
+        tree.column("#0", width=220)
+        for column, heading, width in zip(columns, ("Offset", "Size", "Details"), (90, 90, 380)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, anchor=tk.W)
+        tree.tag_configure('anomaly', foreground='red')
+        tree_scrollbar = ttk.Scrollbar(tree_frame, command=tree.yview)
+        tree.config(yscrollcommand=tree_scrollbar.set)
+        tree_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        tree.pack(fill=tk.BOTH, expand=True)
+        panes.add(tree_frame, weight=3)
+        
+        anomaly_frame = ttk.Frame(panes)
+        ttk.Label(anomaly_frame, text="Anomalies (select to locate):").pack(anchor=tk.W)
+        anomaly_list = tk.Listbox(anomaly_frame, height=6, font=('Courier', 10))
+        anomaly_list.pack(fill=tk.BOTH, expand=True)
+        panes.add(anomaly_frame, weight=1)
+        
+        state = {'structure': None, 'items': {}}
+        
+        def parsed(structure):
+            state['structure'] = structure
+            items = state['items']
+            parents = {}
+            for depth, node in core.iter_structure(structure['nodes']):
+                parent = parents.get(depth - 1, "")
+                iid = tree.insert(parent, tk.END, text=node['name'], open=depth == 0 and len(node['children']) < 100,
+                                  values=(f"{node['offset']:08X}", node['size'], node['info']),
+                                  tags=('anomaly',) if node.get('anomaly') else ())
+                parents[depth] = iid
+                # Anomalies point at the deepest node starting at their offset
+                items[node['offset']] = iid
             
-            # Show in message box
-            messagebox.showinfo("File Structure Analysis", info)
-            self.status_label.config(text="Analyzed file structure")
+            for anomaly in structure['anomalies']:
+                anomaly_list.insert(tk.END, f"{anomaly['offset']:08X}  {anomaly['message']}")
             
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to analyze file: {str(e)}")
+            summary = f"{structure['file']} | {structure['size']} bytes | {structure['type']}"
+            if structure['format']:
+                summary += f"\n{len(structure['anomalies'])} anomalies | {structure['trailing']} trailing bytes"
+                if structure['omitted']:
+                    summary += f" | {structure['omitted']} more nodes not listed"
+            else:
+                summary += "\nStructure walking supports PNG, JPEG, GIF and BMP"
+            summary_label.config(text=summary)
+            self.status_label.config(text=f"Analyzed file structure: {len(structure['anomalies'])} anomalies")
+        
+        def locate(event):
+            selection = anomaly_list.curselection()
+            if not selection or state['structure'] is None:
+                return
+            iid = state['items'].get(state['structure']['anomalies'][selection[0]]['offset'])
+            if iid:
+                tree.see(iid)
+                tree.selection_set(iid)
+        
+        def save_report():
+            if state['structure'] is None:
+                return
+            filepath = filedialog.asksaveasfilename(
+                parent=structure_window, title="Save Structure Report", defaultextension=".txt",
+                filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+            if filepath:
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    f.write(core.format_file_structure(state['structure']))
+        
+        def close():
+            self.jobs.cancel('structure')
+            structure_window.destroy()
+        
+        anomaly_list.bind('<<ListboxSelect>>', locate)
+        ttk.Button(structure_window, text="Save Report", command=save_report).pack(anchor=tk.E, padx=10, pady=10)
+        structure_window.protocol("WM_DELETE_WINDOW", close)
+        
+        self.jobs.submit(
+            'structure', "Parsing file structure",
+            lambda progress: core.analyze_file_structure(image_path, progress),
+            parsed,
+            lambda e: messagebox.showerror("Error", f"Failed to analyze file: {str(e)}", parent=structure_window))
     
     def extract_strings(self):
         if self.image_path is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+            self.warn_no_image()
             return
         
-        try:
-            with open(self.image_path, 'rb') as f:
-                data = f.read()
-            
-            # Extract printable strings (ASCII)
-            strings = []
-            current_string = []
-            
-            for byte in data:
-                if 32 <= byte <= 126:  # Printable ASCII
-                    current_string.append(chr(byte))
-                else:
-                    if len(current_string) >= 4:  # Minimum string length
-                        strings.append(''.join(current_string))
-                    current_string = []
-            
-            if len(current_string) >= 4:
-                strings.append(''.join(current_string))
-            
-            # Create strings window
-            strings_window = tk.Toplevel(self.root)
-            strings_window.title("Extracted Strings")
-            strings_window.geometry("600x400")
-            
-            text_widget = tk.Text(strings_window, wrap=tk.WORD)
-            text_widget.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        # Create strings window
+        strings_window = tk.Toplevel(self.root)
+        strings_window.title("Extracted Strings")
+        strings_window.geometry("700x500")
+        
+        options_frame = ttk.Frame(strings_window)
+        options_frame.pack(fill=tk.X, padx=10, pady=(10, 5))
+        
+        ttk.Label(options_frame, text="Encoding:").pack(side=tk.LEFT)
+        encoding_var = tk.StringVar(value="ASCII")
+        ttk.Combobox(options_frame, textvariable=encoding_var, values=["ASCII", "UTF-16LE", "Both"],
+                     state="readonly", width=10).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(options_frame, text="Min length:").pack(side=tk.LEFT)
+        length_var = tk.StringVar(value="4")
+        ttk.Spinbox(options_frame, from_=1, to=256, textvariable=length_var, width=5).pack(side=tk.LEFT, padx=5)
+        
+        search_frame = ttk.Frame(strings_window)
+        search_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        ttk.Label(search_frame, text="Search:").pack(side=tk.LEFT)
+        search_var = tk.StringVar()
+        search_entry = ttk.Entry(search_frame, textvariable=search_var)
+        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        
+        count_label = ttk.Label(strings_window, text="")
+        count_label.pack(anchor=tk.W, padx=10)
+        
+        state = {'index': None, 'matches': None, 'query': None}
+        
+        def get_rows(start, stop):
+            if state['index'] is None:
+                return []
+            return [f"{offset:08X}  {'U' if encoding == 'utf-16le' else 'A'}  {text}"
+                    for offset, encoding, text in state['index'].get_range(start, stop)]
+        
+        view = VirtualListView(strings_window, get_rows)
+        
+        def scan():
+            try:
+                min_length = int(length_var.get())
+                if min_length < 1:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("Error", "Minimum length must be a positive integer", parent=strings_window)
+                return
             
-            scrollbar = ttk.Scrollbar(strings_window, command=text_widget.yview)
-            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-            text_widget.config(yscrollcommand=scrollbar.set)
+            encodings = {"ASCII": ('ascii',), "UTF-16LE": ('utf-16le',), "Both": ('ascii', 'utf-16le')}[encoding_var.get()]
+            image_path = self.image_path
             
-            for s in strings[:100]:  # Show first 100 strings
-                text_widget.insert(tk.END, s + '\n')
+            def scanned(index):
+                state['index'] = index
+                state['matches'] = None
+                view.set_row_count(len(index))
+                count_label.config(text=f"{len(index)} strings")
+                self.status_label.config(text=f"Extracted {len(index)} strings")
             
-            if len(strings) > 100:
-                text_widget.insert(tk.END, f"\n... and {len(strings) - 100} more strings\n")
+            count_label.config(text="Scanning...")
+            self.jobs.submit(
+                'strings', "Extracting strings",
+                lambda progress: core.StringIndex(image_path, min_length, encodings, progress=progress),
+                scanned,
+                lambda e: messagebox.showerror("Error", f"Failed to extract strings: {str(e)}", parent=strings_window))
+        
+        def find_next():
+            query = search_var.get()
+            index = state['index']
+            if not query or index is None:
+                return
             
-            self.status_label.config(text=f"Extracted {len(strings)} strings")
+            # Search the whole file once per query in the background, then step through the hits
+            if state['query'] != query or state['matches'] is None:
+                def searched(matches):
+                    if state['index'] is not index:
+                        return  # rescanned meanwhile
+                    state['query'], state['matches'] = query, matches
+                    show_match()
+                
+                count_label.config(text=f"{len(index)} strings | searching for '{query}'...")
+                self.jobs.submit(
+                    'strings search', "Searching strings",
+                    lambda progress: index.find(query, progress=progress),
+                    searched,
+                    lambda e: messagebox.showerror("Error", f"Search failed: {str(e)}", parent=strings_window))
+                return
+            show_match()
+        
+        def show_match():
+            query, matches = state['query'], state['matches']
+            if not len(matches):
+                count_label.config(text=f"{len(state['index'])} strings | '{query}' not found")
+                return
             
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to extract strings: {str(e)}")
+            current = view.selected if view.selected is not None else -1
+            position = int(matches.searchsorted(current, side='right')) % len(matches)
+            view.see(int(matches[position]))
+            count_label.config(text=f"{len(state['index'])} strings | match {position + 1}/{len(matches)}")
+        
+        def close():
+            self.jobs.cancel('strings')
+            self.jobs.cancel('strings search')
+            strings_window.destroy()
+        
+        ttk.Button(options_frame, text="Scan", command=scan).pack(side=tk.LEFT, padx=5)
+        ttk.Button(search_frame, text="Find Next", command=find_next).pack(side=tk.LEFT)
+        search_entry.bind('<Return>', lambda e: find_next())
+        strings_window.protocol("WM_DELETE_WINDOW", close)
+        
+        scan()
     
     def compare_images(self):
-        messagebox.showinfo("Info", "This feature would open two images for comparison.\nTo be implemented in future version.")
-        self.status_label.config(text="Image comparison (placeholder)")
+        if self.image_array is None:
+            self.warn_no_image()
+            return
+        
+        filepath = filedialog.askopenfilename(
+            title="Select Image to Compare",
+            filetypes=[
+                ("Image files", "*.png *.jpg *.jpeg *.bmp *.gif *.tiff"),
+                ("All files", "*.*")
+            ]
+        )
+        if not filepath:
+            return
+        
+        first = self.image_array
+        state = {'second': None}
+        
+        compare_window = tk.Toplevel(self.root)
+        compare_window.title(f"Compare with {os.path.basename(filepath)}")
+        compare_window.geometry("420x260")
+        
+        options_frame = ttk.Frame(compare_window)
+        options_frame.pack(fill=tk.X, padx=10, pady=(10, 5))
+        
+        modes = {"XOR": 'xor', "SUB": 'sub', "Difference": 'diff', "Bit plane": 'bitplane'}
+        ttk.Label(options_frame, text="Mode:").pack(side=tk.LEFT)
+        mode_var = tk.StringVar(value="XOR")
+        ttk.Combobox(options_frame, textvariable=mode_var, values=list(modes),
+                     state="readonly", width=10).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(options_frame, text="Bit:").pack(side=tk.LEFT)
+        bit_var = tk.StringVar(value="0")
+        ttk.Spinbox(options_frame, from_=0, to=7, textvariable=bit_var, width=3, state="readonly").pack(side=tk.LEFT, padx=5)
+        
+        summary = tk.Text(compare_window, wrap=tk.WORD, height=8)
+        
+        def compare():
+            mode = modes[mode_var.get()]
+            bit = int(bit_var.get())
+            
+            def work(progress):
+                # The second image is loaded once and reused for every mode
+                if state['second'] is None:
+                    state['second'] = core.load_image(filepath)[1]
+                return core.compare_images(first, state['second'], mode, bit, progress=progress)
+            
+            def compared(result):
+                summary.config(state=tk.NORMAL)
+                summary.delete('1.0', tk.END)
+                summary.insert(tk.END, core.format_comparison(result))
+                summary.config(state=tk.DISABLED)
+                self.show_result(
+                    "Comparison",
+                    lambda progress: Image.fromarray(result['image']),
+                    f"{mode_var.get()} comparison: {result['changed']} changed pixels",
+                    binary=(mode == 'bitplane'))
+            
+            self.jobs.submit('compare', "Comparing images", work, compared,
+                             lambda e: messagebox.showerror("Error", f"Comparison failed: {str(e)}", parent=compare_window))
+        
+        ttk.Button(options_frame, text="Compare", command=compare).pack(side=tk.LEFT, padx=5)
+        summary.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        
+        compare()
     
     def frame_browser(self):
-        if self.current_image is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+        if self.image_path is None:
+            self.warn_no_image()
             return
         
-        if not hasattr(self.current_image, 'is_animated') or not self.current_image.is_animated:
-            messagebox.showinfo("Info", "This image is not animated (GIF).")
-            return
+        # The browser decodes frames itself, so current_image is never seeked
+        image_path = self.image_path
+        
+        def opened(decoder):
+            if decoder.n_frames < 2:
+                decoder.close()
+                messagebox.showinfo("Info", "This image is not animated (GIF).")
+                return
+            self.show_frame_browser(decoder)
         
-        # Simple frame browser for GIFs
+        self.jobs.submit('frames', "Indexing frames", lambda progress: core.FrameDecoder(image_path), opened,
+                         lambda e: messagebox.showerror("Error", f"Failed to read frames: {str(e)}"))
+    
+    def show_frame_browser(self, decoder):
         frame_window = tk.Toplevel(self.root)
         frame_window.title("GIF Frame Browser")
-        frame_window.geometry("400x300")
+        frame_window.geometry("520x460")
         
-        ttk.Label(frame_window, text=f"Total frames: {self.current_image.n_frames}", font=('Arial', 10)).pack(pady=10)
+        ttk.Label(frame_window, text=f"Total frames: {decoder.n_frames}", font=('Arial', 10)).pack(pady=10)
         
         frame_var = tk.IntVar(value=0)
-        frame_slider = ttk.Scale(frame_window, from_=0, to=self.current_image.n_frames-1, 
+        frame_slider = ttk.Scale(frame_window, from_=0, to=decoder.n_frames-1, 
                                  variable=frame_var, orient=tk.HORIZONTAL)
         frame_slider.pack(fill=tk.X, padx=20, pady=10)
         
-        def show_frame(frame_num):
-            self.current_image.seek(frame_num)
-            frame_photo = ImageTk.PhotoImage(self.current_image)
-            frame_label.config(image=frame_photo)
-            frame_label.image = frame_photo
-            frame_num_label.config(text=f"Frame {frame_num + 1}/{self.current_image.n_frames}")
-        
         frame_label = ttk.Label(frame_window)
         frame_label.pack(pady=10)
         
         frame_num_label = ttk.Label(frame_window, text="Frame 1/1")
         frame_num_label.pack()
         
+        state = {'requested': None, 'shown': None, 'previous': 0}
+        
+        def display(frame_num, rgba):
+            # Only the latest request is drawn; slower decodes are dropped
+            if frame_num != state['requested']:
+                return
+            preview = Image.fromarray(rgba)
+            preview.thumbnail((self.FRAME_PREVIEW_SIZE, self.FRAME_PREVIEW_SIZE), Image.Resampling.NEAREST)
+            frame_photo = ImageTk.PhotoImage(preview)
+            frame_label.config(image=frame_photo)
+            frame_label.image = frame_photo
+            state['shown'] = frame_num
+            delay = f" ({decoder.durations[frame_num]} ms)" if decoder.durations else ""
+            frame_num_label.config(text=f"Frame {frame_num + 1}/{decoder.n_frames}{delay}")
+            
+            # Decode ahead in the direction the slider is moving
+            step = -1 if frame_num < state['previous'] else 1
+            state['previous'] = frame_num
+            ahead = [frame_num + step * i for i in range(1, self.FRAME_PREFETCH + 1)]
+            ahead = [index for index in ahead if not decoder.cached(index)]
+            if ahead:
+                self.jobs.submit('prefetch', "Prefetching frames",
+                                 lambda progress: decoder.prefetch(ahead, progress), lambda result: None)
+        
+        def show_frame(frame_num):
+            if frame_num == state['requested']:
+                return
+            state['requested'] = frame_num
+            if decoder.cached(frame_num):
+                display(frame_num, decoder.frame(frame_num))
+                return
+            
+            # The prefetch would hold up the frame that is wanted now
+            self.jobs.cancel('prefetch')
+            self.jobs.submit('frames', "Decoding frame", lambda progress: decoder.frame(frame_num),
+                             lambda rgba: display(frame_num, rgba),
+                             lambda e: messagebox.showerror("Error", f"Failed to decode frame: {str(e)}", parent=frame_window))
+        
+        def show_in_viewer():
+            if state['shown'] is not None:
+                frame_num = state['shown']
+                self.show_result("Frame", lambda progress: Image.fromarray(decoder.frame(frame_num)),
+                                 f"Showing frame {frame_num + 1}/{decoder.n_frames}")
+        
+        def close():
+            self.jobs.cancel('frames')
+            self.jobs.cancel('prefetch')
+            frame_window.destroy()
+            decoder.close()
+        
+        ttk.Button(frame_window, text="Show in Main View", command=show_in_viewer).pack(pady=5)
+        
         show_frame(0)
         frame_slider.config(command=lambda val: show_frame(int(float(val))))
+        frame_window.protocol("WM_DELETE_WINDOW", close)
         
         self.status_label.config(text="Opened GIF frame browser")
     
     def data_carving(self):
         if self.image_path is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+            self.warn_no_image()
             return
         
-        messagebox.showinfo("Data Carving", "This feature would attempt to carve embedded files from the image.\nTo be implemented in future version.")
-        self.status_label.config(text="Data carving (placeholder)")
+        image_path = self.image_path
+        image_array = self.image_array
+        
+        carve_window = tk.Toplevel(self.root)
+        carve_window.title("Data Carving")
+        carve_window.geometry("700x400")
+        
+        options_frame = ttk.Frame(carve_window)
+        options_frame.pack(fill=tk.X, padx=10, pady=(10, 5))
+        
+        lsb_var = tk.BooleanVar(value=image_array is not None)
+        ttk.Checkbutton(options_frame, text="Also scan LSB bit streams", variable=lsb_var).pack(side=tk.LEFT)
+        
+        columns = ("source", "offset", "size", "type")
+        tree = ttk.Treeview(carve_window, columns=columns, show="headings")
+        for column, heading, width in zip(columns, ("Source", "Offset", "Size", "Type"), (200, 90, 90, 260)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, anchor=tk.W)
+        scrollbar = ttk.Scrollbar(carve_window, command=tree.yview)
+        tree.config(yscrollcommand=scrollbar.set)
+        
+        carved = []
+        
+        def scan():
+            include_lsb = lsb_var.get() and image_array is not None
+            
+            def work(progress):
+                # The raw file is scanned first, then each LSB stream
+                share = 0.5 if include_lsb else 1.0
+                candidates = core.carve_file(image_path, progress=lambda done: progress(done * share))
+                if include_lsb:
+                    candidates += core.carve_lsb_streams(
+                        image_array, progress=lambda done: progress(share + done * (1 - share)))
+                return candidates
+            
+            def scanned(candidates):
+                carved[:] = candidates
+                tree.delete(*tree.get_children())
+                for index, candidate in enumerate(candidates):
+                    size = str(candidate['size']) if candidate['exact'] else f"~{candidate['size']}"
+                    tree.insert("", tk.END, iid=str(index), values=(
+                        candidate.get('source', "File"), f"{candidate['offset']:08X}", size, candidate['description']))
+                self.status_label.config(text=f"Data carving found {len(candidates)} candidates")
+            
+            self.jobs.submit('carve', "Carving data", work, scanned)
+        
+        def save(selected_only):
+            candidates = [carved[int(iid)] for iid in tree.selection()] if selected_only else list(carved)
+            if not candidates:
+                messagebox.showwarning("Warning", "No carved files to save", parent=carve_window)
+                return
+            directory = filedialog.askdirectory(parent=carve_window, title="Save Carved Files")
+            if not directory:
+                return
+            
+            self.jobs.submit('carve', "Saving carved files",
+                             lambda progress: core.save_carved(candidates, directory, image_path, image_array),
+                             lambda paths: self.status_label.config(text=f"Saved {len(paths)} carved files to {directory}"),
+                             lambda e: messagebox.showerror("Error", f"Failed to save files: {str(e)}", parent=carve_window))
+        
+        def close():
+            self.jobs.cancel('carve')
+            carve_window.destroy()
+        
+        ttk.Button(options_frame, text="Scan", command=scan).pack(side=tk.LEFT, padx=10)
+        ttk.Button(options_frame, text="Save Selected", command=lambda: save(True)).pack(side=tk.LEFT)
+        ttk.Button(options_frame, text="Save All", command=lambda: save(False)).pack(side=tk.LEFT, padx=5)
+        
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y, padx=(0, 10), pady=(0, 10))
+        tree.pack(fill=tk.BOTH, expand=True, padx=(10, 0), pady=(0, 10))
+        
+        carve_window.protocol("WM_DELETE_WINDOW", close)
+        scan()
     
     def statistical_analysis(self):
         if self.image_array is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+            self.warn_no_image()
             return
         
-        # Basic statistical analysis
-        stats_window = tk.Toplevel(self.root)
-        stats_window.title("Statistical Analysis")
-        stats_window.geometry("400x300")
-        
-        if len(self.image_array.shape) == 3:
-            channels = ['Red', 'Green', 'Blue']
-            if self.image_array.shape[2] == 4:
-                channels.append('Alpha')
-            
-            stats_text = ""
-            for i, channel in enumerate(channels):
-                channel_data = self.image_array[:, :, i]
-                stats_text += f"{channel} Channel:\n"
-                stats_text += f"  Min: {channel_data.min()}\n"
-                stats_text += f"  Max: {channel_data.max()}\n"
-                stats_text += f"  Mean: {channel_data.mean():.2f}\n"
-                stats_text += f"  Std: {channel_data.std():.2f}\n\n"
-        else:
-            stats_text = "Grayscale Image:\n"
-            stats_text += f"  Min: {self.image_array.min()}\n"
-            stats_text += f"  Max: {self.image_array.max()}\n"
-            stats_text += f"  Mean: {self.image_array.mean():.2f}\n"
-            stats_text += f"  Std: {self.image_array.std():.2f}\n"
-        
-        text_widget = tk.Text(stats_window, wrap=tk.WORD)
-        text_widget.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        text_widget.insert(tk.END, stats_text)
-        text_widget.config(state=tk.DISABLED)
+        image_array, image_key = self.image_array, self.image_key
+        
+        def work(progress):
+            # One pass per channel builds the histograms every statistic derives from
+            histograms = core.channel_histograms(image_array, progress=progress)
+            stats = {name: core.histogram_statistics(counts['histogram'], counts['pairs'])
+                     for name, counts in histograms.items()}
+            return histograms, stats
+        
+        def show_stats(result):
+            image_histograms, image_stats = result
+            histograms, stats = dict(image_histograms), dict(image_stats)
+            stats_window = tk.Toplevel(self.root)
+            stats_window.title("Statistical Analysis")
+            stats_window.geometry("900x620")
+            
+            text_widget = tk.Text(stats_window, wrap=tk.WORD, width=40)
+            text_widget.pack(side=tk.LEFT, fill=tk.BOTH, padx=10, pady=10)
+            
+            plots_frame = ttk.Frame(stats_window)
+            plots_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 10), pady=10)
+            
+            options_frame = ttk.Frame(plots_frame)
+            options_frame.pack(fill=tk.X)
+            log_var = tk.BooleanVar(value=False)
+            ttk.Checkbutton(options_frame, text="Log scale", variable=log_var,
+                            command=lambda: draw()).pack(side=tk.LEFT)
+            ttk.Label(options_frame, text="Pair histogram:").pack(side=tk.LEFT, padx=(15, 0))
+            pair_var = tk.StringVar(value=next(iter(histograms)))
+            pair_combo = ttk.Combobox(options_frame, state="readonly", width=10, textvariable=pair_var)
+            pair_combo.pack(side=tk.LEFT, padx=5)
+            pair_combo.bind('<<ComboboxSelected>>', lambda e: draw())
+            
+            # Components of a colour space are added as further channels
+            ttk.Label(options_frame, text="Colour space:").pack(side=tk.LEFT, padx=(15, 0))
+            space_var = tk.StringVar(value="None")
+            space_combo = ttk.Combobox(options_frame, textvariable=space_var, values=["None"] + list(core.COLOUR_SPACES),
+                                       state="readonly", width=7)
+            space_combo.pack(side=tk.LEFT, padx=5)
+            
+            plots = ttk.Frame(plots_frame)
+            plots.pack(fill=tk.BOTH, expand=True)
+            photos = []
+            
+            def draw():
+                text_widget.config(state=tk.NORMAL)
+                text_widget.delete('1.0', tk.END)
+                text_widget.insert(tk.END, core.format_statistics(stats))
+                text_widget.config(state=tk.DISABLED)
+                pair_combo.config(values=list(histograms))
+                if pair_var.get() not in histograms:
+                    pair_var.set(next(iter(histograms)))
+                
+                # Histogram plots stacked per channel, then the pair histogram
+                for widget in plots.winfo_children():
+                    widget.destroy()
+                photos.clear()
+                plot_height = max(24, 360 // len(histograms) - 6)
+                for name, counts in histograms.items():
+                    plot = core.histogram_plot(counts['histogram'], core.CHANNEL_COLOURS.get(name, (80, 80, 80)),
+                                               plot_height, log=log_var.get())
+                    photos.append(ImageTk.PhotoImage(Image.fromarray(plot)))
+                    ttk.Label(plots, image=photos[-1], text=name, compound=tk.LEFT).pack(anchor=tk.W, pady=2)
+                pairs = core.pair_histogram_image(histograms[pair_var.get()]['pairs'])
+                photos.append(ImageTk.PhotoImage(Image.fromarray(pairs)))
+                ttk.Label(plots, image=photos[-1], text="rows: left value, columns: right value",
+                          compound=tk.LEFT).pack(anchor=tk.W, pady=(6, 0))
+            
+            def select_space(event=None):
+                space = space_var.get()
+                histograms.clear()
+                histograms.update(image_histograms)
+                stats.clear()
+                stats.update(image_stats)
+                if space == "None":
+                    draw()
+                    return
+                convert, _ = self.colour_source(space, image_array, image_key)
+                
+                def component_work(progress):
+                    converted = convert(lambda done: progress(done / 2))
+                    return core.channel_histograms(converted, progress=lambda done: progress(0.5 + done / 2),
+                                                   channels=core.colour_channel_names(space))
+                
+                def added(component_histograms):
+                    if not stats_window.winfo_exists() or space_var.get() != space:
+                        return
+                    histograms.update(component_histograms)
+                    stats.update({name: core.histogram_statistics(counts['histogram'], counts['pairs'])
+                                  for name, counts in component_histograms.items()})
+                    draw()
+                    self.status_label.config(text=f"Added {space} components to the statistics")
+                
+                self.jobs.submit('stats', f"{space} statistics", component_work, added)
+            
+            def close():
+                self.jobs.cancel('stats')
+                stats_window.destroy()
+            
+            space_combo.bind('<<ComboboxSelected>>', select_space)
+            stats_window.protocol("WM_DELETE_WINDOW", close)
+            draw()
+            self.status_label.config(text="Performed statistical analysis")
         
-        self.status_label.config(text="Performed statistical analysis")
+        self.jobs.submit('stats', "Statistical analysis", work, show_stats)
     
     def noise_analysis(self):
         if self.image_array is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+            self.warn_no_image()
             return
         
-        messagebox.showinfo("Noise Analysis", "This feature would analyze noise patterns for steganalysis.\nTo be implemented in future version.")
-        self.status_label.config(text="Noise analysis (placeholder)")
+        image_array = self.image_array
+        
+        noise_window = tk.Toplevel(self.root)
+        noise_window.title("Noise Analysis")
+        noise_window.geometry("460x280")
+        
+        options_frame = ttk.Frame(noise_window)
+        options_frame.pack(fill=tk.X, padx=10, pady=(10, 5))
+        
+        filters = {"Laplacian": 'laplacian', "SRM 3x3": 'srm3', "SRM 5x5": 'srm5', "Median": 'median'}
+        ttk.Label(options_frame, text="Filter:").pack(side=tk.LEFT)
+        filter_var = tk.StringVar(value="Laplacian")
+        ttk.Combobox(options_frame, textvariable=filter_var, values=list(filters),
+                     state="readonly", width=10).pack(side=tk.LEFT, padx=5)
+        
+        views = {"Residual": 'residual', "Local deviation": 'variance'}
+        ttk.Label(options_frame, text="View:").pack(side=tk.LEFT)
+        view_var = tk.StringVar(value="Residual")
+        ttk.Combobox(options_frame, textvariable=view_var, values=list(views),
+                     state="readonly", width=14).pack(side=tk.LEFT, padx=5)
+        
+        scale_frame = ttk.Frame(noise_window)
+        scale_frame.pack(fill=tk.X, padx=10, pady=(0, 5))
+        
+        ttk.Label(scale_frame, text="Window:").pack(side=tk.LEFT)
+        window_var = tk.StringVar(value="7")
+        ttk.Spinbox(scale_frame, from_=3, to=63, increment=2, textvariable=window_var, width=4).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(scale_frame, text="Gain:").pack(side=tk.LEFT)
+        gain_var = tk.StringVar(value="8")
+        ttk.Spinbox(scale_frame, from_=1, to=64, textvariable=gain_var, width=4).pack(side=tk.LEFT, padx=5)
+        
+        summary = tk.Text(noise_window, wrap=tk.WORD, height=8)
+        
+        def analyze():
+            try:
+                window = int(window_var.get())
+                gain = float(gain_var.get())
+                if window < 1 or gain <= 0:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("Error", "Window must be a positive integer and gain a positive number",
+                                     parent=noise_window)
+                return
+            method, view = filters[filter_var.get()], views[view_var.get()]
+            
+            def analyzed(result):
+                summary.config(state=tk.NORMAL)
+                summary.delete('1.0', tk.END)
+                summary.insert(tk.END, core.format_noise_analysis(result))
+                summary.config(state=tk.DISABLED)
+                self.show_result(
+                    "Noise analysis",
+                    lambda progress: Image.fromarray(result['image']),
+                    f"Noise analysis: {filter_var.get()} {view_var.get().lower()}")
+            
+            self.jobs.submit('noise', "Noise analysis",
+                             lambda progress: core.noise_analysis(image_array, method, view, window, gain,
+                                                                  progress=progress),
+                             analyzed,
+                             lambda e: messagebox.showerror("Error", f"Noise analysis failed: {str(e)}", parent=noise_window))
+        
+        def close():
+            self.jobs.cancel('noise')
+            noise_window.destroy()
+        
+        ttk.Button(scale_frame, text="Analyze", command=analyze).pack(side=tk.LEFT, padx=5)
+        summary.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        noise_window.protocol("WM_DELETE_WINDOW", close)
+        
+        analyze()
     
     def lsb_detection(self):
         if self.image_array is None:
-            messagebox.showwarning("Warning", "Please load an image first")
+            self.warn_no_image()
+            return
+        
+        image_array, image_key = self.image_array, self.image_key
+        
+        def show_analysis(result):
+            lsb_window = tk.Toplevel(self.root)
+            lsb_window.title("LSB Replacement Detection")
+            lsb_window.geometry("450x400")
+            
+            text_widget = tk.Text(lsb_window, wrap=tk.WORD, height=15)
+            text_widget.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+            text_widget.insert(tk.END, core.format_lsb_analysis(result))
+            text_widget.config(state=tk.DISABLED)
+            
+            heatmap_frame = ttk.Frame(lsb_window)
+            heatmap_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+            
+            channels = list(result['channels'])
+            channel_var = tk.StringVar(value=channels[0])
+            ttk.Combobox(heatmap_frame, textvariable=channel_var, values=channels,
+                         state="readonly", width=8).pack(side=tk.LEFT, padx=(0, 5))
+            
+            methods = {"Chi-square": 'chi_square', "RS": 'rs', "Sample pairs": 'spa'}
+            method_var = tk.StringVar(value="RS")
+            ttk.Combobox(heatmap_frame, textvariable=method_var, values=list(methods),
+                         state="readonly", width=12).pack(side=tk.LEFT, padx=5)
+            
+            def show_heatmap():
+                channel = channel_var.get()
+                method = method_var.get()
+                block_map = result['channels'][channel]['maps'][methods[method]]
+                self.show_result(
+                    "Rendering heatmap",
+                    lambda progress: core.heatmap_overlay(image_array, block_map, result['block_size']),
+                    f"Showing {method} heatmap of {channel} ({result['block_size']}px blocks)",
+                    key=('heatmap', channel, method, result['block_size']), source=image_key)
+            
+            ttk.Button(heatmap_frame, text="Show Heatmap", command=show_heatmap).pack(side=tk.LEFT, padx=5)
+            
+            self.status_label.config(text=f"LSB detection: estimated payload {result['payload_bytes']} bytes")
+        
+        self.jobs.submit('lsb', "LSB detection",
+                         lambda progress: core.lsb_analysis(image_array, progress=progress),
+                         show_analysis)
+    
+    def jpeg_coefficients(self):
+        if self.image_path is None:
+            self.warn_no_image()
+            return
+        
+        image_path = self.image_path
+        
+        def work(progress):
+            jpeg = core.read_jpeg_coefficients(image_path, progress=lambda done: progress(done * 0.9))
+            return jpeg, core.jpeg_analysis(jpeg), core.file_key(image_path)
+        
+        def show_analysis(result):
+            jpeg, analysis, jpeg_key = result
+            components = {component['name']: component for component in jpeg['components']}
+            
+            jpeg_window = tk.Toplevel(self.root)
+            jpeg_window.title("JPEG Coefficients")
+            jpeg_window.geometry("560x560")
+            
+            text_widget = tk.Text(jpeg_window, wrap=tk.WORD, height=14)
+            text_widget.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+            text_widget.insert(tk.END, core.format_jpeg_analysis(analysis))
+            text_widget.config(state=tk.DISABLED)
+            
+            # Coefficient LSB (or higher bit) planes go to the main view
+            plane_frame = ttk.Frame(jpeg_window)
+            plane_frame.pack(fill=tk.X, padx=10)
+            
+            component_var = tk.StringVar(value=next(iter(components)))
+            component_combo = ttk.Combobox(plane_frame, textvariable=component_var, values=list(components),
+                                           state="readonly", width=5)
+            component_combo.pack(side=tk.LEFT, padx=(0, 5))
+            ttk.Label(plane_frame, text="Bit:").pack(side=tk.LEFT)
+            bit_var = tk.IntVar(value=0)
+            ttk.Spinbox(plane_frame, from_=0, to=7, textvariable=bit_var, width=3).pack(side=tk.LEFT, padx=5)
+            layouts = {"Blocks": 'blocks', "By frequency": 'frequency'}
+            layout_var = tk.StringVar(value="Blocks")
+            ttk.Combobox(plane_frame, textvariable=layout_var, values=list(layouts),
+                         state="readonly", width=12).pack(side=tk.LEFT, padx=5)
+            
+            def show_plane():
+                name = component_var.get()
+                layout = layouts[layout_var.get()]
+                try:
+                    bit = int(bit_var.get())
+                except (tk.TclError, ValueError):
+                    bit = 0
+                bit = min(max(0, bit), 7)
+                coefficients = components[name]['coefficients']
+                self.show_result(
+                    "Coefficient plane",
+                    lambda progress: Image.fromarray(core.dct_plane(coefficients, bit, layout)),
+                    f"Showing bit {bit} of the {name} DCT coefficients ({layout_var.get().lower()}, zero coefficients grey)",
+                    binary=True, key=('dct plane', name, bit, layout), source=jpeg_key)
+            
+            ttk.Button(plane_frame, text="Show Plane", command=show_plane).pack(side=tk.LEFT, padx=5)
+            
+            # AC coefficient values -128..127 of the selected component
+            histogram_label = ttk.Label(jpeg_window, text="AC coefficients -128..127", compound=tk.TOP)
+            histogram_label.pack(padx=10, pady=10)
+            
+            def draw_histogram(event=None):
+                counts = core.dct_histogram(components[component_var.get()]['coefficients'], limit=128)[:256]
+                histogram_label.photo = ImageTk.PhotoImage(Image.fromarray(core.histogram_plot(counts, log=True)))
+                histogram_label.config(image=histogram_label.photo)
+            
+            component_combo.bind('<<ComboboxSelected>>', draw_histogram)
+            draw_histogram()
+            
+            self.status_label.config(
+                text=f"JPEG coefficients: JSteg probability {analysis['jsteg']['probability']:.3f}"
+                     + (f", F5 change rate {analysis['f5']['beta'] * 100:.1f}%" if 'f5' in analysis else ""))
+        
+        self.jobs.submit('jpeg', "JPEG coefficients", work, show_analysis,
+                         lambda e: messagebox.showerror("Error", f"JPEG coefficient analysis failed: {str(e)}"))
+    
+    def frame_stack_analysis(self):
+        if self.image_path is None:
+            self.warn_no_image()
+            return
+        
+        image_path = self.image_path
+        
+        def work(progress):
+            stack = core.FrameStack(image_path, progress=lambda done: progress(done * 0.5))
+            if stack.n_frames < 2:
+                return stack, None
+            try:
+                return stack, core.frame_analysis(stack, progress=lambda done: progress(0.5 + done * 0.5))
+            except BaseException:
+                stack.close()
+                raise
+        
+        def show_analysis(result):
+            stack, analysis = result
+            if analysis is None:
+                stack.close()
+                messagebox.showinfo("Info", "This image has a single frame (GIF, APNG and multi-page TIFF are stacked).")
+                return
+            
+            stack_window = tk.Toplevel(self.root)
+            stack_window.title("Frame Stack Analysis")
+            stack_window.geometry("640x520")
+            
+            text_widget = tk.Text(stack_window, wrap=tk.NONE, height=18, font=('Courier', 10))
+            text_widget.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+            text_widget.insert(tk.END, core.format_frame_analysis(analysis, max_frames=stack.n_frames))
+            text_widget.config(state=tk.DISABLED)
+            
+            options_frame = ttk.Frame(stack_window)
+            options_frame.pack(fill=tk.X, padx=10)
+            
+            ttk.Label(options_frame, text="Frame:").pack(side=tk.LEFT)
+            frame_var = tk.IntVar(value=0)
+            ttk.Spinbox(options_frame, from_=0, to=stack.n_frames - 1, textvariable=frame_var,
+                        width=6).pack(side=tk.LEFT, padx=5)
+            channel_var = tk.StringVar(value=core.FRAME_STACK_CHANNELS[0])
+            ttk.Combobox(options_frame, textvariable=channel_var, values=analysis['channels'],
+                         state="readonly", width=8).pack(side=tk.LEFT, padx=5)
+            ttk.Label(options_frame, text="Bit:").pack(side=tk.LEFT)
+            bit_var = tk.IntVar(value=0)
+            ttk.Spinbox(options_frame, from_=0, to=7, textvariable=bit_var, width=3).pack(side=tk.LEFT, padx=5)
+            
+            def selection():
+                try:
+                    index, bit = int(frame_var.get()), int(bit_var.get())
+                except (tk.TclError, ValueError):
+                    index, bit = 0, 0
+                return min(max(0, index), stack.n_frames - 1), channel_var.get(), min(max(0, bit), 7)
+            
+            def show_plane():
+                index, channel, bit = selection()
+                plane = core.FRAME_STACK_CHANNELS.index(channel)
+                self.show_result(
+                    "Frame bit plane",
+                    lambda progress: Image.fromarray((stack.frames[index, :, :, plane] >> bit & 1) * 255),
+                    f"Showing frame {index} {channel} bit {bit}",
+                    binary=True, key=('frame plane', index, channel, bit), source=stack.key)
+            
+            def show_difference():
+                index, _, _ = selection()
+                index = max(1, index)
+                self.show_result(
+                    "Frame difference",
+                    lambda progress: Image.fromarray(core.compare_images(
+                        stack.frames[index - 1], stack.frames[index], 'xor', progress=progress)['image']),
+                    f"Showing frame {index} XOR frame {index - 1}",
+                    key=('frame xor', index), source=stack.key)
+            
+            def show_stack(view):
+                _, channel, bit = selection()
+                self.show_result(
+                    "Frame stack plane",
+                    lambda progress: Image.fromarray(core.stack_plane(stack, channel, bit, view, progress=progress)),
+                    f"Showing {channel} bit {bit} "
+                    + ("XORed over all frames" if view == 'xor' else "changes between frames (white = most)"),
+                    binary=view == 'xor', key=('stack plane', channel, bit, view), source=stack.key)
+            
+            buttons_frame = ttk.Frame(stack_window)
+            buttons_frame.pack(fill=tk.X, padx=10, pady=10)
+            ttk.Button(buttons_frame, text="Frame Plane", command=show_plane).pack(side=tk.LEFT, padx=(0, 5))
+            ttk.Button(buttons_frame, text="XOR Previous", command=show_difference).pack(side=tk.LEFT, padx=5)
+            ttk.Button(buttons_frame, text="Stack XOR", command=lambda: show_stack('xor')).pack(side=tk.LEFT, padx=5)
+            ttk.Button(buttons_frame, text="Change Map", command=lambda: show_stack('changes')).pack(side=tk.LEFT, padx=5)
+            
+            def close():
+                stack.close()
+                stack_window.destroy()
+            
+            stack_window.protocol("WM_DELETE_WINDOW", close)
+            self.status_label.config(
+                text=f"Frame stack: {stack.n_frames} frames, {len(analysis['anomalies'])} anomalies"
+                     + (" (streamed from disk)" if stack.mapped else ""))
+        
+        self.jobs.submit('stack', "Frame stack analysis", work, show_analysis,
+                         lambda e: messagebox.showerror("Error", f"Frame stack analysis failed: {str(e)}"))
+    
+    def stereogram_solver(self):
+        if self.image_array is None:
+            self.warn_no_image()
+            return
+        
+        image_array, image_key = self.image_array, self.image_key
+        width = image_array.shape[1]
+        if width < 2:
+            messagebox.showwarning("Warning", "Image is too narrow for the stereogram solver")
             return
         
-        messagebox.showinfo("LSB Detection", "This feature would detect LSB steganography patterns.\nTo be implemented in future version.")
-        self.status_label.config(text="LSB detection (placeholder)")
+        stereo_window = tk.Toplevel(self.root)
+        stereo_window.title("Stereogram Solver")
+        stereo_window.geometry("360x420")
+        
+        ttk.Label(stereo_window, text="Best offsets (row autocorrelation):").pack(anchor=tk.W, padx=10, pady=(10, 0))
+        offsets_list = tk.Listbox(stereo_window, height=10)
+        offsets_list.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        offset_frame = ttk.Frame(stereo_window)
+        offset_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        
+        ttk.Label(offset_frame, text="Offset:").pack(side=tk.LEFT)
+        offset_var = tk.IntVar(value=1)
+        ttk.Spinbox(offset_frame, from_=1, to=width - 1, textvariable=offset_var, width=6,
+                    command=lambda: show_offset()).pack(side=tk.LEFT, padx=5)
+        offset_scale = ttk.Scale(offset_frame, from_=1, to=width - 1, orient=tk.HORIZONTAL,
+                                 command=lambda value: None if state['syncing'] else show_offset(int(float(value))))
+        offset_scale.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        ranked = []
+        state = {'syncing': False}
+        
+        def show_offset(offset=None):
+            if offset is None:
+                try:
+                    offset = int(offset_var.get())
+                except (tk.TclError, ValueError):
+                    return
+            offset = min(max(1, offset), width - 1)
+            offset_var.set(offset)
+            
+            # Keep the slider in step without re-entering this handler
+            state['syncing'] = True
+            offset_scale.set(offset)
+            state['syncing'] = False
+            
+            self.show_result(
+                "Stereogram",
+                lambda progress: Image.fromarray(core.stereogram_view(image_array, offset)),
+                f"Stereogram solver: offset {offset}",
+                key=('stereogram', offset), source=image_key)
+        
+        def select_offset(event):
+            selection = offsets_list.curselection()
+            if selection:
+                show_offset(ranked[selection[0]][0])
+        
+        def analyzed(offsets):
+            ranked[:] = offsets
+            offsets_list.delete(0, tk.END)
+            for offset, score in offsets:
+                offsets_list.insert(tk.END, f"Offset {offset}  (score {score:.3f})")
+            if offsets:
+                offsets_list.selection_set(0)
+                show_offset(offsets[0][0])
+            self.status_label.config(text=f"Stereogram solver: best offset {offsets[0][0]}" if offsets
+                                     else "Stereogram solver: no repeating offset found")
+        
+        def close():
+            self.jobs.cancel('stereo')
+            stereo_window.destroy()
+        
+        offsets_list.bind('<<ListboxSelect>>', select_offset)
+        stereo_window.bind('<Return>', lambda e: show_offset())
+        stereo_window.protocol("WM_DELETE_WINDOW", close)
+        
+        self.jobs.submit('stereo', "Stereogram autocorrelation",
+                         lambda progress: core.rank_offsets(core.row_autocorrelation(image_array, progress=progress)),
+                         analyzed)
     
     def save_image(self):
+        # Without a full-resolution image the view is at most the reduced JPEG preview
         if self.current_image is None:
+            self.warn_no_image()
+            return
+        if self.displayed_image is None:
             messagebox.showwarning("Warning", "No image to save")
             return
         
@@ -707,9 +2332,12 @@ class StegSolveGUI:
         
         if filepath:
             try:
-                # Get current displayed image (would need to track modifications)
-                # For now, save the original/current image
-                self.current_image.save(filepath)
+                # Save the view on screen; colour spaces such as HSV are
+                # written band for band as RGB, the way they are shown
+                image = self.displayed_image
+                if image.mode not in ('1', 'L', 'LA', 'P', 'RGB', 'RGBA', 'I', 'F'):
+                    image = core.ImagePyramid(image).levels[0]
+                image.save(filepath)
                 self.status_label.config(text=f"Saved to {os.path.basename(filepath)}")
                 messagebox.showinfo("Success", f"Image saved successfully to:\n{filepath}")
             except Exception as e:
@@ -735,15 +2363,31 @@ This tool is for educational and security analysis purposes.
 """
         messagebox.showinfo("About StegSolve GUI", about_text)
     
+    def report_startup(self):
+        # First idle moment after the window is drawn
+        now = time.perf_counter()
+        self.profiler.add('startup', STARTED, now)
+        self.status_label.config(text=f"Ready in {now - STARTED:.2f} s. Load an image to begin analysis.")
+        
+        # Import the analysis engine while the user picks a file
+        self.jobs.submit('warmup', "Loading modules", lambda progress: core.ImagePyramid, lambda result: None)
+    
     def run(self):
+        self.root.after_idle(self.report_startup)
         self.root.mainloop()
 
 
-def main():
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    # Server mode runs headless: no window, just the analysis service
+    if argv[:1] == ['--serve']:
+        import stegsolve_server
+        return stegsolve_server.main(argv[1:])
+    
     root = tk.Tk()
     app = StegSolveGUI(root)
     app.run()
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+StegSolve Profile - per-operation stage timing
+Standard library only, so the GUI can time everything from its first line
+without loading the analysis engine
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class Profiler:
+    """Session timeline of timed stages, exportable as a Chrome trace
+
+    Stages are timed with span() and belong to the operation made
+    current on their thread with operation(), so work done on a worker
+    thread and the display update on the Tk thread add up to one
+    breakdown. Nested spans only count their own time towards a stage,
+    and a stage may carry the size in bytes of what it produced.
+    """
+
+    def __init__(self, max_events=200000):
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+        self.events = deque(maxlen=max_events)
+        self.local = threading.local()
+        self.ids = itertools.count(1)
+
+    def new_operation(self, name):
+        """Identifier of a new operation: (number, name)"""
+        return (next(self.ids), name)
+
+    @contextmanager
+    def operation(self, operation):
+        previous = getattr(self.local, 'operation', None)
+        self.local.operation = operation
+        try:
+            yield operation
+        finally:
+            self.local.operation = previous
+
+    @contextmanager
+    def span(self, name, **args):
+        """Time a stage; set 'bytes' in the yielded dict to record its output size"""
+        stack = self.local.__dict__.setdefault('stack', [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            nested = stack.pop()
+            if stack:
+                stack[-1] += end - start
+            self.add(name, start, end, end - start - nested, **args)
+
+    def add(self, name, start, end, own=None, **args):
+        """Record a stage measured elsewhere (own: time not spent in nested stages)"""
+        thread = threading.current_thread()
+        event = (name, getattr(self.local, 'operation', None), thread.ident, thread.name,
+                 start, end, end - start if own is None else own, args)
+        with self.lock:
+            self.events.append(event)
+
+    def breakdown(self, operation):
+        """(total seconds, [(stage, seconds, bytes, count)]) of one operation, slowest stage first
+
+        The total runs from the first stage's start to the last one's end.
+        """
+        with self.lock:
+            events = [event for event in self.events if event[1] == operation]
+        stages = {}
+        for name, _, _, _, start, end, own, args in events:
+            stage = stages.setdefault(name, [0.0, 0, 0])
+            stage[0] += own
+            stage[1] += args.get('bytes', 0)
+            stage[2] += 1
+        total = max(event[5] for event in events) - min(event[4] for event in events) if events else 0.0
+        ranked = sorted(((name, *values) for name, values in stages.items()), key=lambda stage: -stage[1])
+        return total, ranked
+
+    def chrome_trace(self):
+        """The timeline in Chrome trace event format (chrome://tracing, Perfetto)"""
+        pid = os.getpid()
+        with self.lock:
+            events = list(self.events)
+        trace = []
+        threads = {}
+        for name, operation, ident, thread_name, start, end, own, args in events:
+            threads[ident] = thread_name
+            details = dict(args, self_ms=round(own * 1000, 3))
+            if operation:
+                details['operation'] = operation[0]
+            trace.append({'name': name, 'cat': operation[1] if operation else 'idle', 'ph': 'X', 'pid': pid,
+                          'tid': ident, 'ts': round((start - self.origin) * 1e6, 1),
+                          'dur': round((end - start) * 1e6, 1), 'args': details})
+        for ident, thread_name in threads.items():
+            trace.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': ident, 'args': {'name': thread_name}})
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+def format_breakdown(name, total, stages, limit=4):
+    """One-line summary of a profiled operation for the status bar"""
+    parts = []
+    for stage, seconds, size, count in stages[:limit]:
+        part = f"{stage} {seconds * 1000:.0f} ms"
+        if count > 1:
+            part += f" x{count}"
+        parts.append(part)
+    size = sum(stage[2] for stage in stages)
+    text = f"{name}: {total * 1000:.0f} ms"
+    if parts:
+        text += f" ({', '.join(parts)})"
+    if size:
+        text += f" {size / (1024 * 1024):.1f} MB"
+    return text
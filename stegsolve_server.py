@@ -0,0 +1,601 @@
+#!/usr/bin/env python3
+"""
+StegSolve Server - long-running local analysis service
+Keeps a pool of pre-warmed worker processes and answers analysis requests over
+localhost HTTP or a Unix socket with JSON or PNG, with bounded queueing
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import signal
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+from PIL import Image
+
+import stegsolve_core as core
+
+
+# Default TCP port of the service
+SERVER_PORT = 8765
+
+# Seconds a request waits for its result before answering 504
+SERVER_TIMEOUT = 300.0
+
+# Largest accepted upload
+SERVER_MAX_UPLOAD = 1 << 30
+
+# Bytes of an upload copied to disk at a time
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Latency samples kept for the percentiles in /metrics
+LATENCY_WINDOW = 1000
+
+# Seconds every warm-up task holds its worker, so each task lands on its own process
+WARM_HOLD = 0.2
+
+
+class QueueFull(Exception):
+    """Raised when every worker is busy and the queue is at its limit"""
+
+
+def _int_param(params, name, default, low, high):
+    value = params.get(name)
+    if value is None:
+        return default
+    number = int(value)
+    if not low <= number <= high:
+        raise ValueError(f"{name} must be between {low} and {high}")
+    return number
+
+
+def _cube(image_array, channel):
+    # Components of a colour space are planes of the converted image
+    space = core.component_space(channel)
+    if space is None:
+        return core.BitPlaneCube(image_array)
+    return core.BitPlaneCube(core.convert_colour(image_array, space), channels=core.colour_channel_names(space))
+
+
+def _planes(path, params):
+    channel = params.get('channel', 'All')
+    operation = params.get('op')
+    if operation is not None and operation not in core.PLANE_OPERATIONS:
+        raise ValueError(f"Unknown plane operation: {operation}")
+    _, image_array = core.load_image(path)
+    cube = _cube(image_array, 'Red' if channel == 'All' else channel)
+    if operation is None:
+        bit = _int_param(params, 'bit', 0, 0, 7)
+        render = lambda name: cube.plane(name, bit)
+    else:
+        render = lambda name: cube.combine(name, operation)
+    return Image.fromarray(cube.composite(render) if channel == 'All' else render(channel))
+
+
+def _expression(path, params):
+    if 'expr' not in params:
+        raise ValueError("Missing expr parameter")
+    expression = core.PlaneExpression(params['expr'])
+    _, image_array = core.load_image(path)
+    colour_map = None
+    if 'seed' in params and not expression.binary:
+        colour_map = core.random_colour_map(int(params['seed']))
+    return Image.fromarray(expression.render(image_array, colour_map))
+
+
+def _colour(path, params):
+    space = params.get('space', 'HSV')
+    if space not in core.COLOUR_SPACES:
+        raise ValueError(f"Unknown colour space: {space}")
+    _, image_array = core.load_image(path)
+    converted = core.convert_colour(image_array, space)
+    if 'component' not in params:
+        return Image.fromarray(converted)
+    index = core.colour_channel_names(space).index(f"{space} {params['component']}")
+    return Image.fromarray(np.ascontiguousarray(converted[:, :, index]))
+
+
+def _noise(path, params):
+    _, image_array = core.load_image(path)
+    result = core.noise_analysis(image_array, params.get('method', 'laplacian'), params.get('view', 'residual'),
+                                 _int_param(params, 'window', 7, 3, 63), float(params.get('gain', 8.0)))
+    return Image.fromarray(result['image'])
+
+
+def _statistics(path, params):
+    _, image_array = core.load_image(path)
+    stats = core.channel_statistics(image_array)
+    space = params.get('space')
+    if space is not None:
+        if space not in core.COLOUR_SPACES:
+            raise ValueError(f"Unknown colour space: {space}")
+        stats.update(core.channel_statistics(core.convert_colour(image_array, space),
+                                             channels=core.colour_channel_names(space)))
+    return stats
+
+
+def _strings(path, params):
+    encodings = params.get('encodings', 'ascii').split(',')
+    for encoding in encodings:
+        if encoding not in ('ascii', 'utf-16le'):
+            raise ValueError(f"Unknown string encoding: {encoding}")
+    strings = core.StringIndex(path, _int_param(params, 'min_length', 4, 1, 1024), encodings)
+    start = _int_param(params, 'start', 0, 0, len(strings))
+    rows = strings.get_range(start, start + _int_param(params, 'limit', 1000, 0, 1 << 20))
+    return {'count': len(strings), 'start': start,
+            'strings': [{'offset': offset, 'encoding': encoding, 'text': text} for offset, encoding, text in rows]}
+
+
+def _lsb(path, params):
+    _, image_array = core.load_image(path)
+    lsb = core.lsb_analysis(image_array)
+    return {name: {key: channel[key] for key in ('chi_square', 'rs', 'spa', 'payload_bytes')}
+            for name, channel in lsb['channels'].items()}
+
+
+def _solve(path, params):
+    _, image_array = core.load_image(path)
+    # Already inside a worker, so no nested pool
+    return core.auto_solve(image_array, workers=0, top=_int_param(params, 'top', 20, 1, 1000))
+
+
+def _dct(path, params):
+    jpeg = core.read_jpeg_coefficients(path)
+    components = {component['name']: component for component in jpeg['components']}
+    name = params.get('component', next(iter(components)))
+    if name not in components:
+        raise ValueError(f"Unknown JPEG component: {name}")
+    return Image.fromarray(core.dct_plane(components[name]['coefficients'], _int_param(params, 'bit', 0, 0, 15),
+                                          params.get('layout', 'blocks')))
+
+
+def _stack(path, params):
+    channel = params.get('channel', 'Red')
+    if channel not in core.FRAME_STACK_CHANNELS:
+        raise ValueError(f"Unknown channel: {channel}")
+    stack = core.FrameStack(path)
+    try:
+        return Image.fromarray(core.stack_plane(stack, channel, _int_param(params, 'bit', 0, 0, 7),
+                                                params.get('view', 'xor')))
+    finally:
+        stack.close()
+
+
+def _frames(path, params):
+    stack = core.FrameStack(path)
+    try:
+        return core.frame_analysis(stack)
+    finally:
+        stack.close()
+
+
+# name -> (analysis(path, params), response format)
+SERVER_ANALYSES = {
+    'planes': (_planes, 'png'),
+    'expression': (_expression, 'png'),
+    'colour': (_colour, 'png'),
+    'noise': (_noise, 'png'),
+    'dct': (_dct, 'png'),
+    'stack': (_stack, 'png'),
+    'stats': (_statistics, 'json'),
+    'strings': (_strings, 'json'),
+    'structure': (lambda path, params: core.analyze_file_structure(path), 'json'),
+    'lsb': (_lsb, 'json'),
+    'carve': (lambda path, params: core.carve_file(path), 'json'),
+    'solve': (_solve, 'json'),
+    'jpeg': (lambda path, params: core.jpeg_analysis(core.read_jpeg_coefficients(path)), 'json'),
+    'frames': (_frames, 'json'),
+    'file': (lambda path, params: core.analyze_file(path, _int_param(params, 'min_length', 4, 1, 1024),
+                                                     _int_param(params, 'max_strings', 50, 0, 1 << 20)), 'json'),
+}
+
+
+def _json_default(value):
+    # numpy scalars and arrays, and the byte previews of auto solve
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, bytes):
+        return value.hex()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _error(status, message):
+    return status, 'application/json', json.dumps({'error': message}).encode()
+
+
+def run_analysis(name, path, params):
+    """Worker entry point: (status, content type, body, started, finished) of one analysis, never raise
+
+    The response body is encoded in the worker, so the server threads
+    only pass bytes along. started and finished are wall clock times
+    for the queue wait and run time in the metrics.
+    """
+    started = time.time()
+    function, kind = SERVER_ANALYSES[name]
+    try:
+        result = function(path, params)
+        if kind == 'png':
+            buffer = io.BytesIO()
+            result.save(buffer, 'PNG', compress_level=1)
+            response = 200, 'image/png', buffer.getvalue()
+        else:
+            response = 200, 'application/json', json.dumps(result, default=_json_default).encode()
+    except (ValueError, KeyError, IndexError) as e:
+        response = _error(400, str(e).strip("'\""))
+    except OSError as e:
+        # Missing or undecodable input
+        response = _error(422, str(e))
+    except Exception as e:
+        response = _error(500, f"{type(e).__name__}: {e}")
+    return response + (started, time.time())
+
+
+def _warm_worker():
+    # Ctrl+C stops the server, which then shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Pay the import, plugin registration and first-call costs before any job
+    Image.init()
+    image_array = np.zeros((8, 8, 3), dtype=np.uint8)
+    core.BitPlaneCube(image_array)
+    core.channel_statistics(image_array)
+
+
+def _hold(seconds):
+    time.sleep(seconds)
+    return os.getpid()
+
+
+def _summary(values):
+    if not values:
+        return {'count': 0}
+    values = np.sort(np.array(values))
+    return {'count': len(values), 'mean': float(values.mean()), 'p50': float(np.percentile(values, 50)),
+            'p95': float(np.percentile(values, 95)), 'p99': float(np.percentile(values, 99)),
+            'max': float(values[-1])}
+
+
+class ServerMetrics:
+    """Request counters and a sliding window of queue wait and total latencies"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counts = {'completed': 0, 'failed': 0, 'rejected': 0, 'timeouts': 0}
+        self.waits = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+        self.analyses = {}
+
+    def reject(self):
+        with self.lock:
+            self.counts['rejected'] += 1
+
+    def record(self, name, status, wait, latency):
+        with self.lock:
+            key = 'completed' if status == 200 else 'timeouts' if status == 504 else 'failed'
+            self.counts[key] += 1
+            self.waits.append(wait)
+            self.latencies.append(latency)
+            count, total = self.analyses.get(name, (0, 0.0))
+            self.analyses[name] = count + 1, total + latency
+
+    def snapshot(self):
+        """Counters, uptime and latency percentiles in seconds"""
+        with self.lock:
+            return {
+                'uptime': time.time() - self.started,
+                **self.counts,
+                'queue_wait': _summary(self.waits),
+                'latency': _summary(self.latencies),
+                'analyses': {name: {'count': count, 'mean': total / count}
+                             for name, (count, total) in sorted(self.analyses.items())},
+            }
+
+
+class AnalysisService:
+    """Warm process pool with at most workers running and queue_size waiting jobs
+
+    Requests reserve a slot before they upload anything; when all
+    workers + queue_size slots are taken, reserve() fails at once so the
+    client can back off instead of piling up work. A slot is only given
+    back when its job has really finished, also after a timeout.
+    """
+
+    def __init__(self, workers=None, queue_size=None, timeout=SERVER_TIMEOUT):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.queue_size = 2 * self.workers if queue_size is None else max(0, queue_size)
+        self.timeout = timeout
+        self.metrics = ServerMetrics()
+        self.slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        self.lock = threading.Lock()
+        self.restart_lock = threading.Lock()
+        self.in_flight = 0
+        self.pool, self.pids = self._start_pool()
+
+    def _start_pool(self):
+        """A new pool whose workers have all started, and their pids"""
+        # Spawned workers are safe to start from the threaded server
+        pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_warm_worker)
+        # Hold every worker at once so all of them start now, not on first use
+        return pool, sorted(set(pool.map(_hold, [WARM_HOLD] * self.workers)))
+
+    def reserve(self):
+        """Take a job slot, or raise QueueFull"""
+        if not self.slots.acquire(blocking=False):
+            self.metrics.reject()
+            raise QueueFull(f"{self.workers} workers busy and {self.queue_size} jobs queued")
+        with self.lock:
+            self.in_flight += 1
+
+    def release(self):
+        """Give back a slot taken by reserve()"""
+        with self.lock:
+            self.in_flight -= 1
+        self.slots.release()
+
+    def run(self, name, path, params, remove=False):
+        """(status, content type, body) of one analysis in a reserved slot, which is released
+
+        With remove, path is a temporary upload deleted once the job is done.
+        """
+        submitted = time.time()
+
+        def finished(future=None):
+            if remove:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            self.release()
+
+        pool = self.pool
+        try:
+            future = pool.submit(run_analysis, name, path, params)
+        except BrokenProcessPool:
+            finished()
+            self._restart(pool)
+            return _error(503, "Worker pool restarted, retry the request")
+        future.add_done_callback(finished)
+
+        started = None
+        try:
+            status, content_type, body, started, _ = future.result(self.timeout)
+        except TimeoutError:
+            future.cancel()
+            status, content_type, body = _error(504, f"No result within {self.timeout:g} seconds")
+        except BrokenProcessPool:
+            self._restart(pool)
+            status, content_type, body = _error(500, "Worker process died")
+        done = time.time()
+        self.metrics.record(name, status, (started or done) - submitted, done - submitted)
+        return status, content_type, body
+
+    def _restart(self, broken):
+        # A crashed worker breaks the whole pool. The first caller that saw
+        # broken fail replaces it; the new workers start outside self.lock,
+        # so release() and status() do not wait for them.
+        with self.restart_lock:
+            if self.pool is not broken:
+                return
+            pool, pids = self._start_pool()
+            with self.lock:
+                self.pool, self.pids = pool, pids
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def status(self):
+        """Pool, queue and latency metrics as a JSON-ready dict"""
+        with self.lock:
+            in_flight, pids = self.in_flight, self.pids
+        return {
+            'workers': self.workers,
+            'worker_pids': pids,
+            'queue_limit': self.queue_size,
+            'in_flight': in_flight,
+            'running': min(in_flight, self.workers),
+            'queue_depth': max(0, in_flight - self.workers),
+            **self.metrics.snapshot(),
+        }
+
+    def shutdown(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end: GET /health, /metrics, /analyses; POST /analyze/<name>
+
+    The image is the request body, or with --allow-paths a local file
+    given as ?path=. Other query parameters go to the analysis.
+    """
+
+    server_version = "StegSolveServer/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        service = self.server.service
+        if path == '/health':
+            self.send_json(200, {'status': 'ok', 'workers': service.workers})
+        elif path == '/metrics':
+            self.send_json(200, service.status())
+        elif path == '/analyses':
+            self.send_json(200, {name: kind for name, (_, kind) in SERVER_ANALYSES.items()})
+        else:
+            self.send_json(404, {'error': f"Unknown path: {path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        name = url.path[len('/analyze/'):] if url.path.startswith('/analyze/') else None
+        length = self.headers.get('Content-Length')
+        if name not in SERVER_ANALYSES:
+            self.close_connection = True
+            self.send_json(404, {'error': f"Unknown analysis: {name or url.path}"})
+            return
+        source = params.pop('path', None)
+        if source is not None and not self.server.allow_paths:
+            self.close_connection = True
+            self.send_json(403, {'error': "Local paths are disabled (start the server with --allow-paths)"})
+            return
+        if source is None and (length is None or not length.isdigit()):
+            self.close_connection = True
+            self.send_json(411, {'error': "Send the image as the request body with a Content-Length"})
+            return
+        if source is None and int(length) > self.server.max_upload:
+            self.close_connection = True
+            self.send_json(413, {'error': f"Upload larger than {self.server.max_upload} bytes"})
+            return
+
+        # Backpressure: refuse before reading the upload
+        try:
+            self.server.service.reserve()
+        except QueueFull as e:
+            self.close_connection = True
+            self.send_json(503, {'error': f"Queue full: {e}"}, (('Retry-After', '1'),))
+            return
+
+        uploaded = source is None
+        try:
+            if uploaded:
+                source = self.receive_upload(int(length))
+        except OSError as e:
+            # The client went away mid-upload: nobody is left to answer
+            self.server.service.release()
+            self.close_connection = True
+            self.log_error("Upload aborted: %s", e)
+            return
+        except Exception:
+            self.server.service.release()
+            raise
+        status, content_type, body = self.server.service.run(name, source, params, remove=uploaded)
+        self.send(status, content_type, body)
+
+    def receive_upload(self, length):
+        """Copy the request body to a temporary file and return its path"""
+        handle, path = tempfile.mkstemp(prefix='stegsolve-', dir=self.server.upload_dir)
+        try:
+            with os.fdopen(handle, 'wb') as f:
+                remaining = length
+                while remaining:
+                    chunk = self.rfile.read(min(UPLOAD_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise ConnectionError("Upload ended early")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+        except BaseException:
+            # A client that disconnects mid-upload must not leave the partial file behind
+            os.unlink(path)
+            raise
+        return path
+
+    def send(self, status, content_type, body, headers=()):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in headers:
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, document, headers=()):
+        self.send(status, 'application/json', json.dumps(document).encode(), headers)
+
+    def address_string(self):
+        # Unix socket peers have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded HTTP server on a Unix domain socket"""
+
+    daemon_threads = True
+
+    def server_bind(self):
+        # A socket file left by an earlier run would block the bind
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        super().server_bind()
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def make_server(service, host='127.0.0.1', port=SERVER_PORT, unix_socket=None, allow_paths=False,
+                max_upload=SERVER_MAX_UPLOAD, verbose=False):
+    """HTTP server for service on host:port, or on unix_socket when given; call serve_forever()"""
+    if unix_socket:
+        server = UnixHTTPServer(unix_socket, AnalysisRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), AnalysisRequestHandler)
+        server.daemon_threads = True
+    server.service = service
+    server.allow_paths = allow_paths
+    server.max_upload = max_upload
+    server.upload_dir = None
+    server.verbose = verbose
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='stegsolve-server',
+        description="Serve StegSolve analyses over local HTTP with a warm worker pool")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument('-p', '--port', type=int, default=SERVER_PORT,
+                        help=f"TCP port to listen on (default: {SERVER_PORT})")
+    parser.add_argument('-u', '--unix-socket', help="listen on this Unix socket instead of TCP")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: CPU count)")
+    parser.add_argument('-q', '--queue', type=int,
+                        help="jobs allowed to wait for a worker before requests get 503 (default: 2 per worker)")
+    parser.add_argument('--timeout', type=float, default=SERVER_TIMEOUT,
+                        help=f"seconds to wait for a result before answering 504 (default: {SERVER_TIMEOUT:g})")
+    parser.add_argument('--max-upload', type=int, default=SERVER_MAX_UPLOAD,
+                        help=f"largest accepted upload in bytes (default: {SERVER_MAX_UPLOAD})")
+    parser.add_argument('--allow-paths', action='store_true',
+                        help="allow analyzing local files named by ?path= instead of uploads")
+    parser.add_argument('-v', '--verbose', action='store_true', help="log every request to stderr")
+    args = parser.parse_args(argv)
+
+    service = AnalysisService(args.workers, args.queue, args.timeout)
+    try:
+        server = make_server(service, args.host, args.port, args.unix_socket, args.allow_paths,
+                             args.max_upload, args.verbose)
+    except OSError as e:
+        service.shutdown()
+        print(f"Cannot listen: {e}", file=sys.stderr)
+        return 1
+
+    where = args.unix_socket or f"http://{args.host}:{server.server_address[1]}"
+    print(f"Serving on {where} with {service.workers} workers, queue limit {service.queue_size}",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.unlink(args.unix_socket)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
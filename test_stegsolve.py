@@ -82,6 +82,1392 @@ def test_main_module():
         print(f"✗ Main module import failed: {e}")
         return False
 
+def test_core_module():
+    """Test the headless analysis engine without Tk"""
+    print("\nTesting core module...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import numpy as np
+        import stegsolve_core as core
+        
+        test_array = np.random.randint(0, 256, (50, 60, 3), dtype=np.uint8)
+        
+        stats = core.channel_statistics(test_array)
+        if list(stats) != ['Red', 'Green', 'Blue'] or stats['Red']['max'] != int(test_array[:, :, 0].max()):
+            print("✗ Channel statistics are wrong")
+            return False
+        
+        strings = core.extract_strings(b'\x00\x01flag{hidden}\x02ab\x03', min_length=4)
+        if strings != ['flag{hidden}']:
+            print(f"✗ String extraction returned {strings}")
+            return False
+        
+        print("✓ Core analysis functions work")
+        return True
+    except Exception as e:
+        print(f"✗ Core module test failed: {e}")
+        return False
+
+def test_bit_plane_cube():
+    """Test the packed channel x bit plane cube"""
+    print("\nTesting bit plane cube...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import numpy as np
+        import stegsolve_core as core
+        
+        # Odd width exercises the padding of the last packed byte
+        test_array = np.random.randint(0, 256, (37, 53, 4), dtype=np.uint8)
+        cube = core.BitPlaneCube(test_array, chunk_bytes=4096)
+        
+        if cube.channels != ['Red', 'Green', 'Blue', 'Alpha'] or cube.nbytes != 4 * 8 * 37 * 7:
+            print("✗ Cube has wrong layout")
+            return False
+        
+        for index, channel in enumerate(cube.channels):
+            for bit in range(8):
+                expected = ((test_array[:, :, index] >> bit) & 1) * 255
+                if not np.array_equal(cube.plane(channel, bit), expected):
+                    print(f"✗ {channel} bit plane {bit} mismatch")
+                    return False
+        
+        expected = np.zeros((37, 53), dtype=np.uint8)
+        for bit in range(8):
+            expected ^= (test_array[:, :, 1] >> bit) & 1
+        if not np.array_equal(cube.combine('Green', 'xor'), expected * 255):
+            print("✗ XOR of planes mismatch")
+            return False
+        
+        if abs(cube.ones_ratio('Blue', 0) - ((test_array[:, :, 2] & 1).mean())) > 1e-9:
+            print("✗ Ones ratio mismatch")
+            return False
+        
+        if cube.composite(lambda channel: cube.plane(channel, 0)).shape != (37, 53, 3):
+            print("✗ Composite has wrong shape")
+            return False
+        
+        print("✓ Bit plane cube works")
+        return True
+    except Exception as e:
+        print(f"✗ Bit plane cube test failed: {e}")
+        return False
+
+def test_string_scanner():
+    """Test chunked string scanning and the string index"""
+    print("\nTesting string scanner...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import io
+        import tempfile
+        import stegsolve_core as core
+        
+        data = b'\x00abc\x01flag{chunked}\x02' + 'wide text'.encode('utf-16le') + b'\xff\x03tail'
+        
+        # Tiny chunks force runs to be carried across chunk boundaries
+        for encoding in ('ascii', 'utf-16le'):
+            expected = core.find_printable_runs(data, 4, encoding)
+            for chunk_size in (1, 3, 7, 1024):
+                hits = list(core.scan_strings(io.BytesIO(data), 4, encoding, chunk_size))
+                offsets = [int(o) for chunk in hits for o in chunk[0]]
+                if offsets != expected[0].tolist():
+                    print(f"✗ {encoding} scan with chunk size {chunk_size} returned {offsets}")
+                    return False
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'data.bin')
+            with open(path, 'wb') as f:
+                f.write(data)
+            
+            index = core.StringIndex(path, 4, ('ascii', 'utf-16le'), chunk_size=5)
+            texts = [text for _, _, text in index.get_range(0, len(index))]
+            if texts != ['flag{chunked}', 'wide text', 'tail']:
+                print(f"✗ String index returned {texts}")
+                return False
+            
+            if index.find('text').tolist() != [1] or index.find('flag').tolist() != [0]:
+                print("✗ String search returned wrong hits")
+                return False
+            
+            # Queries an encoding cannot represent have no hits there instead of raising
+            fractions = []
+            if index.find('café', progress=fractions.append).tolist() != [] or fractions[-1] != 1.0:
+                print("✗ Non-ASCII search failed")
+                return False
+        
+        print("✓ String scanner works")
+        return True
+    except Exception as e:
+        print(f"✗ String scanner test failed: {e}")
+        return False
+
+def test_image_pyramid():
+    """Test tiled rendering from the display pyramid"""
+    print("\nTesting image pyramid...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import numpy as np
+        from PIL import Image
+        import stegsolve_core as core
+        
+        test_array = np.random.randint(0, 256, (300, 500, 3), dtype=np.uint8)
+        pyramid = core.ImagePyramid(Image.fromarray(test_array))
+        
+        # At 4x each source pixel becomes a 4x4 block
+        tile = np.array(pyramid.render_tile(4, 0, 0, 64))
+        if tile.shape != (64, 64, 3) or not np.array_equal(tile[::4, ::4], test_array[:16, :16]):
+            print("✗ Magnified tile does not match source pixels")
+            return False
+        
+        # Edge tiles are clipped to the image and tiles past it are empty
+        if pyramid.render_tile(0.25, 0, 0, 100).size != (100, 75) or pyramid.render_tile(0.25, 2, 0, 100) is not None:
+            print("✗ Reduced tiles have wrong size")
+            return False
+        
+        if pyramid.level_for(0.25) != 2 or pyramid.level(2).size != (125, 75):
+            print("✗ Wrong pyramid level")
+            return False
+        
+        # Bit planes must stay strictly binary when zoomed out
+        plane = ((test_array[:, :, 0] & 1) * 255).astype(np.uint8)
+        binary = core.ImagePyramid(Image.fromarray(plane), binary=True)
+        if set(np.unique(np.array(binary.render_tile(0.3, 0, 0)))) - {0, 255}:
+            print("✗ Binary pyramid produced gray levels")
+            return False
+        
+        print("✓ Image pyramid works")
+        return True
+    except Exception as e:
+        print(f"✗ Image pyramid test failed: {e}")
+        return False
+
+def test_data_extract():
+    """Test LSB payload recovery with different orders"""
+    print("\nTesting data extract...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import numpy as np
+        import stegsolve_core as core
+        
+        # Hide a message in the LSBs of R, G, B, read row by row
+        message = b'flag{lsb_payload}'
+        bits = np.unpackbits(np.frombuffer(message, dtype=np.uint8))
+        test_array = np.random.randint(0, 256, (20, 30, 3), dtype=np.uint8)
+        flat = test_array.reshape(-1)
+        flat[:len(bits)] = (flat[:len(bits)] & 0xFE) | bits
+        
+        masks = {'Red': 1, 'Green': 1, 'Blue': 1}
+        if core.extract_data(test_array, masks, limit=len(message)) != message:
+            print("✗ Row-order LSB extraction failed")
+            return False
+        
+        # Column order over the transposed image gives the same stream
+        transposed = np.ascontiguousarray(test_array.transpose(1, 0, 2))
+        if core.extract_data(transposed, masks, order='column', limit=len(message)) != message:
+            print("✗ Column-order extraction failed")
+            return False
+        
+        # Small chunks must not change the result
+        whole = core.extract_data(test_array, {'Red': 0x81, 'Blue': 0x02}, bit_order='lsb', channel_order='BGR')
+        chunked = b''.join(core.iter_extract_data(test_array, {'Red': 0x81, 'Blue': 0x02}, bit_order='lsb',
+                                                  channel_order='BGR', chunk_pixels=7))
+        if whole != chunked or len(whole) != 20 * 30 * 3 // 8:
+            print("✗ Chunked extraction differs")
+            return False
+        
+        print("✓ Data extract works")
+        return True
+    except Exception as e:
+        print(f"✗ Data extract test failed: {e}")
+        return False
+
+def test_lsb_analysis():
+    """Test chi-square, RS and sample pair estimates on a smooth cover"""
+    print("\nTesting LSB analysis...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import numpy as np
+        import stegsolve_core as core
+        
+        # Smooth gradient cover with mild noise, then random LSBs in the left half
+        rng = np.random.default_rng(1)
+        y, x = np.mgrid[0:256, 0:256]
+        cover = np.clip(128 + 60 * np.sin(x / 30.0) + 40 * np.cos(y / 45.0)
+                        + rng.normal(0, 3, (256, 256)), 0, 255).astype(np.uint8)
+        stego = cover.copy()
+        stego[:, :128] = (stego[:, :128] & 0xFE) | rng.integers(0, 2, (256, 128), dtype=np.uint8)
+        
+        clean = core.lsb_analysis(cover)['channels']['Gray']
+        result = core.lsb_analysis(stego)
+        embedded = result['channels']['Gray']
+        if clean['rs'] > 0.05 or clean['spa'] > 0.05:
+            print(f"✗ Clean cover reported embedding: {clean['rs']:.3f} {clean['spa']:.3f}")
+            return False
+        if not (0.35 < embedded['rs'] < 0.65 and 0.35 < embedded['spa'] < 0.65):
+            print(f"✗ Half-embedded image misestimated: {embedded['rs']:.3f} {embedded['spa']:.3f}")
+            return False
+        
+        # Block maps point at the embedded half; fully random LSBs look like chi-square hits
+        rs_map = embedded['maps']['rs']
+        if rs_map.shape != (4, 4) or rs_map[:, :2].mean() < 0.8 or rs_map[:, 2:].mean() > 0.2:
+            print("✗ RS block map does not locate the payload")
+            return False
+        if embedded['maps']['chi_square'][:, :2].min() < 0.5:
+            print("✗ Chi-square block map missed the payload")
+            return False
+        
+        if core.heatmap_overlay(stego, rs_map, result['block_size']).size != (256, 256):
+            print("✗ Heatmap overlay has the wrong size")
+            return False
+        
+        print("✓ LSB analysis works")
+        return True
+    except Exception as e:
+        print(f"✗ LSB analysis test failed: {e}")
+        return False
+
+def test_data_carving():
+    """Test carving of appended files and of files hidden in LSB streams"""
+    print("\nTesting data carving...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import io
+        import gzip
+        import tempfile
+        import zipfile
+        import numpy as np
+        import stegsolve_core as core
+        from PIL import Image
+        
+        # PNG with a ZIP and a gzip stream appended, split across scan chunks
+        png = io.BytesIO()
+        Image.fromarray(np.random.randint(0, 256, (32, 32, 3), dtype=np.uint8)).save(png, 'PNG')
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as f:
+            f.writestr('flag.txt', 'flag{appended_zip}' * 20)
+            f.writestr('other.txt', 'second member')
+        compressed = gzip.compress(b'secret' * 100)
+        blob = png.getvalue() + archive.getvalue() + compressed + bytes(100)
+        
+        carved = core.carve(io.BytesIO(blob), chunk_size=1000)
+        found = [(c['extension'], c['offset'], c['size']) for c in carved]
+        expected = [('png', 0, len(png.getvalue())),
+                    ('zip', len(png.getvalue()), len(archive.getvalue())),
+                    ('gz', len(png.getvalue()) + len(archive.getvalue()), len(compressed))]
+        if found != expected:
+            print(f"✗ Carved {found}, expected {expected}")
+            return False
+        
+        # The same ZIP hidden in the RGB LSBs is found and written out intact
+        image_array = np.random.randint(0, 256, (100, 100, 3), dtype=np.uint8)
+        bits = np.unpackbits(np.frombuffer(archive.getvalue(), dtype=np.uint8))
+        flat = image_array.reshape(-1)
+        flat[:len(bits)] = (flat[:len(bits)] & 0xFE) | bits
+        hidden = [c for c in core.carve_lsb_streams(image_array) if c['extension'] == 'zip']
+        if len(hidden) != 1 or hidden[0]['stream'] != 0:
+            print("✗ ZIP in LSB stream not found")
+            return False
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path, = core.save_carved(hidden, directory, None, image_array)
+            with zipfile.ZipFile(path) as f:
+                if f.read('flag.txt') != b'flag{appended_zip}' * 20:
+                    print("✗ Saved ZIP is corrupt")
+                    return False
+        
+        print("✓ Data carving works")
+        return True
+    except Exception as e:
+        print(f"✗ Data carving test failed: {e}")
+        return False
+
+def test_compare_images():
+    """Test tiled image comparison modes, counts and bounding box"""
+    print("\nTesting image comparison...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import numpy as np
+        import stegsolve_core as core
+        
+        original = np.random.randint(0, 256, (40, 50, 3), dtype=np.uint8)
+        carrier = original.copy()
+        carrier[10:15, 20:30, 2] ^= 1
+        
+        # Tiny tiles must give the same result as one pass
+        whole = core.compare_images(original, carrier, 'xor')
+        tiled = core.compare_images(original, carrier, 'xor', tile_bytes=1)
+        if not np.array_equal(whole['image'], tiled['image']) or tiled['changed'] != 50:
+            print("✗ Tiled XOR comparison differs")
+            return False
+        if tiled['bbox'] != (20, 10, 30, 15) or tiled['channels'] != {'Red': 0, 'Green': 0, 'Blue': 50}:
+            print(f"✗ Wrong bounding box or channel counts: {tiled['bbox']} {tiled['channels']}")
+            return False
+        
+        diff = core.compare_images(original, carrier, 'diff')['image']
+        sub = core.compare_images(carrier, original, 'sub')['image']
+        if diff.max() != 1 or not np.array_equal(sub, (carrier - original)):
+            print("✗ Difference or subtraction view is wrong")
+            return False
+        
+        planes = core.compare_images(original, carrier, 'bitplane', bit=0)['image']
+        if planes[:, :, 2].sum() != 50 * 255 or core.compare_images(original, carrier, 'bitplane', bit=1)['changed'] != 50:
+            print("✗ Bit plane difference is wrong")
+            return False
+        
+        # Grayscale against RGBA: only the alpha edit counts
+        gray = original[:, :, 0]
+        rgba = np.dstack([gray, gray, gray, np.full_like(gray, 255)])
+        rgba[0, 0, 3] = 0
+        mixed = core.compare_images(gray, rgba)
+        if mixed['changed'] != 1 or mixed['channels']['Alpha'] != 1:
+            print("✗ Mixed channel layouts compared incorrectly")
+            return False
+        
+        print("✓ Image comparison works")
+        return True
+    except Exception as e:
+        print(f"✗ Image comparison test failed: {e}")
+        return False
+
+def test_frame_decoder():
+    """Test random access to GIF frames against Pillow's own compositing"""
+    print("\nTesting frame decoder...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import tempfile
+        import numpy as np
+        import stegsolve_core as core
+        from PIL import Image
+        
+        # Optimized animation: later frames are transparent deltas
+        base = np.random.randint(0, 256, (30, 40, 3), dtype=np.uint8)
+        frames = []
+        for i in range(12):
+            frame = base.copy()
+            frame[i:i + 8, 2 * i:2 * i + 10] = [255, 0, 0] if i % 2 else [0, 0, 255]
+            frames.append(Image.fromarray(frame).quantize(200))
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "anim.gif")
+            frames[0].save(path, save_all=True, append_images=frames[1:], duration=[20 + 10 * i for i in range(12)],
+                           optimize=True)
+            
+            # A budget of four frames forces checkpoints and evictions
+            decoder = core.FrameDecoder(path, budget_bytes=4 * 30 * 40 * 4)
+            reference = Image.open(path)
+            try:
+                if decoder.n_frames != 12 or decoder.durations != [20 + 10 * i for i in range(12)]:
+                    print("✗ Wrong frame count or durations")
+                    return False
+                if decoder.keyframe_interval != 12:
+                    print(f"✗ Unexpected keyframe interval {decoder.keyframe_interval}")
+                    return False
+                
+                for index in [11, 3, 7, 0, 10, 2]:
+                    reference.seek(index)
+                    if not np.array_equal(decoder.frame(index)[:, :, :3], np.array(reference.convert('RGB'))):
+                        print(f"✗ Frame {index} differs from Pillow")
+                        return False
+                if decoder.cache_bytes > decoder.budget_bytes:
+                    print("✗ Frame cache exceeds its budget")
+                    return False
+                
+                decoder.prefetch([4, 5])
+                if not (decoder.cached(4) and decoder.cached(5)):
+                    print("✗ Prefetched frames are not cached")
+                    return False
+            finally:
+                decoder.close()
+                reference.close()
+        
+        print("✓ Frame decoder works")
+        return True
+    except Exception as e:
+        print(f"✗ Frame decoder test failed: {e}")
+        return False
+
+def test_stereogram_solver():
+    """Test FFT row autocorrelation on a synthetic random-dot stereogram"""
+    print("\nTesting stereogram solver...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import numpy as np
+        import stegsolve_core as core
+        
+        # Every row repeats with period 40, except a hidden square at period 37
+        rng = np.random.default_rng(3)
+        image = np.zeros((120, 300), dtype=np.uint8)
+        for y in range(120):
+            row = image[y]
+            row[:40] = rng.integers(0, 256, 40)
+            for x in range(40, 300):
+                row[x] = row[x - (37 if 40 < y < 80 and 100 < x < 200 else 40)]
+        rgb = np.dstack([image, image, image])
+        
+        correlation = core.row_autocorrelation(rgb, chunk_rows=7)
+        if abs(correlation[0] - 1) > 1e-6 or not np.allclose(correlation, core.row_autocorrelation(image)):
+            print("✗ Autocorrelation is not normalised or depends on chunking/channels")
+            return False
+        
+        offsets = core.rank_offsets(correlation, count=3)
+        if offsets[0][0] != 40:
+            print(f"✗ Best offset {offsets[0][0]}, expected 40")
+            return False
+        
+        # At the right offset only the hidden shape survives the difference
+        view = core.stereogram_view(rgb, 40)
+        if view.shape != rgb.shape or view[:40, :260].any() or not view[45:75, 120:190].any():
+            print("✗ Shifted difference does not reveal the hidden shape")
+            return False
+        
+        print("✓ Stereogram solver works")
+        return True
+    except Exception as e:
+        print(f"✗ Stereogram solver test failed: {e}")
+        return False
+
+def test_plane_expression():
+    """Test bit-mask expressions against direct numpy evaluation"""
+    print("\nTesting plane expressions...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import numpy as np
+        import stegsolve_core as core
+        
+        rng = np.random.default_rng(5)
+        image = rng.integers(0, 256, (37, 53, 4), dtype=np.uint8)
+        r, g, b, a = (image[:, :, i] for i in range(4))
+        cases = [
+            ("R bit0 XOR G bit0", (r ^ g) & 1),
+            ("B bits 0-2", b & 7),
+            ("G bits 0,3", g & 9),
+            ("(R ^ G ^ B) & 1", (r ^ g ^ b) & 1),
+            ("NOT A bit7 AND 1", ~(a >> 7) & 1),
+            ("R bit1 OR B bit1", ((r >> 1) | (b >> 1)) & 1),
+        ]
+        for text, expected in cases:
+            values = core.PlaneExpression(text).evaluate(image, chunk_bytes=200)
+            if not np.array_equal(values, expected.astype(np.uint8)):
+                print(f"✗ Expression '{text}' does not match numpy")
+                return False
+        
+        # Binary results are stretched to black and white
+        expression = core.PlaneExpression("R bit0 XOR G bit0")
+        if not expression.binary or not np.array_equal(expression.render(image), ((r ^ g) & 1) * 255):
+            print("✗ Binary expression is not rendered as black and white")
+            return False
+        
+        colour_map = core.random_colour_map(1)
+        coloured = core.PlaneExpression("B bits 0-2").render(image, colour_map)
+        if colour_map.shape != (256, 3) or not np.array_equal(coloured, colour_map[b & 7]):
+            print("✗ Random colour map is not applied")
+            return False
+        
+        for text in ("R bit9", "R bit0 XOR", "Q bit0", "(R bit0"):
+            try:
+                core.PlaneExpression(text)
+            except ValueError:
+                continue
+            print(f"✗ Malformed expression '{text}' was accepted")
+            return False
+        
+        print("✓ Plane expressions work")
+        return True
+    except Exception as e:
+        print(f"✗ Plane expression test failed: {e}")
+        return False
+
+def test_result_cache():
+    """Test the LRU result cache and content keys"""
+    print("\nTesting result cache...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import numpy as np
+        import stegsolve_core as core
+        
+        image = np.zeros((10, 10, 3), dtype=np.uint8)
+        changed = image.copy()
+        changed[5, 5, 1] = 1
+        if core.content_key(image) != core.content_key(image.copy()) or \
+           core.content_key(image) == core.content_key(changed) or \
+           core.content_key(image) == core.content_key(image.reshape(10, 30)):
+            print("✗ Content key does not follow pixels and shape")
+            return False
+        
+        cache = core.ResultCache(budget_bytes=1000)
+        calls = []
+        
+        def compute(name):
+            calls.append(name)
+            return np.zeros(400, dtype=np.uint8)
+        
+        for name in ('a', 'b', 'a', 'c', 'a'):
+            cache.get_or_compute(('img', name), lambda: compute(name))
+        
+        # 'b' was least recently used when 'c' pushed the total over budget
+        if calls != ['a', 'b', 'c'] or ('img', 'b') in cache or ('img', 'a') not in cache:
+            print(f"✗ LRU eviction wrong: computed {calls}")
+            return False
+        if cache.total_bytes != 800 or cache.hits != 2:
+            print(f"✗ Cache accounting wrong: {cache.total_bytes} bytes, {cache.hits} hits")
+            return False
+        
+        cache.put(('img', 'huge'), np.zeros(2000, dtype=np.uint8))
+        if ('img', 'huge') in cache or len(cache) != 2:
+            print("✗ Result larger than the budget was cached")
+            return False
+        
+        print("✓ Result cache works")
+        return True
+    except Exception as e:
+        print(f"✗ Result cache test failed: {e}")
+        return False
+
+def test_noise_analysis():
+    """Test high-pass residuals and local noise maps on a pasted smooth patch"""
+    print("\nTesting noise analysis...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import numpy as np
+        import stegsolve_core as core
+        
+        rng = np.random.default_rng(7)
+        image = np.clip(128 + rng.normal(0, 6, (90, 120, 3)), 0, 255).astype(np.uint8)
+        image[30:60, 40:90] = 128
+        
+        # Laplacian residual against a direct 3x3 convolution with edge padding
+        padded = np.pad(image[:, :, 0].astype(float), 1, mode='edge')
+        laplacian = 4 * padded[1:-1, 1:-1] - padded[:-2, 1:-1] - padded[2:, 1:-1] - padded[1:-1, :-2] - padded[1:-1, 2:]
+        expected = np.clip(np.abs(laplacian / 4) * 2, 0, 255).astype(np.uint8)
+        result = core.noise_analysis(image, 'laplacian', gain=2, tile_rows=7)
+        if not np.array_equal(result['image'][:, :, 0], expected):
+            print("✗ Laplacian residual does not match convolution")
+            return False
+        
+        for method in ('laplacian', 'srm3', 'srm5', 'median'):
+            tiled = core.noise_analysis(image, method, 'variance', window=5, tile_rows=6)
+            whole = core.noise_analysis(image, method, 'variance', window=5, tile_rows=1000)
+            if np.abs(tiled['image'].astype(int) - whole['image']).max() > 1:
+                print(f"✗ {method} result depends on the tile size")
+                return False
+            # The flat patch has no noise; the rest of the image does
+            if tiled['image'][35:55, 45:85].max() != 0 or tiled['image'][:20].mean() < 10:
+                print(f"✗ {method} deviation map does not reveal the smooth patch")
+                return False
+        
+        if set(result['noise']) != {'Red', 'Green', 'Blue'} or not 1 < result['noise']['Red'] < 20:
+            print(f"✗ Unexpected noise levels: {result['noise']}")
+            return False
+        
+        try:
+            core.noise_analysis(image, 'sobel')
+            print("✗ Unknown filter accepted")
+            return False
+        except ValueError:
+            pass
+        
+        print("✓ Noise analysis works")
+        return True
+    except Exception as e:
+        print(f"✗ Noise analysis test failed: {e}")
+        return False
+
+def test_histogram_statistics():
+    """Test single-pass histogram statistics against direct numpy results"""
+    print("\nTesting histogram statistics...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import numpy as np
+        import stegsolve_core as core
+        
+        test_array = np.random.randint(0, 256, (41, 29, 3), dtype=np.uint8)
+        
+        # Small chunks split the image into strips of two rows
+        histograms = core.channel_histograms(test_array, chunk_bytes=64)
+        green = test_array[:, :, 1]
+        pairs = np.zeros((256, 256), dtype=np.int64)
+        np.add.at(pairs, (green[:, :-1].ravel(), green[:, 1:].ravel()), 1)
+        if not np.array_equal(histograms['Green']['histogram'], np.bincount(green.ravel(), minlength=256)) or \
+           not np.array_equal(histograms['Green']['pairs'], pairs):
+            print("✗ Value or pair histogram is wrong")
+            return False
+        
+        stats = core.channel_statistics(test_array, chunk_bytes=64)['Green']
+        expected_ones = [float(((green >> bit) & 1).mean()) for bit in range(8)]
+        values, counts = np.unique(green, return_counts=True)
+        expected_entropy = -(counts / green.size * np.log2(counts / green.size)).sum()
+        if stats['min'] != green.min() or stats['max'] != green.max() or \
+           abs(stats['mean'] - green.mean()) > 1e-9 or abs(stats['std'] - green.std()) > 1e-9 or \
+           not np.allclose(stats['ones'], expected_ones) or abs(stats['entropy'] - expected_entropy) > 1e-9:
+            print("✗ Statistics derived from the histogram are wrong")
+            return False
+        
+        plot = core.histogram_plot(histograms['Green']['histogram'], height=50)
+        if plot.shape != (50, 512, 3) or core.pair_histogram_image(pairs).shape != (256, 256):
+            print("✗ Histogram plots have the wrong shape")
+            return False
+        
+        print("✓ Histogram statistics work")
+        return True
+    except Exception as e:
+        print(f"✗ Histogram statistics test failed: {e}")
+        return False
+
+def test_benchmark_suite():
+    """Test the benchmark runner and baseline comparison on tiny inputs"""
+    print("\nTesting benchmark suite...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import json
+        import stegsolve_bench
+        
+        report = stegsolve_bench.run_benchmarks([0.01], modes=('RGB', 'GIF'), operations=['statistics', 'frames'],
+                                                repeat=1)
+        runs = [(result['operation'], result['input']) for result in report['results']]
+        if runs != [('statistics', 'RGB-0.01MP'), ('statistics', 'GIF-0.01MP'), ('frames', 'GIF-0.01MP')]:
+            print(f"✗ Unexpected benchmark runs: {runs}")
+            return False
+        if any(result['seconds'] <= 0 or result['peak_bytes'] < 0 for result in report['results']):
+            print("✗ Benchmark measurements are missing")
+            return False
+        json.dumps(report)
+        
+        startup = stegsolve_bench.run_benchmarks([], operations=['startup'], repeat=1)['results']
+        if len(startup) != 1 or startup[0]['input'] != 'gui' or startup[0]['seconds'] <= 0:
+            print("✗ Startup time not measured")
+            return False
+        
+        # Same results never regress; a baseline twice as fast does
+        if stegsolve_bench.compare_results(report, report, min_seconds=0):
+            print("✗ Identical results reported as regressions")
+            return False
+        faster = json.loads(json.dumps(report))
+        for result in faster['results']:
+            result['seconds'] /= 2
+        regressions = stegsolve_bench.compare_results(report, faster, threshold=0.5, min_seconds=0)
+        if len(regressions) != 3 or any(r['metric'] != 'seconds' for r in regressions):
+            print(f"✗ Regressions not detected: {regressions}")
+            return False
+        
+        print("✓ Benchmark suite works")
+        return True
+    except Exception as e:
+        print(f"✗ Benchmark suite test failed: {e}")
+        return False
+
+def test_load_preview():
+    """Test reduced JPEG preview decoding"""
+    print("\nTesting preview decoding...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import tempfile
+        import numpy as np
+        from PIL import Image
+        import stegsolve_core as core
+        
+        gradient = np.dstack(list(np.meshgrid(np.arange(1200) % 256, np.arange(800) % 256)) + [np.zeros((800, 1200))])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            jpeg = os.path.join(tmpdir, 'large.jpg')
+            png = os.path.join(tmpdir, 'large.png')
+            Image.fromarray(gradient.astype(np.uint8)).save(jpeg)
+            Image.fromarray(gradient.astype(np.uint8)).save(png)
+            
+            # 1/4 scale is the smallest that still covers 250x180
+            preview, size = core.load_preview(jpeg, 250, 180)
+            if size != (1200, 800) or preview.size != (300, 200) or preview.mode != 'RGB':
+                print(f"✗ Preview is {preview.size} {preview.mode}, full size {size}")
+                return False
+            
+            if core.load_preview(jpeg, 1200, 800) is not None or core.load_preview(png, 250, 180) is not None:
+                print("✗ Preview returned where no reduced decode is possible")
+                return False
+        
+        print("✓ Preview decoding works")
+        return True
+    except Exception as e:
+        print(f"✗ Preview decoding test failed: {e}")
+        return False
+
+def test_file_structure():
+    """Test the streaming container structure walk"""
+    print("\nTesting file structure analysis...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import tempfile
+        import numpy as np
+        from PIL import Image, PngImagePlugin
+        import stegsolve_core as core
+        
+        pixels = np.random.default_rng(3).integers(0, 256, (40, 50, 3), dtype=np.uint8)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            png = os.path.join(tmpdir, 'test.png')
+            text = PngImagePlugin.PngInfo()
+            text.add_text('Comment', 'hello')
+            Image.fromarray(pixels).save(png, pnginfo=text)
+            structure = core.analyze_file_structure(png)
+            names = [node['name'] for node in structure['nodes']]
+            if structure['anomalies'] or names != ['Signature', 'IHDR', 'tEXt', 'IDAT stream', 'IEND']:
+                print(f"✗ Clean PNG parsed as {names} with {structure['anomalies']}")
+                return False
+            if f"inflate to {core.png_raw_size(50, 40, 8, 2)} (expected" not in structure['nodes'][3]['info']:
+                print(f"✗ IDAT size not checked: {structure['nodes'][3]['info']}")
+                return False
+            
+            # Corrupt the tEXt chunk and append a ZIP header
+            data = bytearray(open(png, 'rb').read())
+            data[45] ^= 1
+            with open(png, 'wb') as f:
+                f.write(bytes(data) + b'PK\x03\x04' + bytes(12))
+            structure = core.analyze_file_structure(png)
+            messages = ' | '.join(anomaly['message'] for anomaly in structure['anomalies'])
+            if structure['trailing'] != 16 or 'CRC mismatch' not in messages or 'after the end' not in messages:
+                print(f"✗ PNG anomalies not found: {messages}")
+                return False
+            
+            jpeg = os.path.join(tmpdir, 'test.jpg')
+            Image.fromarray(pixels).save(jpeg, comment=b'\x00\x01binary')
+            with open(jpeg, 'ab') as f:
+                f.write(b'hidden')
+            structure = core.analyze_file_structure(jpeg)
+            names = [node['name'] for node in structure['nodes']]
+            messages = ' | '.join(anomaly['message'] for anomaly in structure['anomalies'])
+            if names[-3:] != ['Scan data', 'EOI', 'Trailing data'] or 'non-printable' not in messages:
+                print(f"✗ JPEG parsed as {names}: {messages}")
+                return False
+            
+            gif = os.path.join(tmpdir, 'test.gif')
+            frames = [Image.fromarray(np.roll(pixels, shift, axis=1)).convert('P') for shift in (0, 5)]
+            frames[0].save(gif, save_all=True, append_images=frames[1:], duration=80, comment=b'note')
+            structure = core.analyze_file_structure(gif)
+            images = [node for node in structure['nodes'] if node['name'].startswith('Image')]
+            if len(images) != 2 or structure['anomalies'] or structure['nodes'][-1]['name'] != 'Trailer':
+                print(f"✗ GIF parsed with {len(images)} images and {structure['anomalies']}")
+                return False
+            
+            bmp = os.path.join(tmpdir, 'test.bmp')
+            Image.fromarray(pixels).save(bmp)
+            structure = core.analyze_file_structure(bmp)
+            if structure['anomalies'] or structure['nodes'][-1]['size'] != 152 * 40:
+                print(f"✗ BMP parsed with {structure['anomalies']}")
+                return False
+            if 'Structure:' not in core.format_file_structure(structure):
+                print("✗ Structure report is missing the tree")
+                return False
+        
+        print("✓ File structure analysis works")
+        return True
+    except Exception as e:
+        print(f"✗ File structure test failed: {e}")
+        return False
+
+def test_auto_solve():
+    """Test the auto-solve sweep over extraction configurations"""
+    print("\nTesting auto solve...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import numpy as np
+        import stegsolve_core as core
+        
+        rng = np.random.default_rng(5)
+        image_array = rng.integers(0, 256, (150, 200, 3), dtype=np.uint8)
+        configs = core.solve_configurations(image_array)
+        if len(configs) != 15 * len(core.SOLVE_BIT_MASKS) * 4:
+            print(f"✗ {len(configs)} configurations for RGB")
+            return False
+        
+        # Hide text in bit 0 of G then R, read column by column, LSB first
+        message = b"Nothing to see here, just flag{lsb_sweep} and more text. " * 4
+        bits = np.unpackbits(np.frombuffer(message, dtype=np.uint8), bitorder='little').reshape(-1, 2)
+        columns = image_array.transpose(1, 0, 2).reshape(-1, 3).copy()
+        columns[:len(bits), 1] = columns[:len(bits), 1] & 0xFE | bits[:, 0]
+        columns[:len(bits), 0] = columns[:len(bits), 0] & 0xFE | bits[:, 1]
+        image_array = np.ascontiguousarray(columns.reshape(200, 150, 3).transpose(1, 0, 2))
+        
+        result = core.auto_solve(image_array, workers=0)
+        best = result['results'][0]
+        if best['label'] != "GR bit 0, columns, LSB first" or not best['preview'].startswith(message[:64]):
+            print(f"✗ Best result is {best['label']} with {best['reasons']}")
+            return False
+        if result['pruned'] < result['tested'] * 0.9:
+            print(f"✗ Only {result['pruned']} of {result['tested']} configurations pruned")
+            return False
+        
+        # The process pool must find the same ranking
+        pooled = core.auto_solve(image_array, workers=2)
+        if [r['label'] for r in pooled['results']] != [r['label'] for r in result['results']]:
+            print("✗ Process pool results differ")
+            return False
+        
+        if core.score_stream(rng.integers(0, 256, 4096, dtype=np.uint8).tobytes())[0] > 10:
+            print("✗ Random data scored as a payload")
+            return False
+        if 'PNG' not in ' '.join(core.score_stream(b'\x89PNG\r\n\x1a\n' + bytes(100))[1]):
+            print("✗ PNG magic not recognised")
+            return False
+        
+        print("✓ Auto solve works")
+        return True
+    except Exception as e:
+        print(f"✗ Auto solve test failed: {e}")
+        return False
+
+def test_colour_engine():
+    """Test float32 colour space conversion and component channels"""
+    print("\nTesting colour engine...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import numpy as np
+        from PIL import Image
+        import stegsolve_core as core
+        
+        # Reference values of pure red
+        red = np.array([[255, 0, 0]], dtype=np.uint8)
+        lab = core.colour_components(red, 'LAB')[0]
+        xyz = core.colour_components(red, 'XYZ')[0]
+        if not np.allclose(lab, (53.24, 80.09, 67.20), atol=0.01) or not np.allclose(xyz, (0.4125, 0.2127, 0.0193), atol=1e-4):
+            print(f"✗ Red converts to LAB {lab}, XYZ {xyz}")
+            return False
+        
+        # Within one level of Pillow's fixed-point HSV and YCbCr, also across chunk boundaries
+        image_array = np.random.default_rng(9).integers(0, 256, (60, 70, 3), dtype=np.uint8)
+        for space in ('HSV', 'YCbCr'):
+            ours = core.convert_colour(image_array, space, chunk_pixels=1000).astype(int)
+            difference = np.abs(ours - np.asarray(Image.fromarray(image_array).convert(space), dtype=int))
+            if space == 'HSV':
+                difference[:, :, 0] = np.minimum(difference[:, :, 0], 256 - difference[:, :, 0])
+            if difference.max() > 1:
+                print(f"✗ {space} differs from Pillow by {difference.max()}")
+                return False
+        
+        components = core.convert_colour(image_array, 'LAB', quantize=False)
+        if components.dtype != np.float32 or not 0 <= components[:, :, 0].min() <= components[:, :, 0].max() <= 100:
+            print("✗ Float LAB components out of range")
+            return False
+        
+        names = core.colour_channel_names('YCbCr')
+        quantized = core.convert_colour(image_array, 'YCbCr')
+        cube = core.BitPlaneCube(quantized, channels=names)
+        if cube.channels != ['YCbCr Y', 'YCbCr Cb', 'YCbCr Cr'] or core.component_space('YCbCr Cb') != 'YCbCr':
+            print(f"✗ Component channels are {cube.channels}")
+            return False
+        if not np.array_equal(cube.plane('YCbCr Cb', 0) > 0, quantized[:, :, 1] & 1 == 1):
+            print("✗ Component bit plane is wrong")
+            return False
+        stats = core.channel_statistics(quantized, channels=names)
+        if abs(stats['YCbCr Y']['mean'] - quantized[:, :, 0].mean()) > 1e-9 or core.component_space('Red') is not None:
+            print("✗ Component statistics are wrong")
+            return False
+        
+        print("✓ Colour engine works")
+        return True
+    except Exception as e:
+        print(f"✗ Colour engine test failed: {e}")
+        return False
+
+def test_analysis_server():
+    """Test the local analysis server over HTTP with a warm worker"""
+    print("\nTesting analysis server...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import contextlib
+        import io
+        import json
+        import signal
+        import socket
+        import tempfile
+        import threading
+        import time
+        import http.client
+        import numpy as np
+        from PIL import Image
+        import stegsolve_server
+        
+        image_array = np.random.default_rng(3).integers(0, 256, (40, 50, 3), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(image_array).save(buffer, 'PNG')
+        
+        service = stegsolve_server.AnalysisService(workers=1, queue_size=0)
+        server = stegsolve_server.make_server(service, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        
+        def request(method, path, body=None):
+            connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=60)
+            connection.request(method, path, body)
+            response = connection.getresponse()
+            return response.status, response.read()
+        
+        try:
+            status, body = request('POST', '/analyze/planes?channel=Green&bit=0', buffer.getvalue())
+            plane = np.asarray(Image.open(io.BytesIO(body)))
+            if status != 200 or not np.array_equal(plane > 0, image_array[:, :, 1] & 1 == 1):
+                print(f"✗ Bit plane request returned {status}")
+                return False
+            
+            status, body = request('POST', '/analyze/stats', buffer.getvalue())
+            if status != 200 or abs(json.loads(body)['Red']['mean'] - image_array[:, :, 0].mean()) > 1e-9:
+                print(f"✗ Statistics request returned {status}")
+                return False
+            
+            if request('POST', '/analyze/planes?bit=8', buffer.getvalue())[0] != 400 or \
+                    request('POST', '/analyze/unknown', b'')[0] != 404:
+                print("✗ Bad requests are not rejected")
+                return False
+            
+            # With one worker and no queue a second job is turned away
+            service.reserve()
+            try:
+                status, _ = request('POST', '/analyze/stats', buffer.getvalue())
+            finally:
+                service.release()
+            metrics = json.loads(request('GET', '/metrics')[1])
+            if status != 503 or metrics['rejected'] != 1 or metrics['completed'] != 2 or metrics['in_flight'] != 0:
+                print(f"✗ Backpressure gave {status}, metrics {metrics}")
+                return False
+            
+            # A client that disconnects mid-upload leaves no partial file and no traceback behind
+            errors = io.StringIO()
+            with tempfile.TemporaryDirectory() as upload_dir, contextlib.redirect_stderr(errors):
+                server.upload_dir = upload_dir
+                with socket.create_connection(('127.0.0.1', server.server_address[1])) as client:
+                    client.sendall(b'POST /analyze/stats HTTP/1.1\r\nHost: localhost\r\n'
+                                   b'Content-Length: 100000\r\n\r\n' + buffer.getvalue()[:1000])
+                deadline = time.time() + 10
+                while (os.listdir(upload_dir) or json.loads(request('GET', '/metrics')[1])['in_flight']) \
+                        and time.time() < deadline:
+                    time.sleep(0.05)
+                server.upload_dir = None
+                if os.listdir(upload_dir) or errors.getvalue():
+                    print(f"✗ Aborted upload left {os.listdir(upload_dir)} {errors.getvalue()!r}")
+                    return False
+            
+            # A killed worker breaks the pool, which is replaced by a new warm one
+            pids = metrics['worker_pids']
+            os.kill(pids[0], signal.SIGKILL)
+            time.sleep(0.5)
+            failed, _ = request('POST', '/analyze/stats', buffer.getvalue())
+            status, _ = request('POST', '/analyze/stats', buffer.getvalue())
+            # Slots come back from the futures' done callbacks, just after the responses
+            deadline = time.time() + 10
+            metrics = json.loads(request('GET', '/metrics')[1])
+            while metrics['in_flight'] and time.time() < deadline:
+                time.sleep(0.05)
+                metrics = json.loads(request('GET', '/metrics')[1])
+            if failed not in (500, 503) or status != 200 or metrics['worker_pids'] == pids or metrics['in_flight'] != 0:
+                print(f"✗ Pool restart gave {failed} then {status}, pids {pids} -> {metrics['worker_pids']}, {metrics['in_flight']} in flight")
+                return False
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.shutdown()
+        
+        print("✓ Analysis server works")
+        return True
+    except Exception as e:
+        print(f"✗ Analysis server test failed: {e}")
+        return False
+
+def test_jpeg_coefficients():
+    """Test JPEG coefficient decoding, JSteg/F5 statistics and coefficient planes"""
+    print("\nTesting JPEG coefficients...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import io
+        import numpy as np
+        from PIL import Image
+        import stegsolve_core as core
+        
+        rng = np.random.default_rng(11)
+        ramp = np.add.outer(np.arange(480), np.arange(640)) // 6
+        pixels = np.clip(ramp + rng.normal(0, 24, ramp.shape), 0, 255).astype(np.uint8)
+        image = Image.fromarray(np.dstack([pixels, pixels[::-1], pixels[:, ::-1]]))
+        
+        # Baseline, progressive and restart-marker encodings carry the same coefficients
+        encoded = {}
+        for name, options in (('baseline', {}), ('progressive', {'progressive': True})):
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=95, **options)
+            encoded[name] = buffer.getvalue()
+        baseline = core.read_jpeg_coefficients(encoded['baseline'])
+        progressive = core.read_jpeg_coefficients(encoded['progressive'])
+        if baseline['process'] != 'baseline' or progressive['process'] != 'progressive' or progressive['scans'] < 2:
+            print(f"✗ Processes are {baseline['process']} and {progressive['process']}")
+            return False
+        for ours, theirs in zip(baseline['components'], progressive['components']):
+            if not np.array_equal(ours['coefficients'], theirs['coefficients']):
+                print(f"✗ Progressive {ours['name']} coefficients differ from baseline")
+                return False
+        
+        # The inverse DCT of the coefficients is Pillow's decoded image
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, 'JPEG', quality=85)
+        grey = core.read_jpeg_coefficients(buffer.getvalue())
+        component = grey['components'][0]
+        ours = np.clip(np.round(core.dct_pixels(component['coefficients'], component['quantization'])), 0, 255)
+        theirs = np.asarray(Image.open(io.BytesIO(buffer.getvalue())), dtype=float)
+        if np.abs(ours[:480, :640] - theirs).max() > 1:
+            print("✗ Inverse DCT differs from Pillow")
+            return False
+        
+        # JSteg: LSBs of AC coefficients other than 0 and 1 replaced in order
+        clean = core.jsteg_chi_square(baseline['components'])
+        stego = [dict(c, coefficients=c['coefficients'].copy()) for c in baseline['components']]
+        for c in stego:
+            ac = c['coefficients'].reshape(-1, 64)[:, 1:]
+            usable = (ac != 0) & (ac != 1)
+            ac[usable] = (ac[usable] & ~1) | rng.integers(0, 2, int(usable.sum()), dtype=np.int16)
+        embedded = core.jsteg_chi_square(stego)
+        if clean['probability'] > 0.5 or embedded['probability'] < 0.5 or embedded['payload_bytes'] <= clean['payload_bytes']:
+            print(f"✗ JSteg probabilities {clean['probability']:.3f} clean, {embedded['probability']:.3f} embedded")
+            return False
+        
+        # F5: a quarter of the non-zero AC coefficients shrunk towards zero
+        y = baseline['components'][0]
+        calibrated = core.calibrate_jpeg(y, 640, 480)
+        shrunk = y['coefficients'].copy()
+        ac = shrunk.reshape(-1, 64)[:, 1:]
+        changed = (ac != 0) & (rng.random(ac.shape) < 0.25)
+        ac[changed] -= np.sign(ac[changed]).astype(np.int16)
+        before = core.f5_estimate(y['coefficients'], calibrated)['beta']
+        after = core.f5_estimate(shrunk, calibrated)['beta']
+        if not after - before > 0.1:
+            print(f"✗ F5 estimates {before:.3f} clean, {after:.3f} after shrinkage")
+            return False
+        
+        analysis = core.jpeg_analysis(baseline)
+        if 'f5' not in analysis or "JSteg" not in core.format_jpeg_analysis(analysis):
+            print("✗ JPEG analysis report incomplete")
+            return False
+        
+        histogram = core.dct_histogram(y['coefficients'], limit=16)
+        if histogram.sum() != y['coefficients'][..., 0, 0].size * 63:
+            print("✗ Coefficient histogram does not count every AC coefficient")
+            return False
+        rows, columns = y['coefficients'].shape[:2]
+        for layout in core.DCT_LAYOUTS:
+            plane = core.dct_plane(y['coefficients'], 0, layout)
+            if plane.shape != (rows * 8, columns * 8) or plane.dtype != np.uint8:
+                print(f"✗ {layout} coefficient plane has shape {plane.shape}")
+                return False
+        
+        # Truncated scans keep what was decoded and warn; other files are rejected
+        truncated = core.read_jpeg_coefficients(encoded['baseline'][:len(encoded['baseline']) // 2])
+        if not truncated['warnings']:
+            print("✗ Truncated JPEG gave no warning")
+            return False
+        try:
+            core.read_jpeg_coefficients(b'\x89PNG\r\n\x1a\n')
+            print("✗ PNG data accepted as JPEG")
+            return False
+        except ValueError:
+            pass
+        
+        print(f"✓ JPEG coefficients working (JSteg {embedded['probability']:.3f}, F5 beta {after:.3f})")
+        return True
+        
+    except Exception as e:
+        print(f"✗ JPEG coefficient test failed: {e}")
+        return False
+
+
+def test_frame_stack():
+    """Test frame stack decoding, streaming and whole-stack analyses"""
+    print("\nTesting frame stack...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import tempfile
+        import tracemalloc
+        import numpy as np
+        from PIL import Image
+        import stegsolve_core as core
+        
+        # Delays spell a message; frame 3 hides a block in bit 0 of its palette indices
+        rng = np.random.default_rng(5)
+        base = rng.integers(0, 200, (48, 64), dtype=np.uint8)
+        grey = [value for value in range(256) for _ in range(3)]
+        message = b'flag{st4ck}'
+        frames = []
+        for index in range(len(message)):
+            pixels = base.copy()
+            pixels[0, index] = 250
+            if index == 3:
+                pixels[8:16, 8:16] ^= 1
+            frame = Image.fromarray(pixels, 'P')
+            frame.putpalette(grey)
+            frames.append(frame)
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'frames.gif')
+            frames[0].save(path, save_all=True, append_images=frames[1:], duration=[c * 10 for c in message], loop=0)
+            
+            # Streaming from disk gives the same stack and results as memory
+            stack = core.FrameStack(path)
+            mapped = core.FrameStack(path, budget_bytes=1024)
+            if stack.mapped or not mapped.mapped or stack.n_frames != len(message) or stack.key != mapped.key:
+                print(f"✗ Stack of {stack.n_frames} frames, mapped {stack.mapped}/{mapped.mapped}")
+                return False
+            if not np.array_equal(stack.frames[3, :, :, 0], frames[3].convert('RGBA').getchannel('R')):
+                print("✗ Stacked frame differs from the decoded frame")
+                return False
+            analysis = core.frame_analysis(stack)
+            if dict(core.frame_analysis(mapped), mapped=False) != analysis:
+                print("✗ Memory-mapped stack gives different results")
+                return False
+            
+            statistics = core.frame_statistics(stack, chunk_bytes=1)
+            green = stack.frames[5, :, :, 1]
+            if statistics['max'][5, 1] != green.max() or abs(statistics['mean'][5, 1] - green.mean()) > 1e-9 or \
+                    abs(statistics['ones'][5, 1, 0] - (green & 1).mean()) > 1e-9:
+                print("✗ Per-frame statistics are wrong")
+                return False
+            
+            changes = core.frame_differences(stack, chunk_bytes=1)
+            if changes['changed'][2] != 66 or changes['low_bit'][2] != 64 or changes['bbox'][2] != (2, 0, 16, 16):
+                print(f"✗ Frame 3 changes: {changes['changed'][2]}, {changes['low_bit'][2]}, {changes['bbox'][2]}")
+                return False
+            anomalies = " ".join(analysis['anomalies'])
+            if analysis['timing']['text'] != 'flag{st4ck}' or "Frame 3 differs from frame 2 mostly in bit 0" not in anomalies:
+                print(f"✗ Anomalies: {analysis['anomalies']}")
+                return False
+            
+            # Bit 0 flips in frame 3 only, so the XOR over all frames shows the block
+            parity = core.stack_plane(stack, 'Red', 0)
+            reference = np.bitwise_xor.reduce(stack.frames[:, :, :, 0] & 1, axis=0) * 255
+            if not np.array_equal(parity, reference) or core.stack_plane(stack, 'Red', 0, 'changes')[10, 10] != 255:
+                print("✗ Stack planes are wrong")
+                return False
+            stack.close()
+            mapped.close()
+            
+            # Long animations of tiny frames keep the analysis temporaries bounded
+            path = os.path.join(directory, 'tiny.gif')
+            tiny = [Image.fromarray(pixels, 'P') for pixels in rng.integers(0, 256, (2000, 16, 16), dtype=np.uint8)]
+            tiny[0].save(path, save_all=True, append_images=tiny[1:], duration=40, loop=0)
+            stack = core.FrameStack(path)
+            tracemalloc.start()
+            try:
+                analysis = core.frame_analysis(stack)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+                stack.close()
+            if analysis['frames'] != 2000 or peak > 32 * 1024 * 1024:
+                print(f"✗ {analysis['frames']} tiny frames peaked at {peak / (1024 * 1024):.0f} MB")
+                return False
+            
+            # Multi-page TIFF pages of different sizes are padded into one stack
+            path = os.path.join(directory, 'pages.tif')
+            pages = [Image.fromarray(rng.integers(0, 256, (20, 30, 3), dtype=np.uint8)) for _ in range(3)]
+            pages[0].save(path, save_all=True, append_images=[pages[1].resize((40, 10)), pages[2]])
+            gif_key = mapped.key
+            stack = core.FrameStack(path)
+            analysis = core.frame_analysis(stack)
+            stack.close()
+            if stack.key == gif_key:
+                print("✗ Stacks of different files share a content key")
+                return False
+            if stack.size != (40, 20) or analysis['timing'] is not None or "pages are not 30x20" not in analysis['anomalies'][0]:
+                print(f"✗ TIFF stack {stack.size}: {analysis['anomalies']}")
+                return False
+        
+        print(f"✓ Frame stack working ({len(message)} frames, delays spell {message.decode()!r})")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Frame stack test failed: {e}")
+        return False
+
+
+def test_job_scheduler():
+    """Test background jobs, superseding and cancellation without a display"""
+    print("\nTesting job scheduler...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import threading
+        import time
+        import stegsolve_gui
+        
+        class FakeRoot:
+            def after(self, ms, callback):
+                pass
+        
+        updates = []
+        scheduler = stegsolve_gui.JobScheduler(FakeRoot(), updates.append, workers=2)
+        results = []
+        release = threading.Event()
+        
+        def slow(progress):
+            release.wait(5)
+            progress(0.5)  # Raises once superseded
+            return 'stale'
+        
+        scheduler.submit('view', "Slow", slow, results.append)
+        scheduler.submit('view', "Fast", lambda progress: 'fresh', results.append)
+        release.set()
+        
+        deadline = time.time() + 5
+        while scheduler.active and time.time() < deadline:
+            time.sleep(0.01)
+            scheduler.poll()
+        time.sleep(0.05)
+        scheduler.poll()
+        
+        if results != ['fresh'] or updates[-1] != []:
+            print(f"✗ Scheduler delivered {results}")
+            return False
+        
+        # A raising callback is reported, the next job still arrives and polling goes on
+        class RecordingRoot:
+            def __init__(self):
+                self.scheduled = 0
+                self.errors = []
+            
+            def after(self, ms, callback):
+                self.scheduled += 1
+            
+            def report_callback_exception(self, kind, value, traceback):
+                self.errors.append(value)
+        
+        root = RecordingRoot()
+        scheduler = stegsolve_gui.JobScheduler(root, updates.append, workers=1)
+        
+        def closed_dialog(result):
+            raise RuntimeError("dialog destroyed")
+        
+        scheduler.submit('first', "Broken", lambda progress: 'lost', closed_dialog)
+        scheduler.submit('second', "Healthy", lambda progress: 'delivered', results.append)
+        deadline = time.time() + 5
+        while scheduler.results.qsize() < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        scheduler.poll()
+        if results[-1] != 'delivered' or len(root.errors) != 1 or root.scheduled != 2:
+            print(f"✗ After a raising callback: {results}, {root.errors}, {root.scheduled} polls scheduled")
+            return False
+        
+        print("✓ Job scheduler works")
+        return True
+    except Exception as e:
+        print(f"✗ Job scheduler test failed: {e}")
+        return False
+
+def test_profiler():
+    """Test stage timing, job profiling and Chrome trace export"""
+    print("\nTesting profiler...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import json
+        import time
+        from stegsolve_profile import Profiler
+        import stegsolve_gui
+        
+        profiler = Profiler()
+        operation = profiler.new_operation("Sleep")
+        with profiler.operation(operation):
+            with profiler.span('outer') as stage:
+                time.sleep(0.02)
+                with profiler.span('inner'):
+                    time.sleep(0.02)
+                stage['bytes'] = 2048
+        
+        # Nested time only counts towards the inner stage
+        total, stages = profiler.breakdown(operation)
+        own = {name: seconds for name, seconds, size, count in stages}
+        if not 0.035 < total < 1 or not 0.015 < own['outer'] < own['outer'] + own['inner'] <= total + 1e-6:
+            print(f"✗ Unexpected breakdown: {total} {stages}")
+            return False
+        
+        class FakeRoot:
+            def after(self, ms, callback):
+                pass
+        
+        profiled = []
+        scheduler = stegsolve_gui.JobScheduler(FakeRoot(), lambda jobs: None, workers=1, profiler=profiler,
+                                               on_profile=profiled.append)
+        job = scheduler.submit('view', "Job", lambda progress: b'x' * 100, lambda result: None)
+        deadline = time.time() + 5
+        while not profiled and time.time() < deadline:
+            time.sleep(0.01)
+            scheduler.poll()
+        
+        stages = {name: size for name, seconds, size, count in profiler.breakdown(job.operation)[1]}
+        if profiled != [job.operation] or set(stages) != {'queued', 'work', 'deliver'}:
+            print(f"✗ Job stages not recorded: {stages}")
+            return False
+        
+        trace = json.loads(json.dumps(profiler.chrome_trace()))
+        spans = [event for event in trace['traceEvents'] if event['ph'] == 'X']
+        if len(spans) != 5 or {event['cat'] for event in spans} != {'Sleep', 'Job'}:
+            print("✗ Chrome trace is incomplete")
+            return False
+        
+        print("✓ Profiler works")
+        return True
+    except Exception as e:
+        print(f"✗ Profiler test failed: {e}")
+        return False
+
+def test_batch_cli():
+    """Test the batch CLI over a small directory tree"""
+    print("\nTesting batch CLI...")
+    
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import io
+        import json
+        import tempfile
+        import numpy as np
+        from PIL import Image
+        import stegsolve_batch
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.makedirs(os.path.join(tmpdir, 'sub'))
+            test_array = np.random.randint(0, 256, (20, 20, 3), dtype=np.uint8)
+            Image.fromarray(test_array).save(os.path.join(tmpdir, 'a.png'))
+            Image.fromarray(test_array).save(os.path.join(tmpdir, 'sub', 'b.bmp'))
+            with open(os.path.join(tmpdir, 'notes.txt'), 'w') as f:
+                f.write("not an image")
+            
+            output = io.StringIO()
+            count, errors = stegsolve_batch.run_batch([tmpdir], output, workers=2)
+            results = [json.loads(line) for line in output.getvalue().splitlines()]
+        
+        if count != 2 or errors != 0 or len(results) != 2:
+            print(f"✗ Batch analyzed {count} files with {errors} errors")
+            return False
+        
+        if results[0]['width'] != 20 or 'Red' not in results[0]['statistics']:
+            print("✗ Batch result is missing fields")
+            return False
+        
+        print("✓ Batch CLI works")
+        return True
+    except Exception as e:
+        print(f"✗ Batch CLI test failed: {e}")
+        return False
+
 def main():
     print("=" * 50)
     print("StegSolve GUI Test Suite")
@@ -99,6 +1485,63 @@ def main():
     if not test_main_module():
         all_passed = False
     
+    if not test_core_module():
+        all_passed = False
+    
+    if not test_bit_plane_cube():
+        all_passed = False
+    
+    if not test_string_scanner():
+        all_passed = False
+    
+    if not test_image_pyramid():
+        all_passed = False
+    
+    if not test_data_extract():
+        all_passed = False
+    
+    if not test_job_scheduler():
+        all_passed = False
+    
+    if not test_lsb_analysis():
+        all_passed = False
+    if not test_data_carving():
+        all_passed = False
+    if not test_compare_images():
+        all_passed = False
+    if not test_frame_decoder():
+        all_passed = False
+    if not test_stereogram_solver():
+        all_passed = False
+    if not test_plane_expression():
+        all_passed = False
+    if not test_result_cache():
+        all_passed = False
+    if not test_noise_analysis():
+        all_passed = False
+    if not test_histogram_statistics():
+        all_passed = False
+    if not test_benchmark_suite():
+        all_passed = False
+    if not test_profiler():
+        all_passed = False
+    if not test_load_preview():
+        all_passed = False
+    if not test_file_structure():
+        all_passed = False
+    if not test_auto_solve():
+        all_passed = False
+    if not test_colour_engine():
+        all_passed = False
+    if not test_analysis_server():
+        all_passed = False
+    if not test_jpeg_coefficients():
+        all_passed = False
+    if not test_frame_stack():
+        all_passed = False
+    if not test_batch_cli():
+        all_passed = False
+    
     print("\n" + "=" * 50)
     if all_passed:
         print("✓ All tests passed!")